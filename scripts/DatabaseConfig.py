@@ -1,8 +1,14 @@
-import pyodbc
-import pandas as pd
-from sqlalchemy import create_engine, text
+import configparser
+import os
 import warnings
 
+import warehouse_backend
+
+try:
+    import pyodbc
+except ImportError:  # only needed for SQL Server and the Access source
+    pyodbc = None
+
 warnings.filterwarnings('ignore')
 
 
@@ -13,37 +19,103 @@ class DatabaseConfig:
     TARGET_DATABASE = 'Dw'
     ACCESS_DB_PATH = r'C:\Users\amery\Desktop\Nw.accdb'
 
+    # sqlserver | sqlite | duckdb (for sqlite / duckdb the database names are file paths)
+    SOURCE_BACKEND = 'sqlserver'
+    DW_BACKEND = 'sqlserver'
+    ODBC_DRIVER = 'SQL Server'
+    # empty user = Windows authentication (Trusted_Connection)
+    SQL_USER = ''
+    SQL_PASSWORD = ''
+
+    # DuckDB copy of the star schema refreshed after each load (empty = disabled)
+    MIRROR_DATABASE = 'data/dw_mirror.duckdb'
+    # mirror | dw: where the dashboard reads from (falls back to dw without a mirror)
+    DASHBOARD_SOURCE = 'mirror'
+    # memory | query: load the dashboard dataset once, or push the sidebar filters down as SQL queries
+    DASHBOARD_MODE = 'memory'
+    # versioned Arrow snapshots of the dashboard dataset published after each load (empty = disabled)
+    SNAPSHOT_DIRECTORY = 'data/snapshots'
+    # Parquet export of the dimensions and FactOrders written after each load (empty = disabled)
+    LAKE_DIRECTORY = 'data/lake'
+    # connections kept per database by connection_pool
+    POOL_SIZE = 4
+
+    SETTINGS = [
+        'SQL_SERVER_INSTANCE', 'SOURCE_DATABASE', 'TARGET_DATABASE', 'ACCESS_DB_PATH',
+        'SOURCE_BACKEND', 'DW_BACKEND', 'ODBC_DRIVER', 'SQL_USER', 'SQL_PASSWORD',
+        'MIRROR_DATABASE', 'DASHBOARD_SOURCE', 'DASHBOARD_MODE', 'LAKE_DIRECTORY', 'SNAPSHOT_DIRECTORY', 'POOL_SIZE',
+    ]
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Override the settings above from the [database] section of a config file
+        (ETL_CONFIG, default scripts/config.ini), then from environment variables
+        of the same name, e.g. DW_BACKEND=duckdb TARGET_DATABASE=data/dw.duckdb
+        """
+        path = path or os.environ.get('ETL_CONFIG') or \
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
+
+        settings = {}
+        if os.path.exists(path):
+            parser = configparser.ConfigParser(interpolation=None)
+            parser.read(path)
+            if parser.has_section('database'):
+                settings.update({name.upper(): value for name, value in parser['database'].items()})
+        settings.update({name: os.environ[name] for name in cls.SETTINGS if name in os.environ})
+
+        for name, value in settings.items():
+            if name in cls.SETTINGS:
+                setattr(cls, name, value)
+
+    @classmethod
+    def backend(cls, name):
+        return warehouse_backend.create_backend(
+            name, server=cls.SQL_SERVER_INSTANCE, driver=cls.ODBC_DRIVER,
+            user=cls.SQL_USER, password=cls.SQL_PASSWORD
+        )
+
+
+DatabaseConfig.load()
+
+
+def source_backend():
+    return DatabaseConfig.backend(DatabaseConfig.SOURCE_BACKEND)
+
+
+def dw_backend():
+    return DatabaseConfig.backend(DatabaseConfig.DW_BACKEND)
+
 
 def connect_sql_server():
     try:
-        conn = pyodbc.connect(
-            'DRIVER={SQL Server};'
-            f'SERVER={DatabaseConfig.SQL_SERVER_INSTANCE};'
-            f'DATABASE={DatabaseConfig.SOURCE_DATABASE};'
-            'Trusted_Connection=yes;'
-        )
-        print(f"✅ Connected to SQL Server ({DatabaseConfig.SOURCE_DATABASE})")
+        conn = source_backend().connect(DatabaseConfig.SOURCE_DATABASE)
+        print(f"✅ Connected to source database ({DatabaseConfig.SOURCE_DATABASE}, {DatabaseConfig.SOURCE_BACKEND})")
         return conn
     except Exception as e:
-        print(f"❌ Failed to connect to SQL Server: {e}")
+        print(f"❌ Failed to connect to source database: {e}")
         return None
 
 
 def connect_data_warehouse():
     try:
-        conn = pyodbc.connect(
-            'DRIVER={SQL Server};'
-            f'SERVER={DatabaseConfig.SQL_SERVER_INSTANCE};'
-            f'DATABASE={DatabaseConfig.TARGET_DATABASE};'
-            'Trusted_Connection=yes;'
-        )
-        print(f"✅ Connected to Data Warehouse ({DatabaseConfig.TARGET_DATABASE})")
+        conn = dw_backend().connect(DatabaseConfig.TARGET_DATABASE)
+        print(f"✅ Connected to Data Warehouse ({DatabaseConfig.TARGET_DATABASE}, {DatabaseConfig.DW_BACKEND})")
         return conn
     except Exception as e:
         print(f"❌ Failed to connect to Data Warehouse: {e}")
         return None
 
 
+def connect_access():
+    if pyodbc is None:
+        raise ImportError("pyodbc is required to read the Access database")
+    return pyodbc.connect(
+        'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};'
+        f'DBQ={DatabaseConfig.ACCESS_DB_PATH};'
+    )
+
+
 # Main execution for testing
 if __name__ == "__main__":
     # Test connections
@@ -57,4 +129,4 @@ if __name__ == "__main__":
     dw_conn = connect_data_warehouse()
     if dw_conn:
         dw_conn.close()
-        print("Data Warehouse connection test: PASSED")
\ No newline at end of file
+        print("Data Warehouse connection test: PASSED")
@@ -0,0 +1,134 @@
+from datetime import datetime
+
+# Aggregate tables maintained by the ETL after each load (read by the dashboard).
+# Each one is partitioned by month (YYYYMM) or by year: a refresh deletes and
+# recomputes the partitions of the FactOrders rows past the watermark (the
+# highest FactOrderKey aggregated so far, kept in AggWatermark), from FactOrders
+# joined to DimDate. A run that fails before the refresh leaves the watermark
+# behind, so the next one still recomputes those months.
+PARTITIONS = {'month': 'Year * 100 + Month', 'year': 'Year'}
+
+AGGREGATES = {
+    'AggMonthlyStatus': {
+        'partition': 'month',
+        'columns': ['Year', 'Month', 'IsDelivered', 'OrderCount', 'TotalRevenue'],
+        'select': """
+            SELECT d.Year, d.Month, f.IsDelivered, COUNT(*), SUM(f.TotalAmount)
+            FROM FactOrders f
+            JOIN DimDate d ON d.DateKey = f.OrderDateKey
+            WHERE d.Year * 100 + d.Month IN ({values})
+            GROUP BY d.Year, d.Month, f.IsDelivered
+        """,
+    },
+    'AggCustomerEmployee': {
+        'partition': 'month',
+        'columns': ['Year', 'Month', 'CustomerKey', 'EmployeeKey', 'IsDelivered', 'OrderCount', 'TotalRevenue'],
+        'select': """
+            SELECT d.Year, d.Month, f.CustomerKey, f.EmployeeKey, f.IsDelivered, COUNT(*), SUM(f.TotalAmount)
+            FROM FactOrders f
+            JOIN DimDate d ON d.DateKey = f.OrderDateKey
+            WHERE d.Year * 100 + d.Month IN ({values})
+            GROUP BY d.Year, d.Month, f.CustomerKey, f.EmployeeKey, f.IsDelivered
+        """,
+    },
+    'AggYearly': {
+        'partition': 'year',
+        'columns': ['Year', 'OrderCount', 'DeliveredCount', 'TotalRevenue'],
+        'select': """
+            SELECT d.Year, COUNT(*), SUM(CASE WHEN f.IsDelivered = 1 THEN 1 ELSE 0 END), SUM(f.TotalAmount)
+            FROM FactOrders f
+            JOIN DimDate d ON d.DateKey = f.OrderDateKey
+            WHERE d.Year IN ({values})
+            GROUP BY d.Year
+        """,
+    },
+}
+
+
+def all_months(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DISTINCT d.Year * 100 + d.Month
+        FROM FactOrders f
+        JOIN DimDate d ON d.DateKey = f.OrderDateKey
+    """)
+    months = {int(row[0]) for row in cursor.fetchall()}
+    cursor.close()
+    return months
+
+
+def watermark(conn):
+    """Highest FactOrderKey already aggregated (0 before the first refresh: every month is pending)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(LastFactOrderKey) FROM AggWatermark")
+        return cursor.fetchone()[0] or 0
+    finally:
+        cursor.close()
+
+
+def pending_months(conn, after_key):
+    """(YYYYMM months of the orders past `after_key`, highest FactOrderKey among them)"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT d.Year * 100 + d.Month, MAX(f.FactOrderKey)
+        FROM FactOrders f
+        JOIN DimDate d ON d.DateKey = f.OrderDateKey
+        WHERE f.FactOrderKey > {int(after_key)}
+        GROUP BY d.Year * 100 + d.Month
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+    return {int(row[0]) for row in rows}, max((int(row[1]) for row in rows), default=after_key)
+
+
+def refresh_pending(conn):
+    """Recompute the months of the orders loaded since the last refresh and move the watermark"""
+    months, last_key = pending_months(conn, watermark(conn))
+    return refresh(conn, months, last_key=last_key)
+
+
+def refresh(conn, months, tables=None, last_key=None):
+    """
+    Recompute the given YYYYMM partitions (and their years) of the aggregate
+    tables, one DELETE + INSERT ... SELECT per table in a single transaction
+    (which also records `last_key` as the watermark when given).
+    Returns {table: partitions refreshed}.
+    """
+    if not months:
+        return {}
+    partitions = {
+        'month': sorted(int(month) for month in months),
+        'year': sorted({int(month) // 100 for month in months}),
+    }
+
+    refreshed = {}
+    cursor = conn.cursor()
+    try:
+        for table in tables or AGGREGATES:
+            spec = AGGREGATES[table]
+            values = ', '.join(str(value) for value in partitions[spec['partition']])
+            cursor.execute(f"DELETE FROM {table} WHERE {PARTITIONS[spec['partition']]} IN ({values})")
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(spec['columns'])}) " + spec['select'].format(values=values)
+            )
+            refreshed[table] = len(partitions[spec['partition']])
+        if last_key is not None:
+            cursor.execute("DELETE FROM AggWatermark")
+            cursor.execute("INSERT INTO AggWatermark (LastFactOrderKey, UpdatedAt) VALUES (?, ?)",
+                           (int(last_key), datetime.now()))
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:  # DuckDB: no transaction open
+            pass
+        raise
+    finally:
+        cursor.close()
+    return refreshed
+
+
+def rebuild(conn):
+    """Recompute every partition (aggregates created on a warehouse that already has orders)"""
+    return refresh(conn, all_months(conn))
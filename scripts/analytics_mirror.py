@@ -0,0 +1,166 @@
+import os
+import time
+
+import pandas as pd
+
+import create_dw
+import stats_catalog
+import typed_schema
+import warehouse_backend
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+# star schema and aggregate tables copied to the mirror (CustomerCluster for the canonical customer names)
+MIRROR_TABLES = ['DimDate', 'DimCustomer', 'DimEmployee', 'DimShipDestination', 'DimShipper', 'DimProduct',
+                 'EmployeeHierarchy', 'CustomerCluster', 'FactOrders', 'FactOrderDetails',
+                 'AggMonthlyStatus', 'AggCustomerEmployee', 'AggYearly', 'CustomerMart', 'StatsCatalog']
+# the loads only ever append to these: copy the rows past the mirror's last key
+APPEND_ONLY = {'FactOrders': 'FactOrderKey', 'FactOrderDetails': 'FactOrderDetailKey'}
+# rows of those the ETL may still rewrite in place, copied again on every refresh
+# (update_order_totals fills in the TotalAmount of orders loaded without one)
+REWRITABLE = {'FactOrders': 'TotalAmount = 0'}
+CHUNK_ROWS = 100_000
+# a dashboard query holds the file (read-only) for a moment: retry the write lock
+LOCK_ATTEMPTS = 10
+LOCK_WAIT = 0.5
+
+
+def mirror_schema(spec):
+    """typed_schema dtypes for the columns of a create_dw table"""
+    schema = {}
+    for name, col_type, *_ in spec['columns']:
+        if col_type in ('DATE', 'DATETIME'):
+            schema[name] = typed_schema.DATETIME
+        elif col_type in ('INT', 'BIGINT', 'BIT', 'IDENTITY'):
+            schema[name] = typed_schema.INT
+        elif col_type.startswith('DECIMAL'):
+            schema[name] = typed_schema.FLOAT
+        else:
+            schema[name] = typed_schema.TEXT
+    return schema
+
+
+def mirror_table_sql(table, spec):
+    # plain columns: no constraints or indexes to maintain, DuckDB prunes with zone maps
+    type_map = warehouse_backend.DuckDBBackend.type_map
+    columns = [
+        f"{name} {'INTEGER' if col_type == 'IDENTITY' else type_map.get(col_type, col_type)}"
+        for name, col_type, *_ in spec['columns']
+    ]
+    return f"CREATE TABLE {table} ({', '.join(columns)})"
+
+
+def connect_mirror(path, read_only=False):
+    if duckdb is None:
+        raise ImportError("duckdb is not installed (pip install duckdb)")
+    return duckdb.connect(path, read_only=read_only)
+
+
+def _copy(dw_conn, mirror, table, where='', params=None):
+    spec = create_dw.TABLES[table]
+    schema = mirror_schema(spec)
+    query = f"SELECT {', '.join(schema)} FROM {table} {where}"
+
+    backend = warehouse_backend.DuckDBBackend()
+    rows = 0
+    for chunk in pd.read_sql(query, dw_conn, params=params, chunksize=CHUNK_ROWS):
+        rows += backend.bulk_insert(mirror, table, typed_schema.apply_schema(chunk, schema))
+    return rows
+
+
+def _recopy_rewritable(dw_conn, mirror, table, key, condition):
+    """Replace the mirror rows matching `condition` with their current warehouse version"""
+    keys = [row[0] for row in mirror.execute(f"SELECT {key} FROM {table} WHERE {condition}").fetchall()]
+    rows = 0
+    for start in range(0, len(keys), 1000):
+        values = ', '.join(str(int(value)) for value in keys[start:start + 1000])
+        mirror.execute(f"DELETE FROM {table} WHERE {key} IN ({values})")
+        rows += _copy(dw_conn, mirror, table, f"WHERE {key} IN ({values})")
+    return rows
+
+
+def _open_for_writing(path):
+    for attempt in range(LOCK_ATTEMPTS):
+        try:
+            return connect_mirror(path)
+        except duckdb.IOException:
+            if attempt == LOCK_ATTEMPTS - 1:
+                raise
+            time.sleep(LOCK_WAIT)
+
+
+def _scalar(conn, query):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    value = cursor.fetchone()[0]
+    cursor.close()
+    return value
+
+
+def refresh_mirror(dw_conn, path):
+    """
+    Bring the DuckDB mirror up to date with the warehouse.
+
+    Dimensions are small and copied whole; the fact tables only get the rows added
+    since the last refresh, plus their REWRITABLE rows (full copy if the counts
+    don't line up anymore). Everything is written to the live file in a single
+    transaction: the dashboard's read-only connections see the previous mirror
+    or the refreshed one, never a half-refreshed mirror.
+    Returns {table: rows copied}.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # warehouse row counts from the stats catalog instead of a COUNT(*) per table
+    try:
+        catalog = stats_catalog.load(dw_conn)
+    except Exception:
+        catalog = None
+
+    copied = {}
+    mirror = _open_for_writing(path)
+    try:
+        mirror.execute("BEGIN TRANSACTION")
+        for table in MIRROR_TABLES:
+            if not warehouse_backend.backend_for(dw_conn).table_exists(dw_conn, table):
+                continue
+            spec = create_dw.TABLES[table]
+            mirror_backend = warehouse_backend.DuckDBBackend()
+            # a table whose columns changed since the last refresh is copied again
+            exists = mirror_backend.table_exists(mirror, table) and \
+                mirror_backend.columns(mirror, table) == list(mirror_schema(spec))
+            key = APPEND_ONLY.get(table)
+
+            if exists and key:
+                last_key = mirror.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}").fetchone()[0]
+                copied[table] = 0
+                if table in REWRITABLE:
+                    copied[table] += _recopy_rewritable(dw_conn, mirror, table, key, REWRITABLE[table])
+                copied[table] += _copy(dw_conn, mirror, table, f"WHERE {key} > ?", [int(last_key)])
+                mirror_rows = mirror.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                dw_rows = stats_catalog.row_count(catalog, table) if catalog is not None else None
+                if dw_rows is None:
+                    dw_rows = _scalar(dw_conn, f"SELECT COUNT(*) FROM {table}")
+                if mirror_rows == dw_rows:
+                    continue
+
+            # first copy, small table, or a mirror out of step with the warehouse
+            mirror.execute(f"DROP TABLE IF EXISTS {table}")
+            mirror.execute(mirror_table_sql(table, spec))
+            copied[table] = _copy(dw_conn, mirror, table)
+
+        mirror.execute("COMMIT")
+        mirror.execute("CHECKPOINT")
+    except Exception:
+        try:
+            mirror.execute("ROLLBACK")
+        except Exception:  # failed before BEGIN: no transaction open
+            pass
+        raise
+    finally:
+        mirror.close()
+    return copied
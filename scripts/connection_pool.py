@@ -0,0 +1,188 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from DatabaseConfig import DatabaseConfig, source_backend, dw_backend, connect_access
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections to one database.
+
+    A thread that already holds a connection gets the same one back (nested
+    acquire/release are counted), so helpers can ask for a connection without
+    deadlocking their caller. Idle connections are health-checked before reuse
+    when they have been idle for more than `check_after` seconds.
+    """
+
+    def __init__(self, name, factory, max_size=4, health_query='SELECT 1', check_after=30, timeout=60):
+        self.name = name
+        self.factory = factory
+        self.max_size = max_size
+        self.health_query = health_query
+        self.check_after = check_after
+        self.timeout = timeout
+
+        self._idle = []  # (connection, last release time)
+        self._open = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self.stats = {'created': 0, 'reused': 0, 'nested': 0, 'waits': 0, 'health_failures': 0, 'closed': 0}
+
+    def _healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.check_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            if self.health_query:
+                cursor.execute(self.health_query)
+                cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._condition:  # reentrant: close_idle already holds it
+            self.stats['closed'] += 1
+
+    def acquire(self):
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            self.stats['nested'] += 1
+            return held
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._condition:
+                while True:
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                        break
+                    if self._open < self.max_size:
+                        self._open += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No {self.name} connection available after {self.timeout}s "
+                                           f"({self.max_size} in use)")
+                    self.stats['waits'] += 1
+                    self._condition.wait(remaining)
+            if conn is None:
+                break
+
+            # health query outside the lock: a slow or dead server doesn't stall the other threads
+            if self._healthy(conn, idle_since):
+                with self._condition:
+                    self.stats['reused'] += 1
+                self._local.conn, self._local.depth = conn, 1
+                return conn
+            self._discard(conn)
+            with self._condition:
+                self.stats['health_failures'] += 1
+                self._open -= 1
+                self._condition.notify()
+
+        # connect outside the lock: other threads can keep checking out idle connections
+        try:
+            conn = self.factory()
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self.stats['created'] += 1
+        self._local.conn, self._local.depth = conn, 1
+        return conn
+
+    def release(self, conn):
+        if getattr(self._local, 'conn', None) is not conn:
+            raise ValueError(f"{self.name} connection released by a thread that doesn't hold it")
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        # don't hand an open transaction to the next borrower
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_idle(self):
+        with self._condition:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._open -= 1
+                self._discard(conn)
+
+    def report(self):
+        stats = ', '.join(f"{name} {count}" for name, count in self.stats.items())
+        print(f"  {self.name}: {self._open}/{self.max_size} open, {len(self._idle)} idle ({stats})")
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _factories():
+    return {
+        'source': (lambda: source_backend().connect(DatabaseConfig.SOURCE_DATABASE), 'SELECT 1'),
+        'dw': (lambda: dw_backend().connect(DatabaseConfig.TARGET_DATABASE), 'SELECT 1'),
+        # Jet SQL has no FROM-less SELECT: a cursor is enough to detect a dead connection
+        'access': (connect_access, None),
+    }
+
+
+def get_pool(name):
+    """The process-wide pool for 'source', 'dw' or 'access'"""
+    with _pools_lock:
+        if name not in _pools:
+            factory, health_query = _factories()[name]
+            _pools[name] = ConnectionPool(name, factory, max_size=int(DatabaseConfig.POOL_SIZE),
+                                          health_query=health_query)
+        return _pools[name]
+
+
+def source():
+    return get_pool('source')
+
+
+def dw():
+    return get_pool('dw')
+
+
+def access():
+    return get_pool('access')
+
+
+def report():
+    print("\n🔌 CONNECTION POOLS")
+    print("-" * 30)
+    for pool in list(_pools.values()):
+        pool.report()
+
+
+def close_all():
+    for pool in list(_pools.values()):
+        pool.close_idle()
@@ -1,32 +1,286 @@
-import pyodbc
-from DatabaseConfig import DatabaseConfig
+from DatabaseConfig import DatabaseConfig, dw_backend
+import connection_pool
+import warehouse_backend
+
+
+# Star schema, described once for every backend (see warehouse_backend):
+# columns are (name, type, constraints), IDENTITY = auto-numbered primary key
+TABLES = {
+    'DimDate': {
+        'columns': [
+            ('DateKey', 'INT', 'PRIMARY KEY'),
+            ('Date', 'DATE', 'NOT NULL'),
+            ('Year', 'INT', 'NOT NULL'),
+            ('Quarter', 'INT', 'NOT NULL'),
+            ('Month', 'INT', 'NOT NULL'),
+            ('Day', 'INT', 'NOT NULL'),
+            ('MonthName', 'VARCHAR(20)', 'NOT NULL'),
+            ('DayOfWeek', 'VARCHAR(20)', 'NOT NULL'),
+            ('IsWeekend', 'BIT', 'NOT NULL'),
+        ],
+        'unique': [['Date']],
+        'indexes': {
+            'IX_DimDate_Year': ['Year'],
+            'IX_DimDate_YearMonth': ['Year', 'Month'],
+        },
+    },
+    'DimCustomer': {
+        'columns': [
+            ('CustomerKey', 'IDENTITY'),
+            ('CustomerID', 'VARCHAR(10)', 'NOT NULL'),
+            ('CompanyName', 'VARCHAR(100)', 'NOT NULL'),
+            ('ContactName', 'VARCHAR(100)'),
+            ('ContactTitle', 'VARCHAR(100)'),
+            ('Address', 'VARCHAR(200)'),
+            ('City', 'VARCHAR(50)'),
+            ('Region', 'VARCHAR(50)'),
+            ('PostalCode', 'VARCHAR(20)'),
+            ('Country', 'VARCHAR(50)'),
+            ('Phone', 'VARCHAR(30)'),
+            ('SourceSystem', 'VARCHAR(20)'),
+        ],
+        'unique': [['CustomerID', 'SourceSystem']],
+    },
+    'DimEmployee': {
+        'columns': [
+            ('EmployeeKey', 'IDENTITY'),
+            ('EmployeeID', 'INT', 'NOT NULL'),
+            ('LastName', 'VARCHAR(50)', 'NOT NULL'),
+            ('FirstName', 'VARCHAR(50)', 'NOT NULL'),
+            ('Title', 'VARCHAR(100)'),
+            ('TitleOfCourtesy', 'VARCHAR(25)'),
+            ('BirthDate', 'DATE'),
+            ('HireDate', 'DATE'),
+            ('Address', 'VARCHAR(200)'),
+            ('City', 'VARCHAR(50)'),
+            ('Region', 'VARCHAR(50)'),
+            ('PostalCode', 'VARCHAR(20)'),
+            ('Country', 'VARCHAR(50)'),
+            ('HomePhone', 'VARCHAR(30)'),
+            ('ReportsTo', 'INT'),
+            ('SourceSystem', 'VARCHAR(20)'),
+        ],
+        'unique': [['EmployeeID', 'SourceSystem']],
+    },
+    # Ship-to addresses, one row per distinct (name, address, city, region, postal code, country)
+    'DimShipDestination': {
+        'columns': [
+            ('ShipDestinationKey', 'IDENTITY'),
+            ('AddressHash', 'BIGINT', 'NOT NULL'),
+            ('ShipName', 'VARCHAR(100)'),
+            ('ShipAddress', 'VARCHAR(200)'),
+            ('ShipCity', 'VARCHAR(50)'),
+            ('ShipRegion', 'VARCHAR(50)'),
+            ('ShipPostalCode', 'VARCHAR(20)'),
+            ('ShipCountry', 'VARCHAR(50)'),
+        ],
+        'unique': [['AddressHash']],
+    },
+    'DimShipper': {
+        'columns': [
+            ('ShipperKey', 'IDENTITY'),
+            ('ShipperID', 'INT', 'NOT NULL'),
+            ('CompanyName', 'VARCHAR(100)'),
+            ('Phone', 'VARCHAR(30)'),
+            ('SourceSystem', 'VARCHAR(20)'),
+        ],
+        'unique': [['ShipperID', 'SourceSystem']],
+    },
+    'DimProduct': {
+        'columns': [
+            ('ProductKey', 'IDENTITY'),
+            ('ProductID', 'INT', 'NOT NULL'),
+            ('ProductName', 'VARCHAR(100)'),
+            ('CategoryName', 'VARCHAR(50)'),
+            ('QuantityPerUnit', 'VARCHAR(50)'),
+            ('UnitPrice', 'DECIMAL(10,2)'),
+            ('Discontinued', 'BIT'),
+            ('SourceSystem', 'VARCHAR(20)'),
+        ],
+        'unique': [['ProductID', 'SourceSystem']],
+    },
+    # ReportsTo closure: every (manager, report) pair at any depth (see employee_hierarchy.py)
+    'EmployeeHierarchy': {
+        'columns': [
+            ('AncestorKey', 'INT', 'NOT NULL'),
+            ('DescendantKey', 'INT', 'NOT NULL'),
+            ('Depth', 'INT', 'NOT NULL'),
+        ],
+        'unique': [['AncestorKey', 'DescendantKey']],
+        'foreign_keys': [
+            ('AncestorKey', 'DimEmployee', 'EmployeeKey'),
+            ('DescendantKey', 'DimEmployee', 'EmployeeKey'),
+        ],
+        'indexes': {'IX_EmployeeHierarchy_DescendantKey': ['DescendantKey']},
+    },
+    'FactOrders': {
+        'columns': [
+            ('FactOrderKey', 'IDENTITY'),
+            ('OrderID', 'INT', 'NOT NULL'),
+            ('CustomerKey', 'INT'),
+            ('EmployeeKey', 'INT'),
+            ('OrderDateKey', 'INT'),
+            ('OrderDate', 'DATE'),
+            ('RequiredDate', 'DATE'),
+            ('ShippedDate', 'DATE'),
+            ('ShipperKey', 'INT'),
+            ('ShipDestinationKey', 'INT'),
+            ('Freight', 'DECIMAL(10,2)'),
+            ('TotalAmount', 'DECIMAL(10,2)'),
+            ('IsDelivered', 'BIT'),
+            ('DeliveryDelayDays', 'INT'),
+            ('SourceSystem', 'VARCHAR(20)'),
+        ],
+        'foreign_keys': [
+            ('CustomerKey', 'DimCustomer', 'CustomerKey'),
+            ('EmployeeKey', 'DimEmployee', 'EmployeeKey'),
+            ('OrderDateKey', 'DimDate', 'DateKey'),
+            ('ShipperKey', 'DimShipper', 'ShipperKey'),
+            ('ShipDestinationKey', 'DimShipDestination', 'ShipDestinationKey'),
+        ],
+        'indexes': {
+            'IX_FactOrders_OrderDateKey': ['OrderDateKey'],
+            'IX_FactOrders_CustomerKey': ['CustomerKey'],
+            'IX_FactOrders_EmployeeKey': ['EmployeeKey'],
+            'IX_FactOrders_ShipDestinationKey': ['ShipDestinationKey'],
+            # keyset pagination of the orders table (see order_pages.py)
+            'IX_FactOrders_OrderDate_OrderID': ['OrderDate', 'OrderID', 'SourceSystem'],
+            # existence checks of a load batch's OrderID range
+            'IX_FactOrders_Order': ['OrderID', 'SourceSystem'],
+        },
+    },
+    # Order lines; (OrderID, SourceSystem) links them to FactOrders
+    'FactOrderDetails': {
+        'columns': [
+            ('FactOrderDetailKey', 'IDENTITY'),
+            ('OrderID', 'INT', 'NOT NULL'),
+            ('ProductKey', 'INT'),
+            ('Quantity', 'INT'),
+            ('UnitPrice', 'DECIMAL(10,2)'),
+            ('Discount', 'DECIMAL(5,4)'),
+            ('LineAmount', 'DECIMAL(12,2)'),
+            ('SourceSystem', 'VARCHAR(20)'),
+        ],
+        'foreign_keys': [('ProductKey', 'DimProduct', 'ProductKey')],
+        'indexes': {
+            'IX_FactOrderDetails_Order': ['OrderID', 'SourceSystem'],
+            'IX_FactOrderDetails_ProductKey': ['ProductKey'],
+        },
+    },
+    # Aggregates maintained by the ETL (see aggregates.py), partitioned by month / year
+    'AggMonthlyStatus': {
+        'columns': [
+            ('Year', 'INT', 'NOT NULL'),
+            ('Month', 'INT', 'NOT NULL'),
+            ('IsDelivered', 'BIT'),
+            ('OrderCount', 'INT', 'NOT NULL'),
+            ('TotalRevenue', 'DECIMAL(14,2)'),
+        ],
+        'indexes': {'IX_AggMonthlyStatus_YearMonth': ['Year', 'Month']},
+    },
+    'AggCustomerEmployee': {
+        'columns': [
+            ('Year', 'INT', 'NOT NULL'),
+            ('Month', 'INT', 'NOT NULL'),
+            ('CustomerKey', 'INT'),
+            ('EmployeeKey', 'INT'),
+            ('IsDelivered', 'BIT'),
+            ('OrderCount', 'INT', 'NOT NULL'),
+            ('TotalRevenue', 'DECIMAL(14,2)'),
+        ],
+        'indexes': {'IX_AggCustomerEmployee_YearMonth': ['Year', 'Month']},
+    },
+    'AggYearly': {
+        'columns': [
+            ('Year', 'INT', 'PRIMARY KEY'),
+            ('OrderCount', 'INT', 'NOT NULL'),
+            ('DeliveredCount', 'INT', 'NOT NULL'),
+            ('TotalRevenue', 'DECIMAL(14,2)'),
+        ],
+    },
+    # Highest FactOrderKey the aggregates include (a single row, see aggregates.py)
+    'AggWatermark': {
+        'columns': [
+            ('LastFactOrderKey', 'INT', 'NOT NULL'),
+            ('UpdatedAt', 'DATETIME'),
+        ],
+    },
+    # Running RFM and delivery totals per customer (see customer_mart.py)
+    'CustomerMart': {
+        'columns': [
+            ('CustomerKey', 'INT', 'PRIMARY KEY'),
+            ('FirstOrderDate', 'DATETIME'),
+            ('LastOrderDate', 'DATETIME'),
+            ('OrderCount', 'INT', 'NOT NULL'),
+            ('TotalRevenue', 'DECIMAL(14,2)'),
+            ('DeliveredCount', 'INT', 'NOT NULL'),
+            ('OnTimeCount', 'INT', 'NOT NULL'),
+            ('TotalDelayDays', 'INT', 'NOT NULL'),
+            ('LastFactOrderKey', 'INT', 'NOT NULL'),
+            ('UpdatedAt', 'DATETIME'),
+        ],
+        'foreign_keys': [('CustomerKey', 'DimCustomer', 'CustomerKey')],
+        'indexes': {'IX_CustomerMart_LastFactOrderKey': ['LastFactOrderKey']},
+    },
+    # Row counts, date ranges and filter values per source (see stats_catalog.py)
+    'StatsCatalog': {
+        'columns': [
+            ('TableName', 'VARCHAR(50)', 'NOT NULL'),
+            ('ColumnName', 'VARCHAR(50)', 'NOT NULL'),
+            ('SourceSystem', 'VARCHAR(20)', 'NOT NULL'),
+            ('NumRows', 'INT'),
+            ('NumDistinct', 'INT'),
+            ('MinValue', 'VARCHAR(100)'),
+            ('MaxValue', 'VARCHAR(100)'),
+            ('DistinctValues', 'TEXT'),
+            ('UpdatedAt', 'DATETIME'),
+        ],
+        'unique': [['TableName', 'ColumnName', 'SourceSystem']],
+    },
+    # Data quality results
+    'DQResults': {
+        'columns': [
+            ('DQResultKey', 'IDENTITY'),
+            ('RunID', 'VARCHAR(36)', 'NOT NULL'),
+            ('RunAt', 'DATETIME', 'NOT NULL'),
+            ('TableName', 'VARCHAR(50)', 'NOT NULL'),
+            ('RuleName', 'VARCHAR(100)', 'NOT NULL'),
+            ('RuleType', 'VARCHAR(20)'),
+            ('ColumnName', 'VARCHAR(100)'),
+            ('CheckedRows', 'INT'),
+            ('FailedRows', 'INT'),
+        ],
+    },
+    'DQViolations': {
+        'columns': [
+            ('RunID', 'VARCHAR(36)', 'NOT NULL'),
+            ('TableName', 'VARCHAR(50)', 'NOT NULL'),
+            ('RuleName', 'VARCHAR(100)', 'NOT NULL'),
+            ('RecordKey', 'VARCHAR(50)'),
+        ],
+        'indexes': {'IX_DQViolations_RunID': ['RunID']},
+    },
+    # Cross-source customer clusters (entity resolution)
+    'CustomerCluster': {
+        'columns': [
+            ('CustomerKey', 'INT', 'PRIMARY KEY'),
+            ('ClusterKey', 'INT', 'NOT NULL'),
+            ('CanonicalName', 'VARCHAR(100)'),
+            ('SourceSystem', 'VARCHAR(20)'),
+            ('MatchScore', 'DECIMAL(4,3)'),
+        ],
+        'foreign_keys': [('CustomerKey', 'DimCustomer', 'CustomerKey')],
+        'indexes': {'IX_CustomerCluster_ClusterKey': ['ClusterKey']},
+    },
+}
 
 
 def create_datawarehouse():
     try:
-        conn = pyodbc.connect(
-            f'DRIVER={{SQL Server}};'
-            f'SERVER={DatabaseConfig.SQL_SERVER_INSTANCE};'
-            f'DATABASE=master;'
-            'Trusted_Connection=yes;'
-        )
-        cursor = conn.cursor()
-
-        # Check if database exists
-        cursor.execute(f"SELECT name FROM sys.databases WHERE name = '{DatabaseConfig.TARGET_DATABASE}'")
-        if cursor.fetchone():
+        if dw_backend().create_database(DatabaseConfig.TARGET_DATABASE):
+            print(f"Database '{DatabaseConfig.TARGET_DATABASE}' created successfully")
+        else:
             print(f"Database '{DatabaseConfig.TARGET_DATABASE}' already exists")
-            cursor.close()
-            conn.close()
-            return True
-
-        # else create database
-        cursor.execute(f"CREATE DATABASE {DatabaseConfig.TARGET_DATABASE}")
-        conn.commit()
-        print(f"Database '{DatabaseConfig.TARGET_DATABASE}' created successfully")
-
-        cursor.close()
-        conn.close()
         return True
 
     except Exception as e:
@@ -36,112 +290,13 @@ def create_datawarehouse():
 
 #create tables
 def create_dw_schema():
-    try:
-        conn = pyodbc.connect(
-            f'DRIVER={{SQL Server}};'
-            f'SERVER={DatabaseConfig.SQL_SERVER_INSTANCE};'
-            f'DATABASE={DatabaseConfig.TARGET_DATABASE};'
-            'Trusted_Connection=yes;'
-        )
-        cursor = conn.cursor()
-
-        # DimDate
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='DimDate' AND xtype='U')
-            CREATE TABLE DimDate (
-                DateKey INT PRIMARY KEY,
-                Date DATE NOT NULL,
-                Year INT NOT NULL,
-                Quarter INT NOT NULL,
-                Month INT NOT NULL,
-                Day INT NOT NULL,
-                MonthName VARCHAR(20),
-                DayOfWeek VARCHAR(20),
-                IsWeekend BIT,
-                UNIQUE(Date)
-            )
-        """)
-        print("DimDate table created/verified")
+    import migrations
 
-        #DimCustomer
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='DimCustomer' AND xtype='U')
-            CREATE TABLE DimCustomer (
-                CustomerKey INT IDENTITY(1,1) PRIMARY KEY,
-                CustomerID VARCHAR(10) NOT NULL,
-                CompanyName VARCHAR(100) NOT NULL,
-                ContactName VARCHAR(100),
-                ContactTitle VARCHAR(100),
-                Address VARCHAR(200),
-                City VARCHAR(50),
-                Region VARCHAR(50),
-                PostalCode VARCHAR(20),
-                Country VARCHAR(50),
-                Phone VARCHAR(30),
-                SourceSystem VARCHAR(20),
-                UNIQUE(CustomerID, SourceSystem)
-            )
-        """)
-        print("DimCustomer table created/verified")
-
-        # DimEmployee
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='DimEmployee' AND xtype='U')
-            CREATE TABLE DimEmployee (
-                EmployeeKey INT IDENTITY(1,1) PRIMARY KEY,
-                EmployeeID INT NOT NULL,
-                LastName VARCHAR(50) NOT NULL,
-                FirstName VARCHAR(50) NOT NULL,
-                Title VARCHAR(100),
-                TitleOfCourtesy VARCHAR(25),
-                BirthDate DATE,
-                HireDate DATE,
-                Address VARCHAR(200),
-                City VARCHAR(50),
-                Region VARCHAR(50),
-                PostalCode VARCHAR(20),
-                Country VARCHAR(50),
-                HomePhone VARCHAR(30),
-                ReportsTo INT,
-                SourceSystem VARCHAR(20),
-                UNIQUE(EmployeeID, SourceSystem)
-            )
-        """)
-        print("DimEmployee table created/verified")
-
-        #  FactOrders
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='FactOrders' AND xtype='U')
-            CREATE TABLE FactOrders (
-                FactOrderKey INT IDENTITY(1,1) PRIMARY KEY,
-                OrderID INT NOT NULL,
-                CustomerKey INT,
-                EmployeeKey INT,
-                OrderDateKey INT,
-                OrderDate DATE,
-                RequiredDate DATE,
-                ShippedDate DATE,
-                ShipVia INT,
-                Freight DECIMAL(10,2),
-                ShipName VARCHAR(100),
-                ShipAddress VARCHAR(200),
-                ShipCity VARCHAR(50),
-                ShipRegion VARCHAR(50),
-                ShipPostalCode VARCHAR(20),
-                ShipCountry VARCHAR(50),
-                TotalAmount DECIMAL(10,2),
-                IsDelivered BIT,
-                DeliveryDelayDays INT,
-                SourceSystem VARCHAR(20)
-                -- Foreign keys will be added after tables exist
-            )
-        """)
-        print("FactOrders table created/verified")
+    try:
+        with connection_pool.dw().connection() as conn:
+            version = migrations.migrate(conn)
 
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("Data warehouse schema created successfully")
+        print(f"Data warehouse schema at version {version}")
         return True
 
     except Exception as e:
@@ -150,100 +305,32 @@ def create_dw_schema():
 
 
 def add_foreign_keys():
+    """Foreign keys and indexes for a FactOrders created before they were part of the schema"""
     try:
-        conn = pyodbc.connect(
-            f'DRIVER={{SQL Server}};'
-            f'SERVER={DatabaseConfig.SQL_SERVER_INSTANCE};'
-            f'DATABASE={DatabaseConfig.TARGET_DATABASE};'
-            'Trusted_Connection=yes;'
-        )
-        cursor = conn.cursor()
-
-        # for CustomerKey
-        try:
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT * FROM sys.foreign_keys 
-                    WHERE name = 'FK_FactOrders_DimCustomer'
-                )
-                ALTER TABLE FactOrders
-                ADD CONSTRAINT FK_FactOrders_DimCustomer 
-                FOREIGN KEY (CustomerKey) REFERENCES DimCustomer(CustomerKey)
-            """)
-            print("Foreign key FK_FactOrders_DimCustomer added")
-        except:
-            print("Foreign key FK_FactOrders_DimCustomer already exists or couldn't be added")
-
-        # for EmployeeKey
-        try:
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT * FROM sys.foreign_keys 
-                    WHERE name = 'FK_FactOrders_DimEmployee'
-                )
-                ALTER TABLE FactOrders
-                ADD CONSTRAINT FK_FactOrders_DimEmployee 
-                FOREIGN KEY (EmployeeKey) REFERENCES DimEmployee(EmployeeKey)
-            """)
-            print("Foreign key FK_FactOrders_DimEmployee added")
-        except:
-            print("Foreign key FK_FactOrders_DimEmployee already exists or couldn't be added")
-
-        # for OrderDateKey
-        try:
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT * FROM sys.foreign_keys 
-                    WHERE name = 'FK_FactOrders_DimDate'
-                )
-                ALTER TABLE FactOrders
-                ADD CONSTRAINT FK_FactOrders_DimDate 
-                FOREIGN KEY (OrderDateKey) REFERENCES DimDate(DateKey)
-            """)
-            print("Foreign key FK_FactOrders_DimDate added")
-        except:
-            print("Foreign key FK_FactOrders_DimDate already exists or couldn't be added")
+        with connection_pool.dw().connection() as conn:
+            backend = warehouse_backend.backend_for(conn)
+            spec = TABLES['FactOrders']
 
-        # Create indexes for performance
-        try:
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT * FROM sys.indexes 
-                    WHERE name = 'IX_FactOrders_OrderDateKey'
-                )
-                CREATE INDEX IX_FactOrders_OrderDateKey ON FactOrders(OrderDateKey)
-            """)
-            print("Index IX_FactOrders_OrderDateKey created")
-        except:
-            print("Index IX_FactOrders_OrderDateKey already exists or couldn't be created")
+            for column, ref_table, ref_column in spec['foreign_keys']:
+                name = f"FK_FactOrders_{ref_table}"
+                try:
+                    if backend.add_foreign_key(conn, name, 'FactOrders', column, ref_table, ref_column):
+                        print(f"Foreign key {name} added")
+                    else:
+                        print(f"Foreign key {name} declared with the table")
+                except Exception:
+                    print(f"Foreign key {name} already exists or couldn't be added")
 
-        try:
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT * FROM sys.indexes 
-                    WHERE name = 'IX_FactOrders_CustomerKey'
-                )
-                CREATE INDEX IX_FactOrders_CustomerKey ON FactOrders(CustomerKey)
-            """)
-            print("Index IX_FactOrders_CustomerKey created")
-        except:
-            print("Index IX_FactOrders_CustomerKey already exists or couldn't be created")
+            # Create indexes for performance
+            for index, columns in spec['indexes'].items():
+                try:
+                    backend.create_index(conn, index, 'FactOrders', columns)
+                    print(f"Index {index} created")
+                except Exception:
+                    print(f"Index {index} already exists or couldn't be created")
 
-        try:
-            cursor.execute("""
-                IF NOT EXISTS (
-                    SELECT * FROM sys.indexes 
-                    WHERE name = 'IX_FactOrders_EmployeeKey'
-                )
-                CREATE INDEX IX_FactOrders_EmployeeKey ON FactOrders(EmployeeKey)
-            """)
-            print("Index IX_FactOrders_EmployeeKey created")
-        except:
-            print("Index IX_FactOrders_EmployeeKey already exists or couldn't be created")
+            conn.commit()
 
-        conn.commit()
-        cursor.close()
-        conn.close()
         print("Foreign keys and indexes added successfully")
         return True
 
@@ -257,4 +344,4 @@ if __name__ == "__main__":
     if create_datawarehouse():
         if create_dw_schema():
             add_foreign_keys()
-            print("Data warehouse setup complete!")
\ No newline at end of file
+            print("Data warehouse setup complete!")
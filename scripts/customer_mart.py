@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pandas as pd
+
+import typed_schema
+import warehouse_backend
+
+
+# CustomerMart: running recency / frequency / monetary and delivery totals per
+# CustomerKey. Each refresh aggregates only the FactOrders rows past the mart's
+# watermark (the highest FactOrderKey merged so far, kept on every row as
+# LastFactOrderKey) and adds them to the totals of the customers they touch.
+MART = typed_schema.CUSTOMER_MART
+SUMMED = ['OrderCount', 'TotalRevenue', 'DeliveredCount', 'OnTimeCount', 'TotalDelayDays']
+
+
+def watermark(conn):
+    """Highest FactOrderKey already merged into the mart (0 for an empty mart)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(LastFactOrderKey) FROM CustomerMart")
+        return cursor.fetchone()[0] or 0
+    finally:
+        cursor.close()
+
+
+def batch_totals(conn, after_key):
+    """Per-customer totals of the orders past `after_key` (a range seek on the FactOrders key)"""
+    totals = pd.read_sql(f"""
+        SELECT
+            CustomerKey,
+            MIN(OrderDate) AS FirstOrderDate,
+            MAX(OrderDate) AS LastOrderDate,
+            COUNT(*) AS OrderCount,
+            SUM(TotalAmount) AS TotalRevenue,
+            SUM(CASE WHEN IsDelivered = 1 THEN 1 ELSE 0 END) AS DeliveredCount,
+            SUM(CASE WHEN IsDelivered = 1 AND DeliveryDelayDays <= 0 THEN 1 ELSE 0 END) AS OnTimeCount,
+            SUM(CASE WHEN DeliveryDelayDays > 0 THEN DeliveryDelayDays ELSE 0 END) AS TotalDelayDays,
+            MAX(FactOrderKey) AS LastFactOrderKey
+        FROM FactOrders
+        WHERE FactOrderKey > {int(after_key)} AND CustomerKey IS NOT NULL
+        GROUP BY CustomerKey
+    """, conn)
+    return typed_schema.apply_schema(totals, {name: dtype for name, dtype in MART.items() if name != 'UpdatedAt'})
+
+
+def merge_totals(batch, current):
+    """Add the batch totals to the current rows of the same customers (new customers start from zero)"""
+    merged = batch.merge(current, on='CustomerKey', how='left', suffixes=('', '_current'))
+    for column in SUMMED:
+        merged[column] = merged[column].fillna(0) + merged[f'{column}_current'].fillna(0)
+    merged['FirstOrderDate'] = merged[['FirstOrderDate', 'FirstOrderDate_current']].min(axis=1)
+    merged['LastOrderDate'] = merged[['LastOrderDate', 'LastOrderDate_current']].max(axis=1)
+    merged['UpdatedAt'] = datetime.now()
+    return typed_schema.apply_schema(merged, MART)
+
+
+def refresh(conn):
+    """
+    Merge the orders loaded since the last refresh into CustomerMart.
+
+    Reads the delta's per-customer totals and the mart rows of those customers
+    only, then upserts the sums; returns the number of customers updated.
+    """
+    after_key = watermark(conn)
+    batch = batch_totals(conn, after_key)
+    if batch.empty:
+        return 0
+
+    current = pd.read_sql(f"""
+        SELECT {', '.join(MART)} FROM CustomerMart
+        WHERE CustomerKey IN (
+            SELECT CustomerKey FROM FactOrders WHERE FactOrderKey > {int(after_key)}
+        )
+    """, conn)
+    current = typed_schema.apply_schema(current, MART)
+
+    mart = merge_totals(batch, current)
+    # every row of the batch carries the new watermark, not just the customers of its last order
+    mart['LastFactOrderKey'] = batch['LastFactOrderKey'].max()
+    return warehouse_backend.backend_for(conn).upsert(conn, 'CustomerMart', mart, ['CustomerKey'], list(MART))
+
+
+def metrics(mart, as_of=None):
+    """RFM and delivery ratios derived from the running totals (no fact scan)"""
+    as_of = pd.Timestamp(as_of or datetime.now())
+    orders = mart['OrderCount'].astype('float64')
+    delivered = mart['DeliveredCount'].astype('float64')
+    return mart.assign(
+        RecencyDays=(as_of - mart['LastOrderDate']).dt.days,
+        AvgOrderValue=mart['TotalRevenue'] / orders.where(orders > 0),
+        DeliveryRate=delivered / orders.where(orders > 0),
+        OnTimeRate=mart['OnTimeCount'] / delivered.where(delivered > 0),
+        AvgDelayDays=mart['TotalDelayDays'] / delivered.where(delivered > 0),
+    )
@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
 import numpy as np
 import os
 import io
+from contextlib import contextmanager
 
 # Page configuration
 st.set_page_config(
@@ -127,74 +129,170 @@ st.markdown("""
 
 # Database connection function
 @st.cache_resource
-def connect_to_dw():
-    """Connect to data warehouse"""
+def dw_pool():
+    """Data warehouse connection pool, shared by every session of this process"""
+    import connection_pool
+    import migrations
+
+    pool = connection_pool.dw()
+    # one schema version read per process
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+    return pool
+
+
+def connect_to_mirror():
+    """Read-only connection to the DuckDB mirror of the DW (None if not used / not built yet)"""
     try:
-        from DatabaseConfig import connect_data_warehouse
-        conn = connect_data_warehouse()
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to DW: {e}")
+        from DatabaseConfig import DatabaseConfig
+        import analytics_mirror
+        path = DatabaseConfig.MIRROR_DATABASE
+        if DatabaseConfig.DASHBOARD_SOURCE != 'mirror' or not path or not os.path.exists(path):
+            return None
+        return analytics_mirror.connect_mirror(path, read_only=True)
+    except Exception:
         return None
 
 
-# Load data from DW
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def load_dashboard_data():
-    """Load data for dashboard from Data Warehouse"""
-    conn = connect_to_dw()
-    if conn is None:
-        return pd.DataFrame()
+@contextmanager
+def dashboard_connection():
+    """The DuckDB mirror when it is used, else a DW connection from the pool"""
+    conn = connect_to_mirror()
+    if conn is not None:
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
 
+    # each session runs in its own thread and checks out its own connection
+    conn = dw_pool().acquire()
     try:
-        # Query for dashboard data
-        query = """
-        SELECT 
-            fo.OrderID,
-            fo.OrderDate,
-            fo.ShippedDate,
-            fo.TotalAmount,
-            fo.IsDelivered,
-            fo.SourceSystem,
-            dc.CompanyName as CustomerName,
-            de.FirstName + ' ' + de.LastName as EmployeeName
-        FROM FactOrders fo
-        LEFT JOIN DimCustomer dc ON fo.CustomerKey = dc.CustomerKey
-        LEFT JOIN DimEmployee de ON fo.EmployeeKey = de.EmployeeKey
-        WHERE fo.OrderDate IS NOT NULL
-        ORDER BY fo.OrderDate DESC
-        """
-
-        df = pd.read_sql(query, conn)
-        conn.close()
-
-        # Process dates - SAFELY
-        if 'OrderDate' in df.columns:
-            df['OrderDate'] = pd.to_datetime(df['OrderDate'], errors='coerce')
-            df['Year'] = df['OrderDate'].dt.year
-            df['Month'] = df['OrderDate'].dt.month
-            df['YearMonth'] = df['OrderDate'].dt.strftime('%Y-%m')
-
-        if 'ShippedDate' in df.columns:
-            df['ShippedDate'] = pd.to_datetime(df['ShippedDate'], errors='coerce')
-
-        # Calculate delivery status
-        df['Status'] = df['IsDelivered'].apply(lambda x: 'Livrée' if x == 1 else 'Non Livrée')
-
-        # Fill NaN values
-        df['CustomerName'] = df['CustomerName'].fillna('Unknown Customer')
-        df['EmployeeName'] = df['EmployeeName'].fillna('Unknown Employee')
-
-        return df
+        yield conn
+    finally:
+        dw_pool().release(conn)
+
+
+def snapshot_stamp():
+    """Version stamp of the latest snapshot published by the ETL (None if there is none)"""
+    from DatabaseConfig import DatabaseConfig
+    import snapshot
+    if not DatabaseConfig.SNAPSHOT_DIRECTORY:
+        return None
+    return snapshot.latest(DatabaseConfig.SNAPSHOT_DIRECTORY)
+
+
+# The dataset is loaded once per server process and shared by every session:
+# nothing below modifies it, sessions only build filter masks over it.
+@st.cache_resource(max_entries=2)
+def load_snapshot(version):
+    """A published snapshot, memory-mapped once per process and version"""
+    from DatabaseConfig import DatabaseConfig
+    import snapshot
+    dataset = index_dataset(snapshot.read(DatabaseConfig.SNAPSHOT_DIRECTORY, version))
+    dataset['version'] = f"snapshot-{version}"
+    return dataset
 
+
+# Load data from DW
+@st.cache_resource(ttl=300)  # Cache for 5 minutes
+def load_live_dataset():
+    """The same dataset queried from the DuckDB mirror or the Data Warehouse, when there's no snapshot"""
+    import dashboard_data
+    try:
+        with dashboard_connection() as conn:
+            dataset = dashboard_data.build(conn)
     except Exception as e:
         st.error(f"Error loading dashboard data: {e}")
-        return pd.DataFrame()
+        return None
+    # same shape as a snapshot: the order rows as one Arrow table
+    dataset['orders'] = pa.Table.from_pandas(dataset['orders'], preserve_index=False)
+    dataset['version'] = f"live-{datetime.now().isoformat()}"
+    return index_dataset(dataset)
+
+
+def index_dataset(dataset):
+    """Filter indexes of the order rows, the cube and the monthly table (see filter_index.py)"""
+    from filter_index import FilterIndex
+    filter_columns = ['Year', 'CustomerName', 'EmployeeName', 'IsDelivered']
+    dataset['indexes'] = {
+        'orders': FilterIndex.build(dataset['orders'], filter_columns),
+        'cube': FilterIndex.build(dataset['cube'], filter_columns),
+        'monthly': FilterIndex.build(dataset['monthly'], ['Year', 'IsDelivered']),
+    }
+    return dataset
+
+
+def load_dataset():
+    """
+    Order rows, aggregates, team rollup and filter lists (see dashboard_data.py).
+
+    Served from the latest snapshot when the ETL has published one: only the
+    stamp is read on each rerun and the snapshot is reloaded when its version
+    changes, so a cold start doesn't wait for the warehouse.
+    """
+    stamp = snapshot_stamp()
+    if stamp is not None:
+        try:
+            return load_snapshot(stamp['version'])
+        except Exception:
+            pass
+    return load_live_dataset()
+
+
+def query_mode():
+    """DASHBOARD_MODE = query: filters are pushed down to the warehouse instead of loading the dataset"""
+    from DatabaseConfig import DatabaseConfig
+    return DatabaseConfig.DASHBOARD_MODE == 'query'
+
+
+@st.cache_data(ttl=300)
+def load_query_base():
+    """Query mode: yearly KPIs, team rollup, filter lists and name -> key lookups (all small)"""
+    import dashboard_query
+    try:
+        with dashboard_connection() as conn:
+            base = dashboard_query.base(conn)
+    except Exception as e:
+        st.error(f"Error loading dashboard data: {e}")
+        return None
+    base['version'] = f"query-{datetime.now().isoformat()}"
+    return base
+
+
+@st.cache_data(ttl=300, max_entries=64)
+def query_filtered(version, years, customers, employees, status):
+    """Query mode: cube cells and monthly rows of one filter combination"""
+    import dashboard_query
+    filters = {'years': years, 'customers': customers, 'employees': employees, 'status': status}
+    lookups = load_query_base()['lookups']
+    with dashboard_connection() as conn:
+        cube = dashboard_query.cube(conn, filters, lookups)
+        # without customer / employee filters the monthly table is enough for the trend
+        monthly = cube if customers or employees else dashboard_query.monthly(conn, filters)
+    return {'cube': cube, 'monthly': monthly}
+
+
+def query_page(version, filters, rows, descending, after):
+    """Query mode: one keyset page of the selected orders, straight from the warehouse"""
+    import dashboard_query
+    names = dict(zip(['years', 'customers', 'employees', 'status'], filters))
+    with dashboard_connection() as conn:
+        return dashboard_query.keyset_page(conn, names, load_query_base()['lookups'], rows, descending, after)
+
+
+def query_orders(version, filters):
+    """Query mode: every selected order (the exports), page after page from the warehouse"""
+    import dashboard_query
+    names = dict(zip(['years', 'customers', 'employees', 'status'], filters))
+    with dashboard_connection() as conn:
+        return dashboard_query.all_orders(conn, names, load_query_base()['lookups'])
 
 
 # Function to run ETL
 def run_etl():
     """Run ETL process"""
+    etl_processor = None
     try:
         from etl import etl
         etl_processor = etl()
@@ -202,11 +300,381 @@ def run_etl():
         return True, "✅ ETL completed successfully!"
     except Exception as e:
         return False, f"❌ ETL Error: {str(e)}"
+    finally:
+        if etl_processor is not None:
+            etl_processor.close()
+
+
+# Everything derived from a filtered selection (grouped frames, figures, export
+# bytes) is kept in one bounded LRU per process, keyed by (dataset version,
+# filter tuple, section[, chart type]); the sections below run as fragments, so a
+# widget inside one of them reruns that section only.
+GRAPH_TYPES = ['Scatter 3D', 'Surface 3D', 'Bubble 3D']
+SORT_ORDERS = {"Plus récentes d'abord": True, "Plus anciennes d'abord": False}
+# query mode: exports above this many orders get a warning before they are read
+EXPORT_WARNING_ROWS = 100_000
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda function: function)
+
+
+@st.cache_resource
+def section_cache():
+    import memo
+    return memo.LRUCache(max_entries=64)
+
+
+def cached(key, compute):
+    return section_cache().get_or_compute(key, compute)
+
+
+def figure_3d(cube, graph):
+    """(figure, customer x employee rollup) of the filtered cube; no figure when a surface has too few points"""
+    # Roll the monthly cells up to customer x employee
+    grouped = cube.groupby(['CustomerName', 'EmployeeName'])[
+        ['OrderCount', 'TotalRevenue', 'DeliveredCount']
+    ].sum().reset_index()
+    grouped['DeliveryRate'] = grouped['DeliveredCount'] / grouped['OrderCount']
+
+    if graph == 'Scatter 3D':
+        fig = go.Figure(data=[go.Scatter3d(
+            x=grouped['CustomerName'],
+            y=grouped['EmployeeName'],
+            z=grouped['OrderCount'],
+            mode='markers',
+            marker=dict(
+                size=grouped['TotalRevenue'] / grouped['TotalRevenue'].max() * 30 + 5,
+                color=grouped['DeliveryRate'],
+                colorscale='Viridis',
+                showscale=True,
+                colorbar=dict(title="Taux Livraison")
+            ),
+            text=[
+                f"Client: {c}<br>Employé: {e}<br>Commandes: {oc}<br>Revenu: ${tr:,.0f}<br>Taux Livraison: {dr * 100:.1f}%"
+                for c, e, oc, tr, dr in zip(
+                    grouped['CustomerName'], grouped['EmployeeName'],
+                    grouped['OrderCount'], grouped['TotalRevenue'], grouped['DeliveryRate']
+                )
+            ],
+            hoverinfo='text'
+        )])
+
+        fig.update_layout(
+            scene=dict(
+                xaxis_title="Client",
+                yaxis_title="Employé",
+                zaxis_title="Nombre Commandes"
+            ),
+            title="Commandes par Client et Employé (3D Scatter)",
+            height=600
+        )
+
+    elif graph == 'Surface 3D':
+        # Create pivot table for surface plot
+        pivot = cube.pivot_table(
+            values='OrderCount',
+            index='CustomerName',
+            columns='EmployeeName',
+            aggfunc='sum',
+            fill_value=0
+        )
+
+        # Get the data for surface
+        customers = pivot.index.tolist()
+        employees = pivot.columns.tolist()
+        z_data = pivot.values
+
+        # Check if we have enough data for surface plot
+        if len(customers) >= 2 and len(employees) >= 2:
+            fig = go.Figure(data=[go.Surface(
+                x=employees,
+                y=customers,
+                z=z_data,
+                colorscale='Viridis',
+                contours={
+                    "z": {"show": True, "usecolormap": True, "highlightcolor": "limegreen",
+                          "project": {"z": True}}
+                }
+            )])
+
+            fig.update_layout(
+                scene=dict(
+                    xaxis_title="Employé",
+                    yaxis_title="Client",
+                    zaxis_title="Nombre Commandes"
+                ),
+                title="Commandes par Client et Employé (3D Surface)",
+                height=600
+            )
+        else:
+            fig = None
+
+    elif graph == 'Bubble 3D':
+        fig = go.Figure(data=[go.Scatter3d(
+            x=grouped['CustomerName'],
+            y=grouped['EmployeeName'],
+            z=grouped['OrderCount'],
+            mode='markers+text',
+            marker=dict(
+                size=grouped['OrderCount'] * 2,
+                color=grouped['TotalRevenue'],
+                colorscale='Rainbow',
+                showscale=True,
+                colorbar=dict(title="Revenu Total")
+            ),
+            text=grouped['OrderCount'].astype(str),
+            textposition="middle center",
+            hovertext=[
+                f"Client: {c}<br>Employé: {e}<br>Commandes: {oc}<br>Revenu: ${tr:,.0f}"
+                for c, e, oc, tr in zip(
+                    grouped['CustomerName'], grouped['EmployeeName'],
+                    grouped['OrderCount'], grouped['TotalRevenue']
+                )
+            ],
+            hoverinfo='text'
+        )])
+
+        fig.update_layout(
+            scene=dict(
+                xaxis_title="Client",
+                yaxis_title="Employé",
+                zaxis_title="Nombre Commandes"
+            ),
+            title="Commandes par Client et Employé (Bubble 3D)",
+            height=600
+        )
+
+    return fig, grouped
+
+
+def evolution_figures(monthly):
+    """Bar and line charts of the orders per month and status"""
+    # Group by YearMonth and status
+    grouped = monthly.groupby(['YearMonth', 'Status'])['OrderCount'].sum().reset_index(name='Count')
+
+    fig = px.bar(
+        grouped,
+        x='YearMonth',
+        y='Count',
+        color='Status',
+        barmode='group',
+        color_discrete_map={'Livrée': '#198754', 'Non Livrée': '#dc3545'},
+        title="Évolution des Commandes (Livrées vs Non Livrées)"
+    )
+
+    fig.update_layout(
+        xaxis_title="Mois",
+        yaxis_title="Nombre de Commandes",
+        hovermode='x unified',
+        legend_title="Statut"
+    )
+
+    # Line chart alternative
+    fig2 = px.line(
+        grouped,
+        x='YearMonth',
+        y='Count',
+        color='Status',
+        markers=True,
+        title="Tendance des Commandes (Ligne)"
+    )
+
+    fig2.update_layout(
+        xaxis_title="Mois",
+        yaxis_title="Nombre de Commandes",
+        hovermode='x unified'
+    )
+    return fig, fig2
+
+
+def team_figure(teams, years):
+    """Revenue of each manager's team (reports at every level) over the selected years"""
+    if years:
+        teams = teams[teams['Year'].isin(years)]
+    teams = teams.groupby('ManagerName')[['OrderCount', 'TotalRevenue']].sum().reset_index()
+
+    fig = px.bar(
+        teams.sort_values('TotalRevenue', ascending=False),
+        x='ManagerName',
+        y='TotalRevenue',
+        hover_data=['OrderCount'],
+        title="Revenu par Équipe (Manager et ses Subordonnés)"
+    )
+    fig.update_layout(xaxis_title="Manager", yaxis_title="Revenu")
+    return fig
+
+
+def order_table(filtered_df):
+    """
+    The order rows to display. Dates and amounts stay typed: the table formats
+    them through its column config, the exports write them as dates and numbers.
+    """
+    display_df = filtered_df
+
+    # whole-column conversions, no per-row Python call
+    for column in ('OrderDate', 'ShippedDate'):
+        if column in display_df.columns:
+            display_df[column] = pd.to_datetime(display_df[column], errors='coerce')
+    if 'TotalAmount' in display_df.columns:
+        display_df['TotalAmount'] = pd.to_numeric(display_df['TotalAmount'], errors='coerce').fillna(0.0)
+
+    # Select columns to display
+    cols_to_display = ['OrderID', 'OrderDate', 'ShippedDate', 'CustomerName',
+                       'EmployeeName', 'TotalAmount', 'Status', 'SourceSystem']
+    available_cols = [col for col in cols_to_display if col in display_df.columns]
+
+    return display_df[available_cols]
+
+
+def excel_bytes(display_df):
+    # FIXED: Correct Excel export for newer pandas
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        display_df.to_excel(writer, index=False, sheet_name='Orders')
+        writer._save()  # Use _save() instead of save()
+    return buffer.getvalue()
+
+
+@fragment
+def chart_3d_section(version, filters, filtered_cube):
+    # Graph type selection
+    selected_graph = st.selectbox(
+        "Type de graphique 3D:",
+        options=GRAPH_TYPES
+    )
 
+    if not filtered_cube.empty:
+        fig, grouped = cached((version, filters, '3d', selected_graph),
+                              lambda: figure_3d(filtered_cube, selected_graph))
+        if fig is None:
+            st.info("Not enough data for 3D Surface plot. Need at least 2 customers and 2 employees.")
+            fig = go.Figure().update_layout(
+                title="Not enough data for 3D Surface plot"
+            )
+
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Show data summary
+        with st.expander("📊 Résumé des données 3D"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Clients affichés", grouped['CustomerName'].nunique())
+            with col2:
+                st.metric("Employés affichés", grouped['EmployeeName'].nunique())
+            with col3:
+                st.metric("Relations totales", len(grouped))
+    else:
+        st.warning("No data available for visualization. Please apply different filters.")
+
+
+@fragment
+def evolution_section(version, filters, filtered_monthly):
+    if not filtered_monthly.empty:
+        fig, fig2 = cached((version, filters, 'evolution'), lambda: evolution_figures(filtered_monthly))
+        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig2, use_container_width=True)
+    else:
+        st.warning("No data available for evolution chart.")
+
+
+@fragment
+def team_section(version, years, teams):
+    # only the year filter applies to the team rollup
+    if not teams.empty:
+        fig3 = cached((version, (tuple(years),), 'teams'), lambda: team_figure(teams, years))
+        st.plotly_chart(fig3, use_container_width=True)
+
+
+@fragment
+def orders_section(version, filters, total, load_page, load_rows, export_on_request=False):
+    """
+    The selected orders one page at a time (keyset pagination, see order_pages.py):
+    only the visible page is fetched and sent to the browser, whatever its number.
+    `export_on_request`: the exports read the whole selection from the warehouse,
+    only once asked to
+    """
+    import order_pages
+    if not total:
+        st.warning("No data available to display.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Commandes par page:", options=order_pages.PAGE_SIZES, index=1)
+    with col2:
+        sort_order = st.radio("Ordre:", options=list(SORT_ORDERS), horizontal=True)
+    descending = SORT_ORDERS[sort_order]
+
+    # the keys each page visited so far starts after; back to page 1 when the selection changes
+    selection = (version, filters, page_size, descending)
+    if st.session_state.get('order_pages', {}).get('selection') != selection:
+        st.session_state.order_pages = {'selection': selection, 'cursors': [None]}
+    cursors = st.session_state.order_pages['cursors']
+
+    def page():
+        rows, next_key = load_page(page_size, descending, cursors[-1])
+        return order_table(rows), next_key
+
+    display_df, next_key = cached((*selection, 'page', cursors[-1]), page)
+
+    # Show data table - FIXED Streamlit warning
+    st.dataframe(
+        display_df,
+        width='stretch',
+        hide_index=True,
+        column_config={
+            "OrderID": st.column_config.NumberColumn("ID", format="%d"),
+            "OrderDate": st.column_config.DateColumn("Date Commande", format="YYYY-MM-DD"),
+            "ShippedDate": st.column_config.DateColumn("Date Livraison", format="YYYY-MM-DD"),
+            "CustomerName": "Client",
+            "EmployeeName": "Employé",
+            "TotalAmount": st.column_config.NumberColumn("Montant", format="$%.2f"),
+            "Status": "Statut",
+            "SourceSystem": "Source"
+        }
+    )
+
+    # the buttons move the cursor before the fragment reruns
+    first = (len(cursors) - 1) * page_size + 1
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Précédente", disabled=len(cursors) == 1, on_click=cursors.pop,
+                  use_container_width=True)
+    with col2:
+        st.caption(f"Page {len(cursors)} · commandes {first:,}–{first + len(display_df) - 1:,} sur {total:,}")
+    with col3:
+        st.button("Suivante ▶", disabled=next_key is None, on_click=cursors.append, args=(next_key,),
+                  use_container_width=True)
+
+    # Export options - FIXED Excel export
+    export_key = (version, filters, 'export')
+    if export_on_request and st.session_state.get('order_export') != export_key:
+        if total > EXPORT_WARNING_ROWS:
+            st.warning(f"L'export lit les {total:,} commandes sélectionnées dans l'entrepôt : "
+                       "affinez les filtres pour un fichier plus léger.")
+        st.button(f"📦 Préparer l'export ({total:,} commandes)", on_click=st.session_state.__setitem__,
+                  args=('order_export', export_key), use_container_width=True)
+        return
+
+    export_df = cached(export_key, lambda: order_table(load_rows()))
+    col1, col2 = st.columns(2)
+    with col1:
+        csv = cached((version, filters, 'csv'),
+                     lambda: export_df.to_csv(index=False, date_format='%Y-%m-%d').encode('utf-8'))
+        st.download_button(
+            label="📥 Télécharger CSV",
+            data=csv,
+            file_name="northwind_orders.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            label="📥 Télécharger Excel",
+            data=cached((version, filters, 'xlsx'), lambda: excel_bytes(export_df)),
+            file_name="northwind_orders.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True
+        )
 
-# Initialize session state for data
-if 'data' not in st.session_state:
-    st.session_state.data = load_dashboard_data()
 
 if 'last_refresh' not in st.session_state:
     st.session_state.last_refresh = datetime.now()
@@ -222,9 +690,12 @@ with col2:
             success, message = run_etl()
             if success:
                 st.success(message)
-                # Clear cache and reload data
+                # Clear cache and reload data: the live dataset is a resource (shared by
+                # the sessions), and so are the sections computed from it
                 st.cache_data.clear()
-                st.session_state.data = load_dashboard_data()
+                load_live_dataset.clear()
+                section_cache().clear()
+                st.session_state.pop('order_pages', None)
                 st.session_state.last_refresh = datetime.now()
                 st.rerun()
             else:
@@ -237,11 +708,12 @@ st.caption(f"*Dernière actualisation: {st.session_state.last_refresh.strftime('
 st.markdown('<h2 class="section-title">Indicateurs Clés</h2>', unsafe_allow_html=True)
 col1, col2, col3 = st.columns(3)
 
-df = st.session_state.data
+aggs = load_query_base() if query_mode() else load_dataset()
+has_data = aggs is not None and not aggs['yearly'].empty
 
-if not df.empty:
-    total_orders = len(df)
-    delivered_orders = df['IsDelivered'].sum() if 'IsDelivered' in df.columns else 0
+if has_data:
+    total_orders = int(aggs['yearly']['OrderCount'].sum())
+    delivered_orders = int(aggs['yearly']['DeliveredCount'].sum())
     not_delivered = total_orders - delivered_orders
     delivery_rate = (delivered_orders / total_orders * 100) if total_orders > 0 else 0
 
@@ -280,9 +752,16 @@ else:
 # Filters in sidebar
 st.sidebar.markdown("## Filtres")
 
-if not df.empty:
+if has_data:
+    # filter lists straight from the catalog; scanned from the aggregates if it isn't there yet
+    options = aggs['options'] or {
+        'Year': sorted(aggs['yearly']['Year'].unique()),
+        'CustomerName': sorted(aggs['cube']['CustomerName'].unique()),
+        'EmployeeName': sorted(aggs['cube']['EmployeeName'].unique()),
+    }
+
     # Year filter
-    years = sorted(df['Year'].dropna().unique())
+    years = options['Year']
     selected_years = st.sidebar.multiselect(
         "Année:",
         options=years,
@@ -290,7 +769,7 @@ if not df.empty:
     )
 
     # Customer filter
-    customers = sorted(df['CustomerName'].dropna().unique())
+    customers = options['CustomerName']
     selected_customers = st.sidebar.multiselect(
         "Client:",
         options=customers,
@@ -298,7 +777,7 @@ if not df.empty:
     )
 
     # Employee filter
-    employees = sorted(df['EmployeeName'].dropna().unique())
+    employees = options['EmployeeName']
     selected_employees = st.sidebar.multiselect(
         "Employé:",
         options=employees,
@@ -312,37 +791,64 @@ if not df.empty:
         options=status_options
     )
 
-    # Graph type selection
-    graph_types = ['Scatter 3D', 'Surface 3D', 'Bubble 3D']
-    selected_graph = st.sidebar.selectbox(
-        "Type de graphique 3D:",
-        options=graph_types
-    )
-
-    # Apply filters
-    filtered_df = df.copy()
-
-    if selected_years:
-        filtered_df = filtered_df[filtered_df['Year'].isin(selected_years)]
-
-    if selected_customers:
-        filtered_df = filtered_df[filtered_df['CustomerName'].isin(selected_customers)]
-
-    if selected_employees:
-        filtered_df = filtered_df[filtered_df['EmployeeName'].isin(selected_employees)]
-
-    if selected_status == 'Livrées':
-        filtered_df = filtered_df[filtered_df['IsDelivered'] == 1]
-    elif selected_status == 'Non Livrées':
-        filtered_df = filtered_df[filtered_df['IsDelivered'] == 0]
+    # the selection every cached section is keyed on, with the dataset version
+    version = aggs['version']
+    filters = (tuple(selected_years), tuple(selected_customers), tuple(selected_employees), selected_status)
+
+    # Apply filters (same filters on the aggregates, the monthly table and the order rows),
+    # answered by the dataset's filter indexes as one boolean mask per table
+    def filter_mask(table, by_customer_employee=True):
+        conditions = []
+        if selected_years:
+            conditions.append(('Year', selected_years))
+        if by_customer_employee and selected_customers:
+            conditions.append(('CustomerName', selected_customers))
+        if by_customer_employee and selected_employees:
+            conditions.append(('EmployeeName', selected_employees))
+        if selected_status == 'Livrées':
+            conditions.append(('IsDelivered', [1]))
+        elif selected_status == 'Non Livrées':
+            conditions.append(('IsDelivered', [0]))
+        return aggs['indexes'][table].mask(conditions)
+
+    if query_mode():
+        # only the matching aggregate cells and pages of orders come back from the warehouse
+        filtered = query_filtered(version, *filters)
+        filtered_cube, filtered_monthly = filtered['cube'], filtered['monthly']
+
+        def load_page(rows, descending, after):
+            return query_page(version, filters, rows, descending, after)
+
+        def load_rows():
+            return query_orders(version, filters)
+    else:
+        cube = aggs['cube']
+        filtered_cube = cube[filter_mask('cube')]
+        orders = aggs['orders']
+
+        # pages are cut from the positions of the selected rows in the shared (sorted) table
+        def load_page(rows, descending, after):
+            import order_pages
+            selected = cached((version, filters, 'positions'), lambda: np.flatnonzero(filter_mask('orders')))
+            return order_pages.table_page(orders, selected, rows, descending, after)
+
+        def load_rows():
+            return orders.filter(pa.array(filter_mask('orders'))).to_pandas()
+
+        # without customer / employee filters the monthly table is enough for the trend
+        if selected_customers or selected_employees:
+            filtered_monthly = filtered_cube
+        else:
+            monthly = aggs['monthly']
+            filtered_monthly = monthly[filter_mask('monthly', by_customer_employee=False)]
 
     # Summary stats in sidebar
     st.sidebar.markdown("## Résumé")
-    if not filtered_df.empty:
-        total_filtered = len(filtered_df)
-        delivered_filtered = filtered_df['IsDelivered'].sum()
+    if not filtered_cube.empty:
+        total_filtered = int(filtered_cube['OrderCount'].sum())
+        delivered_filtered = int(filtered_cube['DeliveredCount'].sum())
         not_delivered_filtered = total_filtered - delivered_filtered
-        revenue_filtered = filtered_df['TotalAmount'].sum()
+        revenue_filtered = filtered_cube['TotalRevenue'].sum()
         avg_order_filtered = revenue_filtered / total_filtered if total_filtered > 0 else 0
 
         st.sidebar.metric("Commandes filtrées", f"{total_filtered:,}")
@@ -350,283 +856,31 @@ if not df.empty:
         st.sidebar.metric("Non livrées", f"{not_delivered_filtered:,}")
         st.sidebar.metric("Revenu total", f"${revenue_filtered:,.0f}")
         st.sidebar.metric("Moyenne/commande", f"${avg_order_filtered:,.0f}")
-        st.sidebar.metric("Clients uniques", filtered_df['CustomerName'].nunique())
-        st.sidebar.metric("Employés uniques", filtered_df['EmployeeName'].nunique())
+        st.sidebar.metric("Clients uniques", filtered_cube['CustomerName'].nunique())
+        st.sidebar.metric("Employés uniques", filtered_cube['EmployeeName'].nunique())
 else:
-    filtered_df = pd.DataFrame()
-    selected_graph = 'Scatter 3D'
+    load_page = load_rows = None
+    filtered_cube = filtered_monthly = pd.DataFrame()
+    version, filters, selected_years = None, (), []
 
 # Main content area
 tab1, tab2, tab3 = st.tabs(["📊 Graphique 3D", "📈 Évolution", "📋 Données"])
 
 with tab1:
     st.markdown('<h2 class="section-title">Commandes par Client et Employé (3D)</h2>', unsafe_allow_html=True)
-
-    if not filtered_df.empty:
-        # Remove rows with null CustomerName or EmployeeName for 3D plot
-        plot_df = filtered_df.dropna(subset=['CustomerName', 'EmployeeName'])
-
-        if not plot_df.empty:
-            # Group data for 3D visualization
-            grouped = plot_df.groupby(['CustomerName', 'EmployeeName']).agg({
-                'OrderID': 'count',
-                'TotalAmount': 'sum',
-                'IsDelivered': 'mean'
-            }).reset_index()
-
-            grouped.columns = ['CustomerName', 'EmployeeName', 'OrderCount', 'TotalRevenue', 'DeliveryRate']
-
-            if selected_graph == 'Scatter 3D':
-                fig = go.Figure(data=[go.Scatter3d(
-                    x=grouped['CustomerName'],
-                    y=grouped['EmployeeName'],
-                    z=grouped['OrderCount'],
-                    mode='markers',
-                    marker=dict(
-                        size=grouped['TotalRevenue'] / grouped['TotalRevenue'].max() * 30 + 5,
-                        color=grouped['DeliveryRate'],
-                        colorscale='Viridis',
-                        showscale=True,
-                        colorbar=dict(title="Taux Livraison")
-                    ),
-                    text=[
-                        f"Client: {c}<br>Employé: {e}<br>Commandes: {oc}<br>Revenu: ${tr:,.0f}<br>Taux Livraison: {dr * 100:.1f}%"
-                        for c, e, oc, tr, dr in zip(
-                            grouped['CustomerName'], grouped['EmployeeName'],
-                            grouped['OrderCount'], grouped['TotalRevenue'], grouped['DeliveryRate']
-                        )
-                    ],
-                    hoverinfo='text'
-                )])
-
-                fig.update_layout(
-                    scene=dict(
-                        xaxis_title="Client",
-                        yaxis_title="Employé",
-                        zaxis_title="Nombre Commandes"
-                    ),
-                    title="Commandes par Client et Employé (3D Scatter)",
-                    height=600
-                )
-
-            elif selected_graph == 'Surface 3D':
-                # Create pivot table for surface plot
-                pivot = plot_df.pivot_table(
-                    values='OrderID',
-                    index='CustomerName',
-                    columns='EmployeeName',
-                    aggfunc='count',
-                    fill_value=0
-                )
-
-                # Get the data for surface
-                customers = pivot.index.tolist()
-                employees = pivot.columns.tolist()
-                z_data = pivot.values
-
-                # Check if we have enough data for surface plot
-                if len(customers) >= 2 and len(employees) >= 2:
-                    fig = go.Figure(data=[go.Surface(
-                        x=employees,
-                        y=customers,
-                        z=z_data,
-                        colorscale='Viridis',
-                        contours={
-                            "z": {"show": True, "usecolormap": True, "highlightcolor": "limegreen",
-                                  "project": {"z": True}}
-                        }
-                    )])
-
-                    fig.update_layout(
-                        scene=dict(
-                            xaxis_title="Employé",
-                            yaxis_title="Client",
-                            zaxis_title="Nombre Commandes"
-                        ),
-                        title="Commandes par Client et Employé (3D Surface)",
-                        height=600
-                    )
-                else:
-                    st.info("Not enough data for 3D Surface plot. Need at least 2 customers and 2 employees.")
-                    fig = go.Figure().update_layout(
-                        title="Not enough data for 3D Surface plot"
-                    )
-
-            elif selected_graph == 'Bubble 3D':
-                fig = go.Figure(data=[go.Scatter3d(
-                    x=grouped['CustomerName'],
-                    y=grouped['EmployeeName'],
-                    z=grouped['OrderCount'],
-                    mode='markers+text',
-                    marker=dict(
-                        size=grouped['OrderCount'] * 2,
-                        color=grouped['TotalRevenue'],
-                        colorscale='Rainbow',
-                        showscale=True,
-                        colorbar=dict(title="Revenu Total")
-                    ),
-                    text=grouped['OrderCount'].astype(str),
-                    textposition="middle center",
-                    hovertext=[
-                        f"Client: {c}<br>Employé: {e}<br>Commandes: {oc}<br>Revenu: ${tr:,.0f}"
-                        for c, e, oc, tr in zip(
-                            grouped['CustomerName'], grouped['EmployeeName'],
-                            grouped['OrderCount'], grouped['TotalRevenue']
-                        )
-                    ],
-                    hoverinfo='text'
-                )])
-
-                fig.update_layout(
-                    scene=dict(
-                        xaxis_title="Client",
-                        yaxis_title="Employé",
-                        zaxis_title="Nombre Commandes"
-                    ),
-                    title="Commandes par Client et Employé (Bubble 3D)",
-                    height=600
-                )
-
-            st.plotly_chart(fig, use_container_width=True)
-
-            # Show data summary
-            with st.expander("📊 Résumé des données 3D"):
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Clients affichés", grouped['CustomerName'].nunique())
-                with col2:
-                    st.metric("Employés affichés", grouped['EmployeeName'].nunique())
-                with col3:
-                    st.metric("Relations totales", len(grouped))
-        else:
-            st.info("No data with complete customer and employee information for 3D plot.")
-    else:
-        st.warning("No data available for visualization. Please apply different filters.")
+    chart_3d_section(version, filters, filtered_cube)
 
 with tab2:
     st.markdown('<h2 class="section-title">Évolution des Commandes (Livrées vs Non Livrées)</h2>', unsafe_allow_html=True)
-
-    if not filtered_df.empty:
-        # Group by YearMonth and status
-        if 'YearMonth' not in filtered_df.columns:
-            filtered_df['YearMonth'] = filtered_df['OrderDate'].dt.strftime('%Y-%m')
-
-        grouped = filtered_df.groupby(['YearMonth', 'Status']).size().reset_index(name='Count')
-
-        fig = px.bar(
-            grouped,
-            x='YearMonth',
-            y='Count',
-            color='Status',
-            barmode='group',
-            color_discrete_map={'Livrée': '#198754', 'Non Livrée': '#dc3545'},
-            title="Évolution des Commandes (Livrées vs Non Livrées)"
-        )
-
-        fig.update_layout(
-            xaxis_title="Mois",
-            yaxis_title="Nombre de Commandes",
-            hovermode='x unified',
-            legend_title="Statut"
-        )
-
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Line chart alternative
-        fig2 = px.line(
-            grouped,
-            x='YearMonth',
-            y='Count',
-            color='Status',
-            markers=True,
-            title="Tendance des Commandes (Ligne)"
-        )
-
-        fig2.update_layout(
-            xaxis_title="Mois",
-            yaxis_title="Nombre de Commandes",
-            hovermode='x unified'
-        )
-
-        st.plotly_chart(fig2, use_container_width=True)
-    else:
-        st.warning("No data available for evolution chart.")
+    evolution_section(version, filters, filtered_monthly)
+    team_section(version, selected_years, aggs['teams'] if has_data else pd.DataFrame())
 
 with tab3:
     st.markdown('<h2 class="section-title">Détails des Commandes</h2>', unsafe_allow_html=True)
 
-    if not filtered_df.empty:
-        # Format data for display
-        display_df = filtered_df.copy()
-
-        # Format date columns SAFELY
-        if 'OrderDate' in display_df.columns:
-            display_df['OrderDate'] = display_df['OrderDate'].apply(
-                lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) else ''
-            )
-
-        if 'ShippedDate' in display_df.columns:
-            display_df['ShippedDate'] = display_df['ShippedDate'].apply(
-                lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) else ''
-            )
-
-        # Format currency
-        if 'TotalAmount' in display_df.columns:
-            display_df['TotalAmount'] = display_df['TotalAmount'].apply(
-                lambda x: f"${float(x):,.2f}" if pd.notna(x) else "$0.00"
-            )
-
-        # Select columns to display
-        cols_to_display = ['OrderID', 'OrderDate', 'ShippedDate', 'CustomerName',
-                           'EmployeeName', 'TotalAmount', 'Status', 'SourceSystem']
-        available_cols = [col for col in cols_to_display if col in display_df.columns]
-
-        display_df = display_df[available_cols]
-
-        # Show data table - FIXED Streamlit warning
-        st.dataframe(
-            display_df,
-            width='stretch',
-            hide_index=True,
-            column_config={
-                "OrderID": st.column_config.NumberColumn("ID", format="%d"),
-                "OrderDate": "Date Commande",
-                "ShippedDate": "Date Livraison",
-                "CustomerName": "Client",
-                "EmployeeName": "Employé",
-                "TotalAmount": "Montant",
-                "Status": "Statut",
-                "SourceSystem": "Source"
-            }
-        )
-
-        # Export options - FIXED Excel export
-        col1, col2 = st.columns(2)
-        with col1:
-            csv = display_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="📥 Télécharger CSV",
-                data=csv,
-                file_name="northwind_orders.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
-        with col2:
-            # FIXED: Correct Excel export for newer pandas
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                display_df.to_excel(writer, index=False, sheet_name='Orders')
-                writer._save()  # Use _save() instead of save()
-
-            st.download_button(
-                label="📥 Télécharger Excel",
-                data=buffer.getvalue(),
-                file_name="northwind_orders.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
-    else:
-        st.warning("No data available to display.")
+    # the number of selected orders comes from the aggregate cells, not from counting order rows
+    selected_orders = int(filtered_cube['OrderCount'].sum()) if not filtered_cube.empty else 0
+    orders_section(version, filters, selected_orders, load_page, load_rows, export_on_request=query_mode())
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+import employee_hierarchy
+import stats_catalog
+import warehouse_backend
+
+
+# The frames the dashboard displays, built from the warehouse (or its mirror).
+# The ETL publishes them as a snapshot after each run (see snapshot.py); the
+# dashboard only queries the warehouse itself when there's no snapshot.
+# Every query is fully ordered, so the same warehouse content gives the same
+# frames (and snapshot hash).
+FRAMES = ['orders', 'yearly', 'monthly', 'cube', 'teams']
+
+
+def employee_name_sql(conn):
+    return warehouse_backend.backend_for(conn).concat('de.FirstName', "' '", 'de.LastName')
+
+
+def label_orders(df):
+    """Date parts, status and name fills of order rows"""
+    # Process dates - SAFELY
+    df['OrderDate'] = pd.to_datetime(df['OrderDate'], errors='coerce')
+    df['Year'] = df['OrderDate'].dt.year
+    df['Month'] = df['OrderDate'].dt.month
+    df['YearMonth'] = df['OrderDate'].dt.strftime('%Y-%m')
+    df['ShippedDate'] = pd.to_datetime(df['ShippedDate'], errors='coerce')
+
+    # Calculate delivery status
+    df['Status'] = np.where(df['IsDelivered'] == 1, 'Livrée', 'Non Livrée')
+
+    # Fill NaN values
+    df['CustomerName'] = df['CustomerName'].fillna('Unknown Customer')
+    df['EmployeeName'] = df['EmployeeName'].fillna('Unknown Employee')
+    return df
+
+
+def label_months(frame):
+    """YearMonth / Status labels of a monthly aggregate"""
+    frame['YearMonth'] = frame['Year'].astype(int).astype(str) + '-' + \
+        frame['Month'].astype(int).astype(str).str.zfill(2)
+    frame['Status'] = np.where(frame['IsDelivered'] == 1, 'Livrée', 'Non Livrée')
+    frame['TotalRevenue'] = frame['TotalRevenue'].astype(float).fillna(0)
+    return frame
+
+
+def orders(conn):
+    """Order rows for the details table, in order_pages.KEY order (newest first)"""
+    df = pd.read_sql(f"""
+        SELECT
+            fo.OrderID,
+            fo.OrderDate,
+            fo.ShippedDate,
+            fo.TotalAmount,
+            fo.IsDelivered,
+            fo.SourceSystem,
+            COALESCE(cc.CanonicalName, dc.CompanyName) as CustomerName,
+            {employee_name_sql(conn)} as EmployeeName
+        FROM FactOrders fo
+        LEFT JOIN DimCustomer dc ON fo.CustomerKey = dc.CustomerKey
+        LEFT JOIN CustomerCluster cc ON fo.CustomerKey = cc.CustomerKey
+        LEFT JOIN DimEmployee de ON fo.EmployeeKey = de.EmployeeKey
+        WHERE fo.OrderDate IS NOT NULL
+        ORDER BY fo.OrderDate DESC, fo.OrderID DESC, fo.SourceSystem DESC
+    """, conn)
+    return label_orders(df)
+
+
+def aggregates(conn):
+    """
+    KPI and trend tables maintained by the ETL (see aggregates.py): yearly
+    totals, monthly status counts and the month x customer x employee cube
+    """
+    yearly = pd.read_sql(
+        "SELECT Year, OrderCount, DeliveredCount, TotalRevenue FROM AggYearly ORDER BY Year", conn
+    )
+    monthly = pd.read_sql(
+        "SELECT Year, Month, IsDelivered, OrderCount, TotalRevenue FROM AggMonthlyStatus "
+        "ORDER BY Year, Month, IsDelivered", conn
+    )
+    cube = pd.read_sql(f"""
+        SELECT
+            a.Year,
+            a.Month,
+            COALESCE(cc.CanonicalName, dc.CompanyName) as CustomerName,
+            {employee_name_sql(conn)} as EmployeeName,
+            a.IsDelivered,
+            a.OrderCount,
+            a.TotalRevenue
+        FROM AggCustomerEmployee a
+        LEFT JOIN DimCustomer dc ON a.CustomerKey = dc.CustomerKey
+        LEFT JOIN CustomerCluster cc ON a.CustomerKey = cc.CustomerKey
+        LEFT JOIN DimEmployee de ON a.EmployeeKey = de.EmployeeKey
+        ORDER BY a.Year, a.Month, a.CustomerKey, a.EmployeeKey, a.IsDelivered
+    """, conn)
+
+    for frame in (monthly, cube):
+        label_months(frame)
+
+    cube['CustomerName'] = cube['CustomerName'].fillna('Unknown Customer')
+    cube['EmployeeName'] = cube['EmployeeName'].fillna('Unknown Employee')
+    # delivered orders of each cell, for the delivery rates
+    cube['DeliveredCount'] = cube['OrderCount'].where(cube['IsDelivered'] == 1, 0)
+
+    return {'yearly': yearly, 'monthly': monthly, 'cube': cube}
+
+
+def team_rollup(conn):
+    """Orders and revenue per manager and year, whole team included (one join on EmployeeHierarchy)"""
+    try:
+        teams = pd.read_sql(f"""
+            SELECT t.ManagerKey, t.Year, {employee_name_sql(conn)} as ManagerName, t.OrderCount, t.TotalRevenue
+            FROM ({employee_hierarchy.TEAM_ROLLUP_SQL}) t
+            LEFT JOIN DimEmployee de ON t.ManagerKey = de.EmployeeKey
+            ORDER BY t.ManagerKey, t.Year
+        """, conn)
+    except Exception:
+        return pd.DataFrame()
+
+    teams['ManagerName'] = teams['ManagerName'].fillna('Unknown Employee')
+    teams['TotalRevenue'] = teams['TotalRevenue'].astype(float).fillna(0)
+    return teams
+
+
+def filter_options(conn):
+    """Year / customer / employee lists from the stats catalog maintained by the ETL (None if missing)"""
+    try:
+        catalog = stats_catalog.load(conn)
+    except Exception:
+        return None
+
+    options = {
+        column: stats_catalog.distinct_values(catalog, 'FactOrders', column)
+        for column in ['Year', 'CustomerName', 'EmployeeName']
+    }
+    if any(values is None for values in options.values()):
+        return None
+    options['CustomerName'] = [name if name is not None else 'Unknown Customer' for name in options['CustomerName']]
+    options['EmployeeName'] = [name if name is not None else 'Unknown Employee' for name in options['EmployeeName']]
+    return options
+
+
+def build(conn):
+    """Everything the dashboard reads: the FRAMES plus the filter 'options' (None without a catalog)"""
+    dataset = {'orders': orders(conn), **aggregates(conn), 'teams': team_rollup(conn)}
+    dataset['options'] = filter_options(conn)
+    return dataset
@@ -0,0 +1,186 @@
+import pandas as pd
+
+import dashboard_data
+import order_pages
+import warehouse_backend
+
+
+# Query mode of the dashboard (DASHBOARD_MODE = query): instead of loading the
+# dataset, the sidebar filters are compiled into WHERE clauses with ? parameters
+# and only filtered rows or aggregates come back from the warehouse.
+# On FactOrders the predicates are on OrderDateKey, CustomerKey, EmployeeKey,
+# the columns of the IX_FactOrders_* indexes; customer and employee names are
+# resolved to their keys first, from the (small) dimensions.
+# orders read per round trip when a whole selection is exported
+EXPORT_PAGE_ROWS = 10_000
+KEYSET = [f"fo.{column}" for column in order_pages.KEY]
+STATUS_DELIVERED = {'Livrées': 1, 'Non Livrées': 0}
+UNKNOWN = {'customers': 'Unknown Customer', 'employees': 'Unknown Employee'}
+
+
+def name_lookups(conn):
+    """{'customers': name -> [CustomerKey], 'employees': name -> [EmployeeKey]}, names as the dashboard shows them"""
+    customers = pd.read_sql("""
+        SELECT dc.CustomerKey AS EntityKey, COALESCE(cc.CanonicalName, dc.CompanyName) AS Name
+        FROM DimCustomer dc
+        LEFT JOIN CustomerCluster cc ON dc.CustomerKey = cc.CustomerKey
+    """, conn)
+    employees = pd.read_sql(f"""
+        SELECT de.EmployeeKey AS EntityKey, {dashboard_data.employee_name_sql(conn)} AS Name
+        FROM DimEmployee de
+    """, conn)
+
+    lookups = {}
+    for kind, frame in (('customers', customers), ('employees', employees)):
+        frame['Name'] = frame['Name'].fillna(UNKNOWN[kind])
+        lookups[kind] = frame.groupby('Name')['EntityKey'].agg(lambda keys: sorted(int(key) for key in keys)).to_dict()
+    return lookups
+
+
+def _placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+def _key_clause(column, names, lookup, unknown):
+    """`column` IN (keys of the selected names); the unknown name also matches a NULL key"""
+    keys = sorted({key for name in names for key in lookup.get(name, [])})
+    clauses = [f"{column} IN ({_placeholders(keys)})"] if keys else []
+    if unknown in names:
+        clauses.append(f"{column} IS NULL")
+    if not clauses:
+        return '1 = 0', []
+    return f"({' OR '.join(clauses)})", keys
+
+
+def compile_filters(filters, lookups, year=None, date_key=None, customer=None, employee=None, delivered=None):
+    """
+    WHERE clause and parameters for `filters` ({'years', 'customers', 'employees', 'status'}).
+
+    The keyword arguments name the columns to filter on; years go to `year`
+    (IN list) or, on the fact table, to `date_key` as YYYYMMDD ranges.
+    """
+    clauses, params = [], []
+    years = [int(value) for value in filters['years']]
+    if years and year:
+        clauses.append(f"{year} IN ({_placeholders(years)})")
+        params += years
+    elif years and date_key:
+        clauses.append('(' + ' OR '.join(f"{date_key} BETWEEN ? AND ?" for _ in years) + ')')
+        params += [bound for value in years for bound in (value * 10000 + 101, value * 10000 + 1231)]
+
+    for kind, column in (('customers', customer), ('employees', employee)):
+        if filters[kind] and column:
+            clause, keys = _key_clause(column, filters[kind], lookups[kind], UNKNOWN[kind])
+            clauses.append(clause)
+            params += keys
+
+    if filters['status'] in STATUS_DELIVERED and delivered:
+        clauses.append(f"{delivered} = ?")
+        params.append(STATUS_DELIVERED[filters['status']])
+
+    return (' AND '.join(clauses) or '1 = 1'), params
+
+
+def _names(keys, lookup, unknown):
+    by_key = {key: name for name, names_keys in lookup.items() for key in names_keys}
+    return keys.map(by_key).fillna(unknown)
+
+
+def cube(conn, filters, lookups):
+    """The AggCustomerEmployee cells matching the filters, labelled like dashboard_data.aggregates()"""
+    where, params = compile_filters(filters, lookups, year='Year', customer='CustomerKey',
+                                    employee='EmployeeKey', delivered='IsDelivered')
+    cells = pd.read_sql(f"""
+        SELECT Year, Month, CustomerKey, EmployeeKey, IsDelivered, OrderCount, TotalRevenue
+        FROM AggCustomerEmployee
+        WHERE {where}
+    """, conn, params=params)
+    cells['CustomerName'] = _names(cells['CustomerKey'], lookups['customers'], UNKNOWN['customers'])
+    cells['EmployeeName'] = _names(cells['EmployeeKey'], lookups['employees'], UNKNOWN['employees'])
+    cells = dashboard_data.label_months(cells)
+    cells['DeliveredCount'] = cells['OrderCount'].where(cells['IsDelivered'] == 1, 0)
+    return cells
+
+
+def monthly(conn, filters):
+    """AggMonthlyStatus rows matching the year / status filters"""
+    where, params = compile_filters(filters, {}, year='Year', delivered='IsDelivered')
+    months = pd.read_sql(f"""
+        SELECT Year, Month, IsDelivered, OrderCount, TotalRevenue
+        FROM AggMonthlyStatus
+        WHERE {where}
+    """, conn, params=params)
+    return dashboard_data.label_months(months)
+
+
+def _order_rows(conn, where, params, order_by, rows, lookups):
+    backend = warehouse_backend.backend_for(conn)
+    page = pd.read_sql(backend.limit(f"""
+        SELECT
+            fo.OrderID,
+            fo.OrderDate,
+            fo.ShippedDate,
+            fo.TotalAmount,
+            fo.IsDelivered,
+            fo.SourceSystem,
+            fo.CustomerKey,
+            fo.EmployeeKey
+        FROM FactOrders fo
+        WHERE {where}
+        ORDER BY {order_by}
+    """, rows), conn, params=params)
+
+    page['CustomerName'] = _names(page['CustomerKey'], lookups['customers'], UNKNOWN['customers'])
+    page['EmployeeName'] = _names(page['EmployeeKey'], lookups['employees'], UNKNOWN['employees'])
+    return page.drop(columns=['CustomerKey', 'EmployeeKey'])
+
+
+def _order_filters(filters, lookups):
+    return compile_filters(filters, lookups, date_key='fo.OrderDateKey', customer='fo.CustomerKey',
+                           employee='fo.EmployeeKey', delivered='fo.IsDelivered')
+
+
+def keyset_page(conn, filters, lookups, rows, descending=True, after=None):
+    """
+    The `rows` matching orders following the key `after` in (OrderDate, OrderID)
+    order (see order_pages.py), and the key to continue after (None on the last page).
+    """
+    where, params = _order_filters(filters, lookups)
+    where += ' AND fo.OrderDate IS NOT NULL'
+    if after is not None:
+        seek, seek_params = order_pages.after_clause(KEYSET, list(after), descending)
+        where, params = f"{where} AND {seek}", params + seek_params
+
+    direction = 'DESC' if descending else 'ASC'
+    order_by = ', '.join(f"{column} {direction}" for column in KEYSET)
+    # one row past the page tells whether there is a next one
+    page = _order_rows(conn, where, params, order_by, rows + 1, lookups)
+
+    next_key = None
+    if len(page) > rows:
+        page = page.iloc[:rows]
+        # the key as the driver returned it, so it binds back unchanged
+        next_key = tuple(order_pages.db_value(value) for value in page[order_pages.KEY].iloc[-1])
+    return dashboard_data.label_orders(page.reset_index(drop=True)), next_key
+
+
+def all_orders(conn, filters, lookups, rows=EXPORT_PAGE_ROWS):
+    """Every matching order, newest first, read `rows` at a time with keyset_page"""
+    pages, after = [], None
+    while True:
+        page, after = keyset_page(conn, filters, lookups, rows, after=after)
+        pages.append(page)
+        if after is None:
+            return pd.concat(pages, ignore_index=True)
+
+
+def base(conn):
+    """What query mode loads up front: yearly KPIs, team rollup, filter lists and the name -> key lookups"""
+    lookups = name_lookups(conn)
+    yearly = pd.read_sql("SELECT Year, OrderCount, DeliveredCount, TotalRevenue FROM AggYearly ORDER BY Year", conn)
+    options = dashboard_data.filter_options(conn) or {
+        'Year': sorted(int(year) for year in yearly['Year']),
+        'CustomerName': sorted(lookups['customers']),
+        'EmployeeName': sorted(lookups['employees']),
+    }
+    return {'yearly': yearly, 'teams': dashboard_data.team_rollup(conn), 'options': options, 'lookups': lookups}
@@ -0,0 +1,173 @@
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import warehouse_backend
+
+
+# values the transforms turn missing data into when they stringify object columns
+MISSING_TOKENS = ['', 'None', 'nan', 'NaN', 'NaT', '<NA>']
+
+
+def is_missing(series):
+    """Null check that also catches stringified nulls"""
+    missing = series.isna().to_numpy()
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        missing = missing | series.isin(MISSING_TOKENS).to_numpy()
+    return missing
+
+
+# RULES
+# each rule returns ONE boolean mask over the whole batch (True = violation),
+# so the cost of a check is a few vectorized column operations
+class Rule:
+    kind = 'rule'
+
+    def __init__(self, name, column, where=None):
+        self.name = name
+        self.column = column
+        self.where = where  # optional (column, value) restricting the rows checked
+
+    def applies(self, df):
+        if self.where is None:
+            return np.ones(len(df), dtype=bool)
+        column, value = self.where
+        return (df[column] == value).to_numpy()
+
+    def violations(self, df):
+        raise NotImplementedError
+
+
+class NotNullRule(Rule):
+    kind = 'not_null'
+
+    def violations(self, df):
+        return is_missing(df[self.column])
+
+
+class RangeRule(Rule):
+    kind = 'range'
+
+    def __init__(self, name, column, min_value=None, max_value=None, where=None):
+        super().__init__(name, column, where)
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def violations(self, df):
+        values = pd.to_numeric(df[self.column], errors='coerce')
+        bad = np.zeros(len(df), dtype=bool)
+        if self.min_value is not None:
+            bad |= (values < self.min_value).to_numpy(dtype=bool, na_value=False)
+        if self.max_value is not None:
+            bad |= (values > self.max_value).to_numpy(dtype=bool, na_value=False)
+        return bad
+
+
+class ReferenceRule(Rule):
+    """Every (non-null) key tuple must exist in the referenced keys"""
+    kind = 'reference'
+
+    def __init__(self, name, columns, valid_keys, where=None):
+        super().__init__(name, ', '.join(columns), where)
+        self.columns = columns
+        self.valid_keys = valid_keys  # DataFrame with the same columns
+
+    def violations(self, df):
+        keys = pd.MultiIndex.from_frame(df[self.columns])
+        valid = pd.MultiIndex.from_frame(self.valid_keys[self.columns])
+        present = ~is_missing(df[self.columns[0]])
+        return present & ~keys.isin(valid)
+
+
+class DateOrderRule(Rule):
+    """earlier_column must not be after later_column (rows with a missing date pass)"""
+    kind = 'date_order'
+
+    def __init__(self, name, earlier_column, later_column, where=None):
+        super().__init__(name, f"{earlier_column} <= {later_column}", where)
+        self.earlier_column = earlier_column
+        self.later_column = later_column
+
+    def violations(self, df):
+        earlier = pd.to_datetime(df[self.earlier_column], errors='coerce')
+        later = pd.to_datetime(df[self.later_column], errors='coerce')
+        return (later < earlier).to_numpy(dtype=bool, na_value=False)
+
+
+class PrefixRule(Rule):
+    kind = 'prefix'
+
+    def __init__(self, name, column, prefix, where=None):
+        super().__init__(name, column, where)
+        self.prefix = prefix
+
+    def violations(self, df):
+        values = df[self.column].astype(str)
+        present = ~is_missing(df[self.column])
+        return present & ~values.str.startswith(self.prefix).to_numpy(dtype=bool)
+
+
+# ENGINE
+def run_rules(df, rules, table_name, key_column):
+    """
+    Evaluate every rule over the batch.
+
+    Returns (results, violations): one row per rule with the checked/failed counts,
+    and one row per offending record key.
+    """
+    results = []
+    violations = []
+    keys = df[key_column].astype(str).to_numpy() if key_column in df.columns else np.arange(len(df)).astype(str)
+
+    for rule in rules:
+        scope = rule.applies(df)
+        bad = rule.violations(df) & scope
+
+        results.append({
+            'TableName': table_name,
+            'RuleName': rule.name,
+            'RuleType': rule.kind,
+            'ColumnName': rule.column,
+            'CheckedRows': int(scope.sum()),
+            'FailedRows': int(bad.sum()),
+        })
+        if bad.any():
+            violations.append(pd.DataFrame({
+                'TableName': table_name,
+                'RuleName': rule.name,
+                'RecordKey': keys[bad],
+            }))
+
+    results = pd.DataFrame(results, columns=['TableName', 'RuleName', 'RuleType', 'ColumnName',
+                                             'CheckedRows', 'FailedRows'])
+    if violations:
+        violations = pd.concat(violations, ignore_index=True)
+    else:
+        violations = pd.DataFrame(columns=['TableName', 'RuleName', 'RecordKey'])
+    return results, violations
+
+
+def print_results(results):
+    failing = results[results['FailedRows'] > 0]
+    print(f"  🔎 Data quality: {len(results)} rules checked, {len(failing)} failing")
+    for row in failing.itertuples(index=False):
+        print(f"    ⚠️  {row.TableName}.{row.RuleName}: {row.FailedRows} / {row.CheckedRows} rows")
+
+
+def save_results(conn, results, violations, run_id=None):
+    """Write the rule counts and offending keys to DQResults / DQViolations"""
+    if results.empty:
+        return None
+
+    run_id = run_id or str(uuid.uuid4())
+    run_at = datetime.now()
+
+    backend = warehouse_backend.backend_for(conn)
+    backend.bulk_insert(conn, 'DQResults', results.assign(RunID=run_id, RunAt=run_at), [
+        'RunID', 'RunAt', 'TableName', 'RuleName', 'RuleType', 'ColumnName', 'CheckedRows', 'FailedRows'
+    ])
+    backend.bulk_insert(conn, 'DQViolations', violations.assign(RunID=run_id),
+                        ['RunID', 'TableName', 'RuleName', 'RecordKey'])
+    return run_id
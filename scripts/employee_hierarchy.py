@@ -0,0 +1,78 @@
+import pandas as pd
+
+import warehouse_backend
+
+
+# EmployeeHierarchy: closure of DimEmployee.ReportsTo, one row per (ancestor,
+# descendant) pair with the number of levels between them. Every employee is
+# its own ancestor at depth 0, so "everyone under manager X, X included" is
+# a single join on DescendantKey filtered on AncestorKey = X.
+COLUMNS = ['AncestorKey', 'DescendantKey', 'Depth']
+
+
+def reporting_edges(conn):
+    """(EmployeeKey, ManagerKey) of every employee; ReportsTo is an EmployeeID of the same source"""
+    employees = pd.read_sql("SELECT EmployeeKey, EmployeeID, ReportsTo, SourceSystem FROM DimEmployee", conn)
+    employees = employees.astype({'EmployeeKey': 'int64', 'EmployeeID': 'Int64', 'ReportsTo': 'Int64'})
+    managers = employees[['EmployeeID', 'SourceSystem', 'EmployeeKey']].rename(
+        columns={'EmployeeID': 'ReportsTo', 'EmployeeKey': 'ManagerKey'}
+    ).drop_duplicates(['ReportsTo', 'SourceSystem'])
+    edges = employees[['EmployeeKey', 'ReportsTo', 'SourceSystem']].merge(
+        managers, on=['ReportsTo', 'SourceSystem'], how='left'
+    )
+    return employees['EmployeeKey'], edges[['EmployeeKey', 'ManagerKey']]
+
+
+def closure(employee_keys, edges):
+    """
+    Ancestor / descendant pairs from the (EmployeeKey, ManagerKey) edges.
+
+    Each pass climbs one level for every path at once (a merge of the current
+    frontier with the edges) until no path has a manager left. A ReportsTo cycle
+    stops after as many levels as there are employees.
+    """
+    edges = edges.dropna().astype('int64')
+    edges = edges[edges['EmployeeKey'] != edges['ManagerKey']]
+
+    frontier = pd.DataFrame({'AncestorKey': employee_keys.to_numpy(), 'DescendantKey': employee_keys.to_numpy()})
+    levels = [frontier.assign(Depth=0)]
+    for depth in range(1, len(employee_keys) + 1):
+        frontier = frontier.merge(edges, left_on='AncestorKey', right_on='EmployeeKey')[['ManagerKey', 'DescendantKey']]
+        frontier = frontier.rename(columns={'ManagerKey': 'AncestorKey'})
+        if frontier.empty:
+            break
+        levels.append(frontier.assign(Depth=depth))
+
+    pairs = pd.concat(levels, ignore_index=True)
+    # shortest path wins if a cycle reaches the same pair twice
+    return pairs.sort_values('Depth').drop_duplicates(['AncestorKey', 'DescendantKey'])[COLUMNS]
+
+
+def rebuild(conn):
+    """Replace EmployeeHierarchy with the closure of the current DimEmployee; returns the pair count"""
+    backend = warehouse_backend.backend_for(conn)
+    pairs = closure(*reporting_edges(conn))
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM EmployeeHierarchy")
+        cursor.close()
+        backend.bulk_insert(conn, 'EmployeeHierarchy', pairs, COLUMNS)
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    return len(pairs)
+
+
+# revenue and orders of each manager's whole team (themselves included), per year
+TEAM_ROLLUP_SQL = """
+    SELECT h.AncestorKey AS ManagerKey, a.Year, SUM(a.OrderCount) AS OrderCount, SUM(a.TotalRevenue) AS TotalRevenue
+    FROM EmployeeHierarchy h
+    JOIN AggCustomerEmployee a ON a.EmployeeKey = h.DescendantKey
+    WHERE h.AncestorKey IN (SELECT AncestorKey FROM EmployeeHierarchy WHERE Depth > 0)
+    GROUP BY h.AncestorKey, a.Year
+"""
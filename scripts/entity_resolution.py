@@ -0,0 +1,165 @@
+import difflib
+
+import numpy as np
+import pandas as pd
+
+import warehouse_backend
+
+
+LEGAL_SUFFIXES = [
+    'inc', 'incorporated', 'ltd', 'limited', 'llc', 'gmbh', 'ag', 'sa', 'sarl', 'srl', 'spa',
+    'co', 'corp', 'corporation', 'company', 'the', 'and', 'cia', 'ltda', 'ab', 'as', 'oy', 'kg',
+]
+PLACEHOLDERS = ['', 'unknown', 'none', 'nan', 'nat', 'null']
+
+# blocks bigger than this (pairs inside one block) are too generic to be useful,
+# e.g. every customer of a big city sharing one postal code
+MAX_BLOCK_PAIRS = 2_500
+MATCH_THRESHOLD = 0.75
+
+
+# NORMALIZATION (vectorized string operations)
+def normalize_name(names):
+    names = (names.fillna('').astype(str)
+             .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+             .str.lower()
+             .str.replace(r'[^a-z0-9 ]+', ' ', regex=True))
+    suffixes = r'\b(?:' + '|'.join(LEGAL_SUFFIXES) + r')\b'
+    names = names.str.replace(suffixes, ' ', regex=True).str.split().str.join(' ')
+    return names.where(~names.isin(PLACEHOLDERS))
+
+
+def normalize_postal(codes):
+    codes = codes.fillna('').astype(str).str.upper().str.replace(r'[^0-9A-Z]', '', regex=True)
+    return codes.where(~codes.str.lower().isin(PLACEHOLDERS))
+
+
+def normalize_phone(phones):
+    # keep the last 7 digits so country / area code formatting doesn't matter
+    digits = phones.fillna('').astype(str).str.replace(r'\D', '', regex=True)
+    return digits.str[-7:].where(digits.str.len() >= 7)
+
+
+def prepare_customers(customers):
+    prepared = customers[['CustomerKey', 'CompanyName', 'SourceSystem']].copy()
+    prepared['name_key'] = normalize_name(customers['CompanyName'])
+    prepared['postal_key'] = normalize_postal(customers['PostalCode'])
+    prepared['phone_key'] = normalize_phone(customers['Phone'])
+    # short prefix of the name, combined with the postal code
+    prepared['name_postal_key'] = prepared['name_key'].str[:6] + '|' + prepared['postal_key']
+    return prepared
+
+
+# BLOCKING
+def candidate_pairs(prepared):
+    """
+    Cross-source candidate pairs (SQL x Access) sharing at least one blocking key.
+
+    Each blocking key is an equi-join, so the work is proportional to the block
+    sizes, never to n².
+    """
+    sql = prepared[prepared['SourceSystem'] == 'SQL']
+    access = prepared[prepared['SourceSystem'] == 'Access']
+
+    pairs = []
+    for block in ['name_key', 'name_postal_key', 'phone_key']:
+        left = sql[['CustomerKey', block]].dropna(subset=[block])
+        right = access[['CustomerKey', block]].dropna(subset=[block])
+
+        sizes = (left[block].value_counts().rename('left')
+                 .to_frame().join(right[block].value_counts().rename('right'), how='inner'))
+        usable = sizes.index[(sizes['left'] * sizes['right']) <= MAX_BLOCK_PAIRS]
+
+        block_pairs = left[left[block].isin(usable)].merge(
+            right[right[block].isin(usable)], on=block, suffixes=('_sql', '_access')
+        )
+        pairs.append(block_pairs[['CustomerKey_sql', 'CustomerKey_access']])
+
+    if not pairs:
+        return pd.DataFrame(columns=['CustomerKey_sql', 'CustomerKey_access'])
+    return pd.concat(pairs, ignore_index=True).drop_duplicates()
+
+
+# SCORING
+def score_pairs(pairs, prepared):
+    features = prepared.set_index('CustomerKey')
+    left = features.loc[pairs['CustomerKey_sql']].reset_index(drop=True)
+    right = features.loc[pairs['CustomerKey_access']].reset_index(drop=True)
+
+    name_similarity = np.array([
+        difflib.SequenceMatcher(None, a, b).ratio() if isinstance(a, str) and isinstance(b, str) else 0.0
+        for a, b in zip(left['name_key'], right['name_key'])
+    ])
+    same_postal = (left['postal_key'] == right['postal_key']).to_numpy(dtype=bool, na_value=False)
+    same_phone = (left['phone_key'] == right['phone_key']).to_numpy(dtype=bool, na_value=False)
+
+    scored = pairs.reset_index(drop=True).copy()
+    scored['MatchScore'] = 0.6 * name_similarity + 0.2 * same_postal + 0.2 * same_phone
+    # an identical phone number plus a close name is enough on its own
+    scored.loc[same_phone & (name_similarity >= 0.6), 'MatchScore'] = np.maximum(
+        scored.loc[same_phone & (name_similarity >= 0.6), 'MatchScore'], MATCH_THRESHOLD
+    )
+    return scored
+
+
+# CLUSTERING
+def cluster(keys, matches):
+    """Union-find over the matched pairs, cluster id = smallest CustomerKey"""
+    parent = {key: key for key in keys}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for a, b in zip(matches['CustomerKey_sql'], matches['CustomerKey_access']):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    return {key: find(key) for key in keys}
+
+
+def resolve_customers(customers):
+    """
+    Cross-source customer clusters.
+
+    customers needs CustomerKey, CompanyName, PostalCode, Phone and SourceSystem.
+    Returns one row per customer: CustomerKey, ClusterKey, CanonicalName,
+    SourceSystem, MatchScore (best score that linked it, 1.0 for singletons).
+    """
+    prepared = prepare_customers(customers)
+    pairs = candidate_pairs(prepared)
+
+    if pairs.empty:
+        matches = pairs.assign(MatchScore=pd.Series(dtype=float))
+    else:
+        scored = score_pairs(pairs, prepared)
+        matches = scored[scored['MatchScore'] >= MATCH_THRESHOLD]
+
+    clusters = cluster(prepared['CustomerKey'].tolist(), matches)
+
+    mapping = prepared[['CustomerKey', 'CompanyName', 'SourceSystem']].copy()
+    mapping['ClusterKey'] = mapping['CustomerKey'].map(clusters)
+
+    best_score = pd.concat([
+        matches[['CustomerKey_sql', 'MatchScore']].rename(columns={'CustomerKey_sql': 'CustomerKey'}),
+        matches[['CustomerKey_access', 'MatchScore']].rename(columns={'CustomerKey_access': 'CustomerKey'}),
+    ]).groupby('CustomerKey')['MatchScore'].max()
+    mapping['MatchScore'] = mapping['CustomerKey'].map(best_score).fillna(1.0).round(3)
+
+    # canonical name: the SQL (current system) name when the cluster has one
+    ranked = mapping.assign(_rank=(mapping['SourceSystem'] != 'SQL').astype(int))
+    ranked = ranked.sort_values(['ClusterKey', '_rank', 'CustomerKey'])
+    canonical = ranked.drop_duplicates('ClusterKey').set_index('ClusterKey')['CompanyName']
+    mapping['CanonicalName'] = mapping['ClusterKey'].map(canonical)
+
+    return mapping[['CustomerKey', 'ClusterKey', 'CanonicalName', 'SourceSystem', 'MatchScore']]
+
+
+def save_clusters(conn, mapping):
+    """Upsert the CustomerCluster mapping (one row per CustomerKey)"""
+    warehouse_backend.backend_for(conn).upsert(conn, 'CustomerCluster', mapping, ['CustomerKey'], [
+        'CustomerKey', 'ClusterKey', 'CanonicalName', 'SourceSystem', 'MatchScore'
+    ])
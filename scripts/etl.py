@@ -1,8 +1,25 @@
 import pandas as pd
 import numpy as np
-import pyodbc
-from DatabaseConfig import DatabaseConfig, connect_sql_server, connect_data_warehouse
+
+from DatabaseConfig import DatabaseConfig
+import connection_pool
 import create_dw
+import customer_mart
+import data_quality
+import employee_hierarchy
+import lake
+import entity_resolution
+import memory_budget
+import migrations
+import aggregates
+import analytics_mirror
+import polars_engine
+import ship_dimensions
+import snapshot
+import stats_catalog
+import typed_schema
+import warehouse_backend
+from parallel_transform import run_transforms_parallel
 
 
 class etl:
@@ -14,116 +31,119 @@ class etl:
 
         # Connect to Northwind SQL Server
         print("\n1. Connecting to Northwind SQL...")
-        self.source_conn = connect_sql_server()
-
-        if self.source_conn is None:
-            raise Exception("❌ ERROR: Failed connecting to Northwind SQL")
+        try:
+            self.source_conn = connection_pool.source().acquire()
+        except Exception as e:
+            raise Exception(f"❌ ERROR: Failed connecting to Northwind SQL: {e}")
         print("   ✅ Connected to Northwind SQL")
 
-        # Verify/create DW
-        print("\n2. Verify/create DW...")
+        # Connect to DW (only created when it can't be reached)
+        print("\n2. Connecting to DW...")
         try:
-            if create_dw.create_datawarehouse():
-                print("   ✅ DW verified/created")
-                if create_dw.create_dw_schema():
-                    print("   ✅ Schema DW verified/created")
-                else:
-                    print("   ⚠️  Schema DW not created (might already exist)")
-            else:
-                print("   ⚠️  DW not created (might already exist)")
-        except Exception as e:
-            print(f"   ⚠️  Error creation DW: {e}")
+            self.dw_conn = connection_pool.dw().acquire()
+        except Exception:
+            print("   ⚠️  DW not reachable, creating it...")
+            create_dw.create_datawarehouse()
+            try:
+                self.dw_conn = connection_pool.dw().acquire()
+            except Exception as e:
+                raise Exception(f"❌ ERROR: Failed connecting to DW: {e}")
+        print("   ✅ Connected to DW")
 
-        # Connect to DW
-        print("\n3. Connecting to DW...")
-        self.dw_conn = connect_data_warehouse()
+        # Verify DW schema: one version read, DDL only for pending migrations
+        print("\n3. Verify DW schema...")
+        version = migrations.migrate(self.dw_conn)
+        print(f"   ✅ Schema DW at version {version}")
 
-        if self.dw_conn is None:
-            raise Exception("❌ ERROR: Failed connecting to DW")
-        print("   ✅ Connected to DW")
+        # DimCustomer / DimEmployee key lookups, read once per run (see dimension_lookups)
+        self._dimension_lookups = None
 
         print("\n" + "=" * 50)
         print("✅ ALL CONNECTIONS ARE DONE")
         print("=" * 50)
 
+    def close(self):
+        """Give the source and DW connections back to their pools"""
+        if getattr(self, 'source_conn', None) is not None:
+            connection_pool.source().release(self.source_conn)
+            self.source_conn = None
+        if getattr(self, 'dw_conn', None) is not None:
+            connection_pool.dw().release(self.dw_conn)
+            self.dw_conn = None
+
     # HELPER FUNCTIONS
+    @property
+    def backend(self):
+        """Dialect / bulk load helpers of the warehouse database"""
+        return warehouse_backend.backend_for(self.dw_conn)
+
     def check_table_exists(self, table_name):
         try:
-            cursor = self.dw_conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_NAME = ?
-            """, table_name)
-            exists = cursor.fetchone()[0] > 0
-            cursor.close()
-            return exists
+            return self.backend.table_exists(self.dw_conn, table_name)
         except Exception as e:
             print(f"⚠️ Error checking table {table_name}: {e}")
             return False
 
+    @staticmethod
+    def date_keys(dates):
+        """YYYYMMDD integer keys computed arithmetically (NaT -> <NA>)"""
+        dates = pd.to_datetime(pd.Series(dates), errors='coerce')
+        keys = dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day
+        return keys.astype('Int64')
+
     def fill_dim_date(self, start_year=1990, end_year=2025):
+        return self.extend_dim_date(f'{start_year}-01-01', f'{end_year}-12-31')
+
+    def extend_dim_date(self, start_date, end_date):
+        """Insert the dates of [start_date, end_date] that DimDate doesn't have yet"""
         print("\nDIMENSION DATE")
         print("-" * 30)
 
-        # Ensure table exists first!
-        self._ensure_dimdate_table_exists()
-
-        try:
-            count = self.dw_conn.execute("SELECT COUNT(*) FROM DimDate").fetchone()[0]
-            if count > 0:
-                print(f" DimDate already has {count:,} dates")
-                return pd.DataFrame()
-        except:
-            pass
-
-        print(f" Creating dates from {start_year} to {end_year}...")
+        dates = pd.date_range(start=pd.Timestamp(start_date).normalize(), end=pd.Timestamp(end_date).normalize(),
+                              freq='D')
+        date_keys = dates.year * 10000 + dates.month * 100 + dates.day
+
+        existing = pd.read_sql(
+            "SELECT DateKey FROM DimDate WHERE DateKey BETWEEN ? AND ?",
+            self.dw_conn, params=[int(date_keys.min()), int(date_keys.max())]
+        )
+        missing = ~np.isin(date_keys, existing['DateKey'].to_numpy())
+        if not missing.any():
+            print(f" DimDate already covers {dates.min():%Y-%m-%d} to {dates.max():%Y-%m-%d}")
+            return pd.DataFrame()
 
-        dates = pd.date_range(start=f'{start_year}-01-01', end=f'{end_year}-12-31', freq='D')
+        dates = dates[missing]
         dim_date = pd.DataFrame({
-            'DateKey': dates.strftime('%Y%m%d').astype(int),
+            'DateKey': date_keys[missing],
             'Date': dates.date,
             'Year': dates.year,
             'Quarter': dates.quarter,
             'Month': dates.month,
             'Day': dates.day,
-            'MonthName': dates.strftime('%B'),
-            'DayOfWeek': dates.strftime('%A'),
+            'MonthName': dates.month_name(),
+            'DayOfWeek': dates.day_name(),
             'IsWeekend': (dates.weekday >= 5).astype(int)
         })
 
-        print(f" Loading {len(dim_date):,} dates into SQL Server...")
-
-        cursor = self.dw_conn.cursor()
-        cursor.fast_executemany = True
-
-        data_to_insert = [
-            (
-                row.DateKey,
-                row.Date,
-                row.Year,
-                row.Quarter,
-                row.Month,
-                row.Day,
-                row.MonthName,
-                row.DayOfWeek,
-                row.IsWeekend
-            )
-            for row in dim_date.itertuples()
-        ]
-
-        cursor.executemany("""
-            INSERT INTO DimDate 
-            (DateKey, Date, Year, Quarter, Month, Day, MonthName, DayOfWeek, IsWeekend)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, data_to_insert)
+        print(f" Loading {len(dim_date):,} missing dates into DimDate "
+              f"({dates.min():%Y-%m-%d} to {dates.max():%Y-%m-%d})...")
 
-        self.dw_conn.commit()
-        cursor.close()
+        self.backend.bulk_insert(self.dw_conn, 'DimDate', dim_date)
 
-        print(f" DimDate created successfully: {len(dim_date):,} dates inserted")
+        print(f" DimDate extended successfully: {len(dim_date):,} dates inserted")
         return dim_date
 
+    def ensure_dim_date_covers(self, fact_orders):
+        """Extend DimDate to the min/max dates present in a FactOrders batch"""
+        date_cols = [col for col in ['OrderDate', 'RequiredDate', 'ShippedDate'] if col in fact_orders.columns]
+        if not date_cols:
+            return pd.DataFrame()
+
+        dates = pd.concat([pd.to_datetime(fact_orders[col], errors='coerce') for col in date_cols])
+        if dates.notna().sum() == 0:
+            return pd.DataFrame()
+        return self.extend_dim_date(dates.min(), dates.max())
+
     def create_access_mapping(self):
         """Create mapping between Access IDs and names"""
         print("\n🗺️  CREATING ACCESS MAPPING")
@@ -136,8 +156,7 @@ class etl:
 
         # 1. Read original Access data for mapping
         try:
-            access_conn_str = f"DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={DatabaseConfig.ACCESS_DB_PATH};"
-            access_conn = pyodbc.connect(access_conn_str)
+            access_conn = self.connect_access()
 
             # Access Customers mapping
             customers_df = pd.read_sql("SELECT [ID], [Company] FROM [Customers]", access_conn)
@@ -155,7 +174,7 @@ class etl:
                 full_name = f"{first_name} {last_name}"
                 mapping['employees'][employee_id] = full_name
 
-            access_conn.close()
+            self.release_access(access_conn)
 
             print(f"  ✅ Mapping created: {len(mapping['customers'])} customers, {len(mapping['employees'])} employees")
 
@@ -164,156 +183,26 @@ class etl:
 
         return mapping
 
-    def _ensure_dimcustomer_table_exists(self):
-        """Ensure DimCustomer table exists"""
-        try:
-            cursor = self.dw_conn.cursor()
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='DimCustomer' AND xtype='U')
-                BEGIN
-                    CREATE TABLE DimCustomer (
-                        CustomerKey INT IDENTITY(1,1) PRIMARY KEY,
-                        CustomerID VARCHAR(10) NOT NULL,
-                        CompanyName VARCHAR(100) NOT NULL,
-                        ContactName VARCHAR(100),
-                        ContactTitle VARCHAR(100),
-                        Address VARCHAR(200),
-                        City VARCHAR(50),
-                        Region VARCHAR(50),
-                        PostalCode VARCHAR(20),
-                        Country VARCHAR(50),
-                        Phone VARCHAR(30),
-                        SourceSystem VARCHAR(20),
-                        UNIQUE(CustomerID, SourceSystem)
-                    );
-                END
-            """)
-            self.dw_conn.commit()
-            cursor.close()
-        except Exception as e:
-            print(f"⚠️  Error creating DimCustomer: {e}")
-
-    def _ensure_dimemployee_table_exists(self):
-        """Ensure DimEmployee table exists"""
-        try:
-            cursor = self.dw_conn.cursor()
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='DimEmployee' AND xtype='U')
-                BEGIN
-                    CREATE TABLE DimEmployee (
-                        EmployeeKey INT IDENTITY(1,1) PRIMARY KEY,
-                        EmployeeID INT NOT NULL,
-                        LastName VARCHAR(50) NOT NULL,
-                        FirstName VARCHAR(50) NOT NULL,
-                        Title VARCHAR(100),
-                        TitleOfCourtesy VARCHAR(25),
-                        BirthDate DATE,
-                        HireDate DATE,
-                        Address VARCHAR(200),
-                        City VARCHAR(50),
-                        Region VARCHAR(50),
-                        PostalCode VARCHAR(20),
-                        Country VARCHAR(50),
-                        HomePhone VARCHAR(30),
-                        ReportsTo INT,
-                        SourceSystem VARCHAR(20),
-                        UNIQUE(EmployeeID, SourceSystem)
-                    );
-                END
-            """)
-            self.dw_conn.commit()
-            cursor.close()
-        except Exception as e:
-            print(f"⚠️  Error creating DimEmployee: {e}")
-
-    def _ensure_factorders_table_exists(self):
-        """Ensure FactOrders table exists"""
-        try:
-            cursor = self.dw_conn.cursor()
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='FactOrders' AND xtype='U')
-                BEGIN
-                    CREATE TABLE FactOrders (
-                        FactOrderKey INT IDENTITY(1,1) PRIMARY KEY,
-                        OrderID INT NOT NULL,
-                        CustomerKey INT,
-                        EmployeeKey INT,
-                        OrderDateKey INT,
-                        OrderDate DATE,
-                        RequiredDate DATE,
-                        ShippedDate DATE,
-                        ShipVia INT,
-                        Freight DECIMAL(10,2),
-                        ShipName VARCHAR(100),
-                        ShipAddress VARCHAR(200),
-                        ShipCity VARCHAR(50),
-                        ShipRegion VARCHAR(50),
-                        ShipPostalCode VARCHAR(20),
-                        ShipCountry VARCHAR(50),
-                        TotalAmount DECIMAL(10,2),
-                        IsDelivered BIT,
-                        DeliveryDelayDays INT,
-                        SourceSystem VARCHAR(20),
-                        FOREIGN KEY (CustomerKey) REFERENCES DimCustomer(CustomerKey),
-                        FOREIGN KEY (EmployeeKey) REFERENCES DimEmployee(EmployeeKey),
-                        FOREIGN KEY (OrderDateKey) REFERENCES DimDate(DateKey)
-                    );
-
-                    -- Create indexes for performance
-                    CREATE INDEX IX_FactOrders_OrderDateKey ON FactOrders(OrderDateKey);
-                    CREATE INDEX IX_FactOrders_CustomerKey ON FactOrders(CustomerKey);
-                    CREATE INDEX IX_FactOrders_EmployeeKey ON FactOrders(EmployeeKey);
-                END
-            """)
-            self.dw_conn.commit()
-            cursor.close()
-            print("  ✅ FactOrders table verified/created")
-        except Exception as e:
-            print(f"  ❌ Error creating FactOrders: {e}")
-
-    def _ensure_dimdate_table_exists(self):
-        """Ensure DimDate table exists"""
-        try:
-            cursor = self.dw_conn.cursor()
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='DimDate' AND xtype='U')
-                BEGIN
-                    CREATE TABLE DimDate (
-                        DateKey INT PRIMARY KEY,
-                        Date DATE NOT NULL,
-                        Year INT NOT NULL,
-                        Quarter INT NOT NULL,
-                        Month INT NOT NULL,
-                        Day INT NOT NULL,
-                        MonthName VARCHAR(20) NOT NULL,
-                        DayOfWeek VARCHAR(20) NOT NULL,
-                        IsWeekend BIT NOT NULL
-                    );
-
-                    -- Create indexes for performance
-                    CREATE INDEX IX_DimDate_Date ON DimDate(Date);
-                    CREATE INDEX IX_DimDate_Year ON DimDate(Year);
-                    CREATE INDEX IX_DimDate_YearMonth ON DimDate(Year, Month);
-                END
-            """)
-            self.dw_conn.commit()
-            cursor.close()
-            print("  ✅ DimDate table verified/created")
-        except Exception as e:
-            print(f"  ❌ Error creating DimDate: {e}")
-
-    def get_dashboard_data(self):
-        """Extract data specifically for dashboard visualization"""
+    def get_dashboard_data(self, from_mirror=False):
+        """Extract data specifically for dashboard visualization (from the DW or its DuckDB mirror)"""
         print("\n📊 PREPARING DASHBOARD DATA")
         print("-" * 30)
 
-        if self.dw_conn is None:
+        conn = self.dw_conn
+        if from_mirror:
+            try:
+                conn = analytics_mirror.connect_mirror(DatabaseConfig.MIRROR_DATABASE, read_only=True)
+            except Exception as e:
+                print(f"  ⚠️  Mirror not available, reading the DW: {e}")
+                conn = self.dw_conn
+
+        if conn is None:
             print("  ❌ No connection to DW")
             return pd.DataFrame()
 
         try:
             # Query to get comprehensive data for dashboard
-            query = """
+            query = f"""
             SELECT 
                 fo.OrderID,
                 fo.OrderDate,
@@ -325,38 +214,35 @@ class etl:
                 fo.SourceSystem,
                 fo.DeliveryDelayDays,
                 dc.CustomerID,
-                dc.CompanyName as CustomerName,
+                COALESCE(cc.CanonicalName, dc.CompanyName) as CustomerName,
                 dc.Country as CustomerCountry,
                 de.EmployeeID,
-                de.FirstName + ' ' + de.LastName as EmployeeName,
+                {warehouse_backend.backend_for(conn).concat('de.FirstName', "' '", 'de.LastName')} as EmployeeName,
                 de.Title as EmployeeTitle,
                 dd.Year,
                 dd.Month,
                 dd.MonthName
             FROM FactOrders fo
             LEFT JOIN DimCustomer dc ON fo.CustomerKey = dc.CustomerKey
+            LEFT JOIN CustomerCluster cc ON fo.CustomerKey = cc.CustomerKey
             LEFT JOIN DimEmployee de ON fo.EmployeeKey = de.EmployeeKey
             LEFT JOIN DimDate dd ON fo.OrderDateKey = dd.DateKey
             ORDER BY fo.OrderDate DESC
             """
 
-            df = pd.read_sql(query, self.dw_conn)
+            df = pd.read_sql(query, conn)
+            if conn is not self.dw_conn:
+                conn.close()
 
             # Calculate additional metrics
-            df['DeliveryStatus'] = df['IsDelivered'].apply(lambda x: 'Delivered' if x == 1 else 'Not Delivered')
+            df['DeliveryStatus'] = np.where(df['IsDelivered'] == 1, 'Delivered', 'Not Delivered')
 
-            # Calculate delivery performance
+            # Calculate delivery performance (no delay recorded: Unknown)
             if 'DeliveryDelayDays' in df.columns:
-                df['DeliveryPerformance'] = df['DeliveryDelayDays'].apply(
-                    lambda x: 'On Time' if x <= 0 else ('Late' if x > 0 else 'Unknown')
-                )
+                delay = pd.to_numeric(df['DeliveryDelayDays'], errors='coerce')
+                df['DeliveryPerformance'] = np.select([delay <= 0, delay > 0], ['On Time', 'Late'], default='Unknown')
 
             print(f"  ✅ Dashboard data loaded: {len(df)} rows")
-
-            # Save to CSV for backup
-            df.to_csv('data/dashboard_data.csv', index=False)
-            print("  💾 Data saved to data/dashboard_data.csv")
-
             return df
 
         except Exception as e:
@@ -368,11 +254,9 @@ class etl:
     #connect to SQL Server to get current operational data
     #simultaneously extract historical data from Microsoft Access
 
-    def extract_from_sql_server(self):
-        print("\n📥 EXTRACT FROM SQL SERVER")
-        print("-" * 30)
-
-        queries = {
+    def sql_server_queries(self):
+        order_details = warehouse_backend.backend_for(self.source_conn).quote('Order Details')
+        return {
             'customers': """
                 SELECT CustomerID, CompanyName, ContactName, ContactTitle, 
                        Address, City, Region, PostalCode, Country, Phone
@@ -386,23 +270,50 @@ class etl:
                 FROM Employees
                 WHERE EmployeeID IS NOT NULL
             """,
-            'orders': """
+            'shippers': """
+                SELECT ShipperID, CompanyName, Phone
+                FROM Shippers
+                WHERE ShipperID IS NOT NULL
+            """,
+            'products': """
+                SELECT p.ProductID, p.ProductName, c.CategoryName,
+                       p.QuantityPerUnit, p.UnitPrice, p.Discontinued
+                FROM Products p
+                LEFT JOIN Categories c ON p.CategoryID = c.CategoryID
+                WHERE p.ProductID IS NOT NULL
+            """,
+            'orders': f"""
                 SELECT o.OrderID, o.CustomerID, o.EmployeeID, 
                        o.OrderDate, o.RequiredDate, o.ShippedDate,
                        o.ShipVia, o.Freight, o.ShipName, o.ShipAddress,
                        o.ShipCity, o.ShipRegion, o.ShipPostalCode, o.ShipCountry,
                        SUM(od.Quantity * od.UnitPrice * (1 - od.Discount)) as TotalAmount
                 FROM Orders o
-                LEFT JOIN [Order Details] od ON o.OrderID = od.OrderID
+                LEFT JOIN {order_details} od ON o.OrderID = od.OrderID
                 WHERE o.OrderID IS NOT NULL
                 GROUP BY o.OrderID, o.CustomerID, o.EmployeeID, o.OrderDate, 
                          o.RequiredDate, o.ShippedDate, o.ShipVia, o.Freight,
                          o.ShipName, o.ShipAddress, o.ShipCity, o.ShipRegion,
                          o.ShipPostalCode, o.ShipCountry
                 ORDER BY o.OrderID
+            """,
+            'order_details': f"""
+                SELECT OrderID, ProductID, UnitPrice, Quantity, Discount
+                FROM {order_details}
+                WHERE OrderID IS NOT NULL
+                ORDER BY OrderID
             """
         }
 
+    def extract_from_sql_server(self, include_orders=True):
+        print("\n📥 EXTRACT FROM SQL SERVER")
+        print("-" * 30)
+
+        queries = self.sql_server_queries()
+        if not include_orders:
+            queries.pop('orders')
+            queries.pop('order_details')
+
         data = {}
         for name, query in queries.items():
             try:
@@ -414,7 +325,31 @@ class etl:
 
         return data
 
-    def extract_from_access(self):
+    def connect_access(self):
+        return connection_pool.access().acquire()
+
+    def release_access(self, access_conn):
+        connection_pool.access().release(access_conn)
+
+    def find_access_orders_table(self, table_list):
+        orders_table = 'Orders'
+        if orders_table not in table_list:
+            for table in table_list:
+                if 'order' in table.lower() and 'detail' not in table.lower():
+                    orders_table = table
+                    break
+        return orders_table
+
+    def find_access_order_details_table(self, table_list):
+        order_details_table = 'Order Details'
+        if order_details_table not in table_list:
+            for table in table_list:
+                if 'order detail' in table.lower() or 'order_details' in table.lower():
+                    order_details_table = table
+                    break
+        return order_details_table
+
+    def extract_from_access(self, include_orders=True):
         """EXTRACT ONLY - No transformation in this function"""
         if not DatabaseConfig.ACCESS_DB_PATH:
             print("\nℹ️  No Access database configured")
@@ -424,8 +359,7 @@ class etl:
         print("-" * 30)
 
         try:
-            access_conn_str = f"DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={DatabaseConfig.ACCESS_DB_PATH};"
-            access_conn = pyodbc.connect(access_conn_str)
+            access_conn = self.connect_access()
 
             # Discover available tables
             cursor = access_conn.cursor()
@@ -475,41 +409,71 @@ class etl:
                 print(f"  ❌ Error extracting Employees: {e}")
                 raw_data['employees_raw'] = pd.DataFrame()
 
-            # Extract Orders (RAW - no transformation)
+            # Extract Shippers (RAW - no transformation)
             try:
-                print("  Extracting Orders (raw)...")
-                orders_table = 'Orders'
-                if orders_table not in table_list:
+                print("  Extracting Shippers (raw)...")
+                shipper_table = 'Shippers'
+                if shipper_table not in table_list:
                     for table in table_list:
-                        if 'order' in table.lower() and 'detail' not in table.lower():
-                            orders_table = table
+                        if 'shipper' in table.lower():
+                            shipper_table = table
                             break
 
-                query = f"SELECT * FROM [{orders_table}]"
-                raw_data['orders_raw'] = pd.read_sql(query, access_conn)
-                print(f"  ✅ Raw Orders: {len(raw_data['orders_raw'])} rows")
+                query = f"SELECT * FROM [{shipper_table}]"
+                raw_data['shippers_raw'] = pd.read_sql(query, access_conn)
+                print(f"  ✅ Raw Shippers: {len(raw_data['shippers_raw'])} rows")
+            except Exception as e:
+                print(f"  ⚠️  Error extracting Shippers: {e}")
+                raw_data['shippers_raw'] = pd.DataFrame()
+
+            # Extract Orders (RAW - no transformation)
+            try:
+                if include_orders:
+                    print("  Extracting Orders (raw)...")
+                    orders_table = self.find_access_orders_table(table_list)
+
+                    query = f"SELECT * FROM [{orders_table}]"
+                    raw_data['orders_raw'] = pd.read_sql(query, access_conn)
+                    print(f"  ✅ Raw Orders: {len(raw_data['orders_raw'])} rows")
+                else:
+                    raw_data['orders_raw'] = pd.DataFrame()
             except Exception as e:
                 print(f"  ❌ Error extracting Orders: {e}")
                 raw_data['orders_raw'] = pd.DataFrame()
 
-            # Extract Order Details (for TotalAmount calculation)
+            # Extract Products (RAW - no transformation)
             try:
-                print("  Extracting Order Details (raw)...")
-                order_details_table = 'Order Details'
-                if order_details_table not in table_list:
+                print("  Extracting Products (raw)...")
+                product_table = 'Products'
+                if product_table not in table_list:
                     for table in table_list:
-                        if 'order detail' in table.lower() or 'order_details' in table.lower():
-                            order_details_table = table
+                        if 'product' in table.lower():
+                            product_table = table
                             break
 
-                query = f"SELECT * FROM [{order_details_table}]"
-                raw_data['order_details_raw'] = pd.read_sql(query, access_conn)
-                print(f"  ✅ Raw Order Details: {len(raw_data['order_details_raw'])} rows")
+                query = f"SELECT * FROM [{product_table}]"
+                raw_data['products_raw'] = pd.read_sql(query, access_conn)
+                print(f"  ✅ Raw Products: {len(raw_data['products_raw'])} rows")
+            except Exception as e:
+                print(f"  ⚠️  Error extracting Products: {e}")
+                raw_data['products_raw'] = pd.DataFrame()
+
+            # Extract Order Details (FactOrderDetails, Access order totals)
+            try:
+                if include_orders:
+                    print("  Extracting Order Details (raw)...")
+                    order_details_table = self.find_access_order_details_table(table_list)
+
+                    query = f"SELECT * FROM [{order_details_table}]"
+                    raw_data['order_details_raw'] = pd.read_sql(query, access_conn)
+                    print(f"  ✅ Raw Order Details: {len(raw_data['order_details_raw'])} rows")
+                else:
+                    raw_data['order_details_raw'] = pd.DataFrame()
             except Exception as e:
                 print(f"  ⚠️  Error extracting Order Details: {e}")
                 raw_data['order_details_raw'] = pd.DataFrame()
 
-            access_conn.close()
+            self.release_access(access_conn)
 
             # Check if we got any data
             has_data = False
@@ -613,8 +577,8 @@ class etl:
         if source_name == 'Access':
             # Convert CustomerID to string and add ACC- prefix
             if 'CustomerID' in dim_customer.columns:
-                dim_customer['CustomerID'] = pd.to_numeric(dim_customer['CustomerID'], errors='coerce')
-                dim_customer['CustomerID'] = 'ACC-' + dim_customer['CustomerID'].fillna(0).astype(int).astype(str)
+                customer_ids = pd.to_numeric(dim_customer['CustomerID'], errors='coerce').astype('Int64')
+                dim_customer['CustomerID'] = 'ACC-' + customer_ids.astype(typed_schema.TEXT)
 
         # GENERAL CLEANING (applies to both SQL and Access)
 
@@ -634,15 +598,8 @@ class etl:
         if 'ContactTitle' in dim_customer.columns:
             dim_customer['ContactTitle'] = dim_customer['ContactTitle'].fillna('Unknown')
 
-        # Convert all text columns to strings
-        for col in dim_customer.columns:
-            if dim_customer[col].dtype == 'object':
-                dim_customer[col] = dim_customer[col].astype(str)
-
-        # Keep only required columns
-        available_required = [col for col in required_cols if col in dim_customer.columns]
-        if available_required:
-            dim_customer = dim_customer[available_required + ['SourceSystem']]
+        # Typed columns (strings keep real nulls)
+        dim_customer = typed_schema.apply_schema(dim_customer, typed_schema.DIM_CUSTOMER)
 
         print(f"  ✅ {len(dim_customer)} customers transformed")
         return dim_customer
@@ -729,8 +686,8 @@ class etl:
         if source_name == 'Access':
             # Convert and prefix EmployeeID
             if 'EmployeeID' in dim_employee.columns:
-                dim_employee['EmployeeID'] = pd.to_numeric(dim_employee['EmployeeID'], errors='coerce')
-                dim_employee['EmployeeID'] = 1000 + dim_employee['EmployeeID'].fillna(0).astype(int)
+                employee_ids = pd.to_numeric(dim_employee['EmployeeID'], errors='coerce').astype('Int64')
+                dim_employee['EmployeeID'] = 1000 + employee_ids
 
         # GENERAL CLEANING
 
@@ -766,20 +723,59 @@ class etl:
         if 'ReportsTo' in dim_employee.columns:
             dim_employee['ReportsTo'] = pd.to_numeric(dim_employee['ReportsTo'], errors='coerce')
 
-        # Convert text to strings
-        for col in dim_employee.columns:
-            if dim_employee[col].dtype == 'object':
-                dim_employee[col] = dim_employee[col].astype(str)
-
-        # Keep only required columns
-        available_required = [col for col in required_cols if col in dim_employee.columns]
-        if available_required:
-            dim_employee = dim_employee[available_required + ['SourceSystem']]
+        # Typed columns (nullable Int64, strings keep real nulls)
+        dim_employee = typed_schema.apply_schema(dim_employee, typed_schema.DIM_EMPLOYEE)
 
         print(f"  ✅ {len(dim_employee)} employees transformed")
         return dim_employee
 
-    def transform_fact_orders(self, orders_df, source_name='SQL'):
+    def transform_dim_shipper(self, shippers_df, source_name='SQL'):
+        print(f"\n🚚 TRANSFORM DIMSHIPPER ({source_name})")
+        print("-" * 30)
+
+        if shippers_df.empty:
+            print("  ⚠️  No shipper data")
+            return pd.DataFrame()
+
+        # Access: ID / Company / Business Phone
+        dim_shipper = shippers_df.rename(columns={
+            'ID': 'ShipperID',
+            'Company': 'CompanyName',
+            'Business Phone': 'Phone',
+        })
+        dim_shipper['SourceSystem'] = source_name
+
+        dim_shipper = typed_schema.apply_schema(dim_shipper, typed_schema.DIM_SHIPPER)
+        dim_shipper = dim_shipper[dim_shipper['ShipperID'].notna()]
+
+        print(f"  ✅ {len(dim_shipper)} shippers transformed")
+        return dim_shipper
+
+    def transform_dim_product(self, products_df, source_name='SQL'):
+        print(f"\n📦 TRANSFORM DIMPRODUCT ({source_name})")
+        print("-" * 30)
+
+        if products_df.empty:
+            print("  ⚠️  No product data")
+            return pd.DataFrame()
+
+        # Access: ID / Product Name / Category / Quantity Per Unit / List Price
+        dim_product = products_df.rename(columns={
+            'ID': 'ProductID',
+            'Product Name': 'ProductName',
+            'Category': 'CategoryName',
+            'Quantity Per Unit': 'QuantityPerUnit',
+            'List Price': 'UnitPrice',
+        })
+        dim_product['SourceSystem'] = source_name
+
+        dim_product = typed_schema.apply_schema(dim_product, typed_schema.DIM_PRODUCT)
+        dim_product = dim_product[dim_product['ProductID'].notna()]
+
+        print(f"  ✅ {len(dim_product)} products transformed")
+        return dim_product
+
+    def transform_fact_orders(self, orders_df, source_name='SQL', engine='pandas'):
         print(f"\n📦 TRANSFORM FACTORDERS ({source_name})")
         print("-" * 30)
 
@@ -789,11 +785,8 @@ class etl:
 
         fact_orders = orders_df.copy()
 
-        # For Access, we might need to calculate TotalAmount from Order Details
-        if source_name == 'Access' and 'TotalAmount' not in fact_orders.columns:
-            print("  ℹ️  Calculating TotalAmount from Order Details...")
-            # This would require the order_details_raw data to be passed or accessible
-            # For now, we'll add a placeholder
+        # Access orders have no TotalAmount: it is summed from FactOrderDetails
+        # once the lines are loaded (see update_order_totals)
 
         # Different column mapping for Access vs SQL
         if source_name == 'Access':
@@ -805,6 +798,7 @@ class etl:
                 'Order Date': 'OrderDate',
                 'Required Date': 'RequiredDate',
                 'Shipped Date': 'ShippedDate',
+                'Shipper ID': 'ShipVia',
                 'Shipping Fee': 'Freight',
                 'Ship Fee': 'Freight',
                 'Ship Name': 'ShipName',
@@ -865,6 +859,21 @@ class etl:
             if col not in fact_orders.columns:
                 fact_orders[col] = None
 
+        # Dates, derived columns, Access IDs and numeric types
+        if engine == 'polars':
+            fact_orders = polars_engine.compute_fact_orders(fact_orders, source_name)
+        else:
+            fact_orders = self._compute_fact_orders(fact_orders, source_name)
+
+        # Typed columns (nullable Int64, strings keep real nulls)
+        fact_orders = typed_schema.apply_schema(fact_orders, typed_schema.FACT_ORDERS)
+
+        print(f"  ✅ {len(fact_orders)} orders transformed")
+
+        return fact_orders
+
+    def _compute_fact_orders(self, fact_orders, source_name):
+        """Column computations of transform_fact_orders (pandas engine)"""
         # Convert date columns
         date_cols = ['OrderDate', 'RequiredDate', 'ShippedDate']
         for col in date_cols:
@@ -875,13 +884,10 @@ class etl:
         fact_orders['IsDelivered'] = fact_orders['ShippedDate'].notna().astype(int)
 
         if 'ShippedDate' in fact_orders.columns and 'RequiredDate' in fact_orders.columns:
-            fact_orders['DeliveryDelayDays'] = np.where(
-                fact_orders['ShippedDate'].notna() & fact_orders['RequiredDate'].notna(),
-                (fact_orders['ShippedDate'] - fact_orders['RequiredDate']).dt.days,
-                None
-            )
+            # NaT on either side -> <NA>
+            fact_orders['DeliveryDelayDays'] = (fact_orders['ShippedDate'] - fact_orders['RequiredDate']).dt.days.astype('Int64')
         else:
-            fact_orders['DeliveryDelayDays'] = None
+            fact_orders['DeliveryDelayDays'] = pd.NA
 
         # Add source system tag
         fact_orders['SourceSystem'] = source_name
@@ -890,73 +896,23 @@ class etl:
         # ACCESS-SPECIFIC TRANSFORMATIONS WITH FIX FOR ID 0
         # ==================================================
         if source_name == 'Access':
-            # Process CustomerID - FIX: Only convert valid IDs (> 0)
+            # Only valid IDs (> 0) are converted, 0 / NaN / negative become <NA>
             if 'CustomerID' in fact_orders.columns:
-                try:
-                    # Convert to numeric, handle errors
-                    fact_orders['CustomerID'] = pd.to_numeric(fact_orders['CustomerID'], errors='coerce')
-
-                    # Debug info
-                    invalid_customers = fact_orders['CustomerID'].isna() | (fact_orders['CustomerID'] <= 0)
-                    valid_customers = ~invalid_customers
-
-                    if invalid_customers.any():
-                        print(
-                            f"  ⚠️  Found {invalid_customers.sum()} Access orders with invalid CustomerID (0, NaN, or negative)")
-                        # Set invalid CustomerIDs to None
-                        fact_orders.loc[invalid_customers, 'CustomerID'] = None
-
-                    # Only convert valid IDs (> 0) to ACC- prefix format
-                    if valid_customers.any():
-                        fact_orders.loc[valid_customers, 'CustomerID'] = 'ACC-' + fact_orders.loc[
-                            valid_customers, 'CustomerID'].astype(int).astype(str)
-
-                except Exception as e:
-                    print(f"  ⚠️  Error processing Access CustomerID: {e}")
-                    # Keep as is if conversion fails
-                    pass
-
-            # Process EmployeeID - FIX: Only convert valid IDs (> 0)
+                customer_ids = pd.to_numeric(fact_orders['CustomerID'], errors='coerce')
+                valid_customers = customer_ids > 0
+                if (~valid_customers).any():
+                    print(
+                        f"  ⚠️  Found {(~valid_customers).sum()} Access orders with invalid CustomerID (0, NaN, or negative)")
+                customer_ids = np.trunc(customer_ids.where(valid_customers)).astype('Int64')
+                fact_orders['CustomerID'] = 'ACC-' + customer_ids.astype(typed_schema.TEXT)
+
             if 'EmployeeID' in fact_orders.columns:
-                try:
-                    # Convert to numeric, handle errors
-                    fact_orders['EmployeeID'] = pd.to_numeric(fact_orders['EmployeeID'], errors='coerce')
-
-                    # Debug info
-                    invalid_employees = fact_orders['EmployeeID'].isna() | (fact_orders['EmployeeID'] <= 0)
-                    valid_employees = ~invalid_employees
-
-                    if invalid_employees.any():
-                        print(
-                            f"  ⚠️  Found {invalid_employees.sum()} Access orders with invalid EmployeeID (0, NaN, or negative)")
-                        # Set invalid EmployeeIDs to None
-                        fact_orders.loc[invalid_employees, 'EmployeeID'] = None
-
-                    # Only convert valid IDs (> 0) to 1000+ format
-                    if valid_employees.any():
-                        fact_orders.loc[valid_employees, 'EmployeeID'] = 1000 + fact_orders.loc[
-                            valid_employees, 'EmployeeID'].astype(int)
-
-                except Exception as e:
-                    print(f"  ⚠️  Error processing Access EmployeeID: {e}")
-                    # Keep as is if conversion fails
-                    pass
-
-            # Debug: Show sample of problematic records
-            if 'CustomerID' in fact_orders.columns and 'EmployeeID' in fact_orders.columns:
-                invalid_records = fact_orders[
-                    (fact_orders['CustomerID'].isna()) |
-                    (fact_orders['EmployeeID'].isna()) |
-                    (fact_orders['CustomerID'] == 'ACC-0') |
-                    (fact_orders['EmployeeID'] == 1000)
-                    ]
-
-                if not invalid_records.empty:
-                    print(f"  ⚠️  Sample problematic orders (showing first 5):")
-                    for idx, row in invalid_records.head().iterrows():
-                        print(f"    Order {row.get('OrderID', 'N/A')}: "
-                              f"CustomerID={row.get('CustomerID', 'N/A')}, "
-                              f"EmployeeID={row.get('EmployeeID', 'N/A')}")
+                employee_ids = pd.to_numeric(fact_orders['EmployeeID'], errors='coerce')
+                valid_employees = employee_ids > 0
+                if (~valid_employees).any():
+                    print(
+                        f"  ⚠️  Found {(~valid_employees).sum()} Access orders with invalid EmployeeID (0, NaN, or negative)")
+                fact_orders['EmployeeID'] = 1000 + np.trunc(employee_ids.where(valid_employees)).astype('Int64')
 
         # Convert numeric columns
         if 'Freight' in fact_orders.columns:
@@ -966,37 +922,148 @@ class etl:
         if 'ShipVia' in fact_orders.columns:
             fact_orders['ShipVia'] = pd.to_numeric(fact_orders['ShipVia'], errors='coerce').fillna(1)
 
-        # Convert text to strings
-        for col in fact_orders.columns:
-            if fact_orders[col].dtype == 'object':
-                fact_orders[col] = fact_orders[col].astype(str)
+        return fact_orders
 
-        # Add calculated columns to keep list
-        keep_cols = required_cols + ['IsDelivered', 'DeliveryDelayDays', 'SourceSystem']
-        available_cols = [col for col in keep_cols if col in fact_orders.columns]
-        if available_cols:
-            fact_orders = fact_orders[available_cols]
 
-        print(f"  ✅ {len(fact_orders)} orders transformed")
 
-        # Final validation check
-        if source_name == 'Access':
-            invalid_count = fact_orders[
-                (fact_orders['CustomerID'].isna()) |
-                (fact_orders['EmployeeID'].isna())
-                ].shape[0]
-            if invalid_count > 0:
-                print(
-                    f"  ℹ️  {invalid_count} Access orders have NULL CustomerID/EmployeeID (will be loaded with NULL keys)")
+    def transform_fact_order_details(self, order_details_df, source_name='SQL'):
+        print(f"\n🧾 TRANSFORM FACTORDERDETAILS ({source_name})")
+        print("-" * 30)
 
-        return fact_orders
+        if order_details_df.empty:
+            print("  ⚠️  No order line data")
+            return pd.DataFrame()
+
+        # Access: Order ID / Product ID / Unit Price
+        order_details = order_details_df.rename(columns={
+            'Order ID': 'OrderID',
+            'Product ID': 'ProductID',
+            'Unit Price': 'UnitPrice',
+        })
+        order_details['SourceSystem'] = source_name
+        order_details = typed_schema.apply_schema(order_details, typed_schema.FACT_ORDER_DETAILS)
+        order_details = order_details[order_details['OrderID'].notna()]
+
+        order_details['Quantity'] = order_details['Quantity'].fillna(0)
+        order_details['UnitPrice'] = order_details['UnitPrice'].fillna(0)
+        order_details['Discount'] = order_details['Discount'].fillna(0)
+        order_details['LineAmount'] = (
+            order_details['Quantity'].to_numpy(dtype=float) * order_details['UnitPrice'] * (1 - order_details['Discount'])
+        ).round(2)
+
+        print(f"  ✅ {len(order_details)} order lines transformed")
+        return order_details
+
+
+
+    # DATA QUALITY
+    def fact_order_rules(self):
+        """Rules checked on every FactOrders batch before loading"""
+        rules = [
+            data_quality.NotNullRule('order_id_not_null', 'OrderID'),
+            data_quality.NotNullRule('order_date_not_null', 'OrderDate'),
+            data_quality.NotNullRule('customer_id_not_null', 'CustomerID'),
+            data_quality.NotNullRule('employee_id_not_null', 'EmployeeID'),
+            data_quality.RangeRule('total_amount_positive', 'TotalAmount', min_value=0),
+            data_quality.RangeRule('freight_positive', 'Freight', min_value=0),
+            data_quality.DateOrderRule('shipped_after_order', 'OrderDate', 'ShippedDate'),
+            data_quality.DateOrderRule('required_after_order', 'OrderDate', 'RequiredDate'),
+            data_quality.PrefixRule('access_customer_prefix', 'CustomerID', 'ACC-', where=('SourceSystem', 'Access')),
+            data_quality.RangeRule('access_employee_offset', 'EmployeeID', min_value=1001,
+                                   where=('SourceSystem', 'Access')),
+        ]
+
+        # referential existence against what is already in the dimensions
+        try:
+            customers = pd.read_sql("SELECT CustomerID, SourceSystem FROM DimCustomer", self.dw_conn)
+            employees = pd.read_sql("SELECT EmployeeID, SourceSystem FROM DimEmployee", self.dw_conn)
+            customers = customers.astype({'CustomerID': typed_schema.TEXT, 'SourceSystem': typed_schema.TEXT})
+            employees = employees.astype({'EmployeeID': 'Int64', 'SourceSystem': typed_schema.TEXT})
+            rules += [
+                data_quality.ReferenceRule('customer_exists', ['CustomerID', 'SourceSystem'], customers),
+                data_quality.ReferenceRule('employee_exists', ['EmployeeID', 'SourceSystem'], employees),
+            ]
+        except Exception as e:
+            print(f"  ⚠️  Referential DQ rules skipped: {e}")
 
+        return rules
+
+    def validate_fact_orders(self, fact_orders):
+        return data_quality.run_rules(fact_orders, self.fact_order_rules(), 'FactOrders', 'OrderID')
+
+    def save_dq_results(self, results, violations):
+        try:
+            run_id = data_quality.save_results(self.dw_conn, results, violations)
+            if run_id:
+                print(f"  💾 DQ results saved (run {run_id}, {len(violations)} offending keys)")
+        except Exception as e:
+            print(f"  ⚠️  Cannot save DQ results: {e}")
+
+
+    # ENTITY RESOLUTION
+    # the same company can exist as a SQL CustomerID and as an ACC-n Access customer
+    def resolve_customer_entities(self):
+        print("\n🔗 CUSTOMER ENTITY RESOLUTION")
+        print("-" * 30)
+
+        try:
+            customers = pd.read_sql(
+                "SELECT CustomerKey, CompanyName, PostalCode, Phone, SourceSystem FROM DimCustomer",
+                self.dw_conn
+            )
+            if customers.empty:
+                print("  ℹ️  No customers to resolve")
+                return pd.DataFrame()
+
+            mapping = entity_resolution.resolve_customers(customers)
+            entity_resolution.save_clusters(self.dw_conn, mapping)
+
+            linked = mapping.groupby('ClusterKey')['SourceSystem'].nunique()
+            print(f"  ✅ {len(mapping)} customers -> {mapping['ClusterKey'].nunique()} clusters "
+                  f"({int((linked > 1).sum())} cross-source)")
+            return mapping
+
+        except Exception as e:
+            print(f"  ❌ Error resolving customers: {e}")
+            return pd.DataFrame()
 
 
     #LOAD FUNCTIONS
     # load the transformed data into our star schema data warehouse
     # with intelligent foreign key resolution and deduplication
-    def load_dimensions_to_dw(self, dim_customer, dim_employee):
+    @staticmethod
+    def _only_new_rows(df, existing, key_cols):
+        """Anti-join on the business key, also dropping duplicates inside the batch"""
+        df = df.drop_duplicates(subset=key_cols)
+        if existing.empty:
+            return df
+        keys = pd.MultiIndex.from_frame(df[key_cols].astype(str))
+        known = pd.MultiIndex.from_frame(existing[key_cols].astype(str))
+        return df[~keys.isin(known)]
+
+    def _bulk_insert(self, table, columns, df):
+        self.backend.bulk_insert(self.dw_conn, table, df, columns)
+
+    def _existing_orders(self, table, batch, distinct=False):
+        """
+        (OrderID, SourceSystem) pairs of `table` within the OrderID range of each
+        source in `batch`: an index range read, however large the warehouse is
+        """
+        frames = []
+        for source_name, rows in batch.groupby('SourceSystem'):
+            ids = rows['OrderID'].dropna()
+            if ids.empty:
+                continue
+            frames.append(pd.read_sql(
+                f"SELECT {'DISTINCT ' if distinct else ''}OrderID, SourceSystem FROM {table} "
+                "WHERE SourceSystem = ? AND OrderID BETWEEN ? AND ?",
+                self.dw_conn, params=[source_name, int(ids.min()), int(ids.max())]
+            ))
+        if not frames:
+            return pd.DataFrame(columns=['OrderID', 'SourceSystem'])
+        return pd.concat(frames, ignore_index=True).astype({'OrderID': 'Int64', 'SourceSystem': typed_schema.TEXT})
+
+    def load_dimensions_to_dw(self, dim_customer, dim_employee, dim_shipper=None, dim_product=None):
         print("\n📤 LOADING DIMENSIONS")
         print("-" * 30)
 
@@ -1004,9 +1071,6 @@ class etl:
             print("  ❌ No connection to DW")
             return
 
-        self._ensure_dimcustomer_table_exists()
-        self._ensure_dimemployee_table_exists()
-
         # Load customers
         if not dim_customer.empty:
             print("  📋 Loading DimCustomer...")
@@ -1015,57 +1079,15 @@ class etl:
                 existing_customers = pd.read_sql(existing_query, self.dw_conn)
 
                 # Filter out existing customers
-                if not existing_customers.empty:
-                    dim_customer['composite_key'] = dim_customer['CustomerID'].astype(str) + '_' + dim_customer[
-                        'SourceSystem'].astype(str)
-                    existing_customers['composite_key'] = existing_customers['CustomerID'].astype(str) + '_' + \
-                                                          existing_customers['SourceSystem'].astype(str)
-
-                    new_customers = dim_customer[
-                        ~dim_customer['composite_key'].isin(existing_customers['composite_key'])]
-                    dim_customer = new_customers.drop('composite_key', axis=1, errors='ignore')
+                dim_customer = self._only_new_rows(dim_customer, existing_customers, ['CustomerID', 'SourceSystem'])
+                dim_customer = dim_customer[dim_customer['CustomerID'].notna()]
 
                 # Insert new customers
                 if not dim_customer.empty:
-                    cursor = self.dw_conn.cursor()
-                    inserted_count = 0
-
-                    for _, row in dim_customer.iterrows():
-                        try:
-                            customer_id = str(row.get('CustomerID', '')) if pd.notna(row.get('CustomerID')) else ''
-
-                            if not customer_id:
-                                continue
-
-                            cursor.execute("""
-                                INSERT INTO DimCustomer (CustomerID, CompanyName, ContactName, ContactTitle, 
-                                Address, City, Region, PostalCode, Country, Phone, SourceSystem)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                                           customer_id,
-                                           str(row.get('CompanyName', '')) if pd.notna(row.get('CompanyName')) else '',
-                                           str(row.get('ContactName', '')) if pd.notna(row.get('ContactName')) else '',
-                                           str(row.get('ContactTitle', '')) if pd.notna(
-                                               row.get('ContactTitle')) else '',
-                                           str(row.get('Address', '')) if pd.notna(row.get('Address')) else '',
-                                           str(row.get('City', '')) if pd.notna(row.get('City')) else '',
-                                           str(row.get('Region', '')) if pd.notna(row.get('Region')) else '',
-                                           str(row.get('PostalCode', '')) if pd.notna(row.get('PostalCode')) else '',
-                                           str(row.get('Country', '')) if pd.notna(row.get('Country')) else '',
-                                           str(row.get('Phone', '')) if pd.notna(row.get('Phone')) else '',
-                                           str(row.get('SourceSystem', 'Unknown')) if pd.notna(
-                                               row.get('SourceSystem')) else 'Unknown')
-
-                            inserted_count += 1
-
-                        except Exception as row_error:
-                            print(f"    ⚠️  Row error {_}: {row_error}")
-                            continue
-
-                    self.dw_conn.commit()
-                    cursor.close()
-
-                    print(f"    ✅ {inserted_count} new customers added")
+                    dim_customer = dim_customer.assign(CompanyName=dim_customer['CompanyName'].fillna(''))
+                    self._bulk_insert('DimCustomer', list(typed_schema.DIM_CUSTOMER), dim_customer)
+                    self._dimension_lookups = None
+                    print(f"    ✅ {len(dim_customer)} new customers added")
                 else:
                     print("    ℹ️  All customers already exist")
 
@@ -1082,69 +1104,18 @@ class etl:
                 existing_employees = pd.read_sql(existing_query, self.dw_conn)
 
                 # Filter out existing employees
-                if not existing_employees.empty:
-                    dim_employee['composite_key'] = dim_employee['EmployeeID'].astype(str) + '_' + dim_employee[
-                        'SourceSystem'].astype(str)
-                    existing_employees['composite_key'] = existing_employees['EmployeeID'].astype(str) + '_' + \
-                                                          existing_employees['SourceSystem'].astype(str)
-
-                    new_employees = dim_employee[
-                        ~dim_employee['composite_key'].isin(existing_employees['composite_key'])]
-                    dim_employee = new_employees.drop('composite_key', axis=1, errors='ignore')
+                dim_employee = self._only_new_rows(dim_employee, existing_employees, ['EmployeeID', 'SourceSystem'])
+                dim_employee = dim_employee[dim_employee['EmployeeID'].notna() & (dim_employee['EmployeeID'] != 0)]
 
                 # Insert new employees
                 if not dim_employee.empty:
-                    cursor = self.dw_conn.cursor()
-                    inserted_count = 0
-
-                    for _, row in dim_employee.iterrows():
-                        try:
-                            employee_id = int(row.get('EmployeeID', 0)) if pd.notna(row.get('EmployeeID')) else 0
-
-                            if employee_id == 0:
-                                continue
-
-                            # Handle ReportsTo field
-                            reports_to = row.get('ReportsTo')
-                            if pd.isna(reports_to):
-                                reports_to = None
-                            else:
-                                reports_to = int(reports_to)
-
-                            cursor.execute("""
-                                INSERT INTO DimEmployee (EmployeeID, LastName, FirstName, Title, 
-                                TitleOfCourtesy, BirthDate, HireDate, Address, City, Region, 
-                                PostalCode, Country, HomePhone, ReportsTo, SourceSystem)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                                           employee_id,
-                                           str(row.get('LastName', '')) if pd.notna(row.get('LastName')) else '',
-                                           str(row.get('FirstName', '')) if pd.notna(row.get('FirstName')) else '',
-                                           str(row.get('Title', '')) if pd.notna(row.get('Title')) else '',
-                                           str(row.get('TitleOfCourtesy', '')) if pd.notna(
-                                               row.get('TitleOfCourtesy')) else '',
-                                           row.get('BirthDate') if pd.notna(row.get('BirthDate')) else None,
-                                           row.get('HireDate') if pd.notna(row.get('HireDate')) else None,
-                                           str(row.get('Address', '')) if pd.notna(row.get('Address')) else '',
-                                           str(row.get('City', '')) if pd.notna(row.get('City')) else '',
-                                           str(row.get('Region', '')) if pd.notna(row.get('Region')) else '',
-                                           str(row.get('PostalCode', '')) if pd.notna(row.get('PostalCode')) else '',
-                                           str(row.get('Country', '')) if pd.notna(row.get('Country')) else '',
-                                           str(row.get('HomePhone', '')) if pd.notna(row.get('HomePhone')) else '',
-                                           reports_to,
-                                           str(row.get('SourceSystem', 'Unknown')) if pd.notna(
-                                               row.get('SourceSystem')) else 'Unknown')
-
-                            inserted_count += 1
-
-                        except Exception as row_error:
-                            print(f"    ⚠️  Row error {_}: {row_error}")
-                            continue
-
-                    self.dw_conn.commit()
-                    cursor.close()
-
-                    print(f"    ✅ {inserted_count} new employees added")
+                    dim_employee = dim_employee.assign(
+                        LastName=dim_employee['LastName'].fillna(''),
+                        FirstName=dim_employee['FirstName'].fillna('')
+                    )
+                    self._bulk_insert('DimEmployee', list(typed_schema.DIM_EMPLOYEE), dim_employee)
+                    self._dimension_lookups = None
+                    print(f"    ✅ {len(dim_employee)} new employees added")
                 else:
                     print("    ℹ️  All employees already exist")
 
@@ -1153,6 +1124,97 @@ class etl:
         else:
             print("  ℹ️  No employees to load")
 
+        # Reporting lines: closure rebuilt from the whole DimEmployee
+        print("  📋 Rebuilding EmployeeHierarchy...")
+        try:
+            pairs = employee_hierarchy.rebuild(self.dw_conn)
+            print(f"    ✅ {pairs} manager / report pairs")
+        except Exception as e:
+            print(f"    ❌ Error building EmployeeHierarchy: {e}")
+
+        # Load shippers (names and phones are refreshed for known IDs)
+        if dim_shipper is not None and not dim_shipper.empty:
+            print("  📋 Loading DimShipper...")
+            try:
+                count = ship_dimensions.load_shippers(self.dw_conn, dim_shipper)
+                print(f"    ✅ {count} shippers loaded")
+            except Exception as e:
+                print(f"    ❌ Error loading DimShipper: {e}")
+        else:
+            print("  ℹ️  No shippers to load")
+
+        # Load products (names and prices are refreshed for known IDs)
+        if dim_product is not None and not dim_product.empty:
+            print("  📋 Loading DimProduct...")
+            try:
+                dim_product = dim_product.drop_duplicates(['ProductID', 'SourceSystem'])
+                self.backend.upsert(self.dw_conn, 'DimProduct', dim_product, ['ProductID', 'SourceSystem'],
+                                    list(typed_schema.DIM_PRODUCT))
+                print(f"    ✅ {len(dim_product)} products loaded")
+            except Exception as e:
+                print(f"    ❌ Error loading DimProduct: {e}")
+        else:
+            print("  ℹ️  No products to load")
+
+    def lookup_ship_keys(self, fact_orders):
+        """ShipDestinationKey / ShipperKey, adding the new destinations to DimShipDestination first"""
+        fact_orders = fact_orders.copy()
+        fact_orders['ShipDestinationKey'] = ship_dimensions.load_destinations(self.dw_conn, fact_orders)
+        fact_orders['ShipperKey'] = ship_dimensions.shipper_keys(self.dw_conn, fact_orders)
+        return fact_orders
+
+    def dimension_lookups(self):
+        """(customers, employees) key lookups, read once per run and again after new dimension rows"""
+        if self._dimension_lookups is None:
+            customers = pd.read_sql(
+                "SELECT CustomerKey, CustomerID, CompanyName, SourceSystem FROM DimCustomer", self.dw_conn
+            ).astype({'CustomerID': typed_schema.TEXT, 'SourceSystem': typed_schema.TEXT})
+            employees = pd.read_sql(
+                "SELECT EmployeeKey, EmployeeID, FirstName, LastName, SourceSystem FROM DimEmployee", self.dw_conn
+            ).astype({'EmployeeID': 'Int64', 'SourceSystem': typed_schema.TEXT})
+            self._dimension_lookups = (customers, employees)
+        return self._dimension_lookups
+
+    def lookup_dimension_keys(self, fact_orders):
+        """CustomerKey / EmployeeKey for a whole batch with two joins"""
+        customers, employees = self.dimension_lookups()
+
+        fact_orders = fact_orders.merge(
+            customers[['CustomerID', 'SourceSystem', 'CustomerKey']], on=['CustomerID', 'SourceSystem'], how='left'
+        ).merge(
+            employees[['EmployeeID', 'SourceSystem', 'EmployeeKey']], on=['EmployeeID', 'SourceSystem'], how='left'
+        )
+        fact_orders['CustomerKey'] = fact_orders['CustomerKey'].astype('Int64')
+        fact_orders['EmployeeKey'] = fact_orders['EmployeeKey'].astype('Int64')
+
+        # Access rows not found by ID: search by name via the Access mapping
+        is_access = (fact_orders['SourceSystem'] == 'Access').to_numpy(dtype=bool, na_value=False)
+        missing_customer = is_access & (fact_orders['CustomerKey'].isna() & fact_orders['CustomerID'].notna()).to_numpy(
+            dtype=bool, na_value=False)
+        missing_employee = is_access & (fact_orders['EmployeeKey'].isna() & fact_orders['EmployeeID'].notna()).to_numpy(
+            dtype=bool, na_value=False)
+
+        if missing_customer.any() or missing_employee.any():
+            access_mapping = self.create_access_mapping()
+
+            if missing_customer.any() and access_mapping['customers']:
+                access_customers = customers[customers['SourceSystem'] == 'Access']
+                key_by_name = access_customers.drop_duplicates('CompanyName').set_index('CompanyName')['CustomerKey']
+                raw_ids = fact_orders.loc[missing_customer, 'CustomerID'].str.replace('ACC-', '', regex=False)
+                names = raw_ids.map(access_mapping['customers'])
+                fact_orders.loc[missing_customer, 'CustomerKey'] = names.map(key_by_name).astype('Int64')
+
+            if missing_employee.any() and access_mapping['employees']:
+                access_employees = employees[employees['SourceSystem'] == 'Access']
+                full_names = access_employees['FirstName'] + ' ' + access_employees['LastName']
+                key_by_name = access_employees.assign(FullName=full_names).drop_duplicates('FullName') \
+                    .set_index('FullName')['EmployeeKey']
+                raw_ids = (fact_orders.loc[missing_employee, 'EmployeeID'] - 1000).astype(str)
+                names = raw_ids.map(access_mapping['employees'])
+                fact_orders.loc[missing_employee, 'EmployeeKey'] = names.map(key_by_name).astype('Int64')
+
+        return fact_orders
+
     def load_facts_to_dw(self, fact_orders):
         print("\n📤 LOADING FACTS")
         print("-" * 30)
@@ -1161,227 +1223,141 @@ class etl:
             print("  ℹ️  No data to load")
             return
 
-        # Create Access mapping
-        access_mapping = self.create_access_mapping()
-
-        # Verify/create table
-        self._ensure_factorders_table_exists()
-
         print("  🔍 Intelligent dimension key lookup...")
 
         try:
-            cursor = self.dw_conn.cursor()
+            # Filter existing orders (only those in the batch's OrderID range are read)
+            existing_orders = self._existing_orders('FactOrders', fact_orders)
+            fact_orders = self._only_new_rows(fact_orders, existing_orders, ['OrderID', 'SourceSystem'])
+            fact_orders = fact_orders[fact_orders['OrderID'].notna() & (fact_orders['OrderID'] != 0)]
 
-            # Filter existing orders
-            existing_query = "SELECT OrderID, SourceSystem FROM FactOrders"
-            existing_orders = pd.read_sql(existing_query, self.dw_conn)
+            if fact_orders.empty:
+                print("  ℹ️  All orders already exist")
+                return
 
-            if not existing_orders.empty:
-                fact_orders['composite_key'] = fact_orders['OrderID'].astype(str) + '_' + fact_orders[
-                    'SourceSystem'].astype(str)
-                existing_orders['composite_key'] = existing_orders['OrderID'].astype(str) + '_' + existing_orders[
-                    'SourceSystem'].astype(str)
+            # DateKey (MANDATORY)
+            fact_orders = fact_orders.copy()
+            fact_orders['OrderDateKey'] = self.date_keys(fact_orders['OrderDate'])
+            no_date = fact_orders['OrderDateKey'].isna()
+            if no_date.any():
+                print(f"    ⚠️  {int(no_date.sum())} orders skipped: no OrderDate")
+                fact_orders = fact_orders[~no_date]
+
+            # every OrderDateKey must exist in DimDate (FK)
+            self.ensure_dim_date_covers(fact_orders)
+
+            # Data quality checks on the incoming batch
+            dq_results, dq_violations = self.validate_fact_orders(fact_orders)
+
+            # Intelligent lookup; orders whose keys aren't found are inserted with NULL
+            fact_orders = self.lookup_dimension_keys(fact_orders)
+
+            # ship-to addresses and shippers are loaded ahead of the facts, which only keep their keys
+            fact_orders = self.lookup_ship_keys(fact_orders)
+
+            columns = [
+                'OrderID', 'CustomerKey', 'EmployeeKey', 'OrderDateKey',
+                'OrderDate', 'RequiredDate', 'ShippedDate', 'ShipperKey', 'ShipDestinationKey',
+                'Freight', 'TotalAmount', 'IsDelivered', 'DeliveryDelayDays', 'SourceSystem'
+            ]
+            self._bulk_insert('FactOrders', columns, fact_orders)
+
+            # NULL dimension keys after lookup
+            key_results, key_violations = data_quality.run_rules(fact_orders, [
+                data_quality.NotNullRule('customer_key_resolved', 'CustomerKey'),
+                data_quality.NotNullRule('employee_key_resolved', 'EmployeeKey'),
+                data_quality.NotNullRule('shipper_key_resolved', 'ShipperKey'),
+            ], 'FactOrders', 'OrderID')
+            dq_results = pd.concat([dq_results, key_results], ignore_index=True)
+            dq_violations = pd.concat([dq_violations, key_violations], ignore_index=True)
+
+            print(f"\n  ✅ {len(fact_orders)} orders loaded into FactOrders")
+            print(f"  ℹ️  Summary:")
+            print(f"    - Orders with CustomerKey: {int(fact_orders['CustomerKey'].notna().sum())}")
+            print(f"    - Orders with EmployeeKey: {int(fact_orders['EmployeeKey'].notna().sum())}")
 
-                new_orders = fact_orders[~fact_orders['composite_key'].isin(existing_orders['composite_key'])]
-                fact_orders = new_orders.drop('composite_key', axis=1, errors='ignore')
+            data_quality.print_results(dq_results)
+            self.save_dq_results(dq_results, dq_violations)
 
-            if fact_orders.empty:
-                print("  ℹ️  All orders already exist")
+        except Exception as e:
+            print(f"  ❌ Loading error: {e}")
+            import traceback
+            traceback.print_exc()
+
+
+    def load_order_details_to_dw(self, order_details):
+        print("\n📤 LOADING ORDER LINES")
+        print("-" * 30)
+
+        if self.dw_conn is None or order_details.empty:
+            print("  ℹ️  No data to load")
+            return
+
+        try:
+            # the lines of an order always arrive together: skip the orders already loaded
+            existing = self._existing_orders('FactOrderDetails', order_details, distinct=True)
+            if not existing.empty:
+                keys = pd.MultiIndex.from_frame(order_details[['OrderID', 'SourceSystem']])
+                order_details = order_details[~keys.isin(pd.MultiIndex.from_frame(existing))]
+
+            # lines of orders FactOrders rejected (no OrderDate, OrderID 0) would be orphans
+            loaded = self._existing_orders('FactOrders', order_details)
+            keys = pd.MultiIndex.from_frame(order_details[['OrderID', 'SourceSystem']])
+            orphans = ~keys.isin(pd.MultiIndex.from_frame(loaded))
+            if orphans.any():
+                print(f"  ⚠️  {int(orphans.sum())} lines skipped: their order isn't in FactOrders")
+                order_details = order_details[~orphans]
+
+            if order_details.empty:
+                print("  ℹ️  All order lines already exist")
                 return
 
-            # Prepare DateKey
-            fact_orders_with_keys = fact_orders.copy()
-            if 'OrderDate' in fact_orders_with_keys.columns:
-                fact_orders_with_keys['OrderDate'] = pd.to_datetime(fact_orders_with_keys['OrderDate'], errors='coerce')
-                fact_orders_with_keys['OrderDateKey'] = fact_orders_with_keys['OrderDate'].dt.strftime('%Y%m%d').astype(
-                    'Int64')
-
-            # Insert with intelligent lookup
-            inserted_count = 0
-            error_count = 0
-
-            for idx, row in fact_orders_with_keys.iterrows():
-                try:
-                    source_system = row.get('SourceSystem', 'SQL')
-                    order_id = int(row.get('OrderID', 0)) if pd.notna(row.get('OrderID')) else 0
-
-                    if order_id == 0:
-                        continue
-
-                    # DateKey (MANDATORY)
-                    order_date = row.get('OrderDate')
-                    order_date_key = None
-                    if pd.notna(order_date):
-                        try:
-                            order_date_key = int(pd.to_datetime(order_date).strftime('%Y%m%d'))
-                        except:
-                            pass
-
-                    if order_date_key is None:
-                        print(f"    ⚠️  Order {order_id} skipped: no OrderDate")
-                        continue
-
-                    # CustomerKey - INTELLIGENT LOOKUP
-                    customer_key = None
-                    customer_id = row.get('CustomerID')
-
-                    if source_system == 'SQL':
-                        # For SQL Server
-                        if pd.notna(customer_id):
-                            cursor.execute("""
-                                SELECT TOP 1 CustomerKey FROM DimCustomer 
-                                WHERE CustomerID = ? AND SourceSystem = 'SQL'
-                            """, (str(customer_id),))
-                            result = cursor.fetchone()
-                            if result:
-                                customer_key = result[0]
-                            else:
-                                print(f"    ⚠️  SQL CustomerID {customer_id} not found")
-
-                    elif source_system == 'Access':
-                        # For Access
-                        if pd.notna(customer_id):
-                            # 1. Try with ACC-XX format
-                            access_customer_id = f"ACC-{customer_id}"
-                            cursor.execute("""
-                                SELECT TOP 1 CustomerKey FROM DimCustomer 
-                                WHERE CustomerID = ? AND SourceSystem = 'Access'
-                            """, (access_customer_id,))
-                            result = cursor.fetchone()
-
-                            if result:
-                                customer_key = result[0]
-                            else:
-                                # 2. Search by company name via mapping
-                                company_name = access_mapping['customers'].get(str(customer_id))
-                                if company_name:
-                                    cursor.execute("""
-                                        SELECT TOP 1 CustomerKey FROM DimCustomer 
-                                        WHERE CompanyName LIKE ? AND SourceSystem = 'Access'
-                                    """, (f"%{company_name}%",))
-                                    result = cursor.fetchone()
-                                    if result:
-                                        customer_key = result[0]
-                                else:
-                                    print(f"    ⚠️  Access CustomerID {customer_id} not found")
-
-                    # EmployeeKey - INTELLIGENT LOOKUP
-                    employee_key = None
-                    employee_id = row.get('EmployeeID')
-
-                    if source_system == 'SQL':
-                        # For SQL Server
-                        if pd.notna(employee_id):
-                            try:
-                                emp_id = int(employee_id)
-                                cursor.execute("""
-                                    SELECT TOP 1 EmployeeKey FROM DimEmployee 
-                                    WHERE EmployeeID = ? AND SourceSystem = 'SQL'
-                                """, (emp_id,))
-                                result = cursor.fetchone()
-                                if result:
-                                    employee_key = result[0]
-                                else:
-                                    print(f"    ⚠️  SQL EmployeeID {employee_id} not found")
-                            except:
-                                pass
-
-                    elif source_system == 'Access':
-                        # For Access
-                        if pd.notna(employee_id):
-                            try:
-                                # 1. Try with 1000 + ID
-                                access_employee_id = 1000 + int(employee_id)
-                                cursor.execute("""
-                                    SELECT TOP 1 EmployeeKey FROM DimEmployee 
-                                    WHERE EmployeeID = ? AND SourceSystem = 'Access'
-                                """, (access_employee_id,))
-                                result = cursor.fetchone()
-
-                                if result:
-                                    employee_key = result[0]
-                                else:
-                                    # 2. Search by name via mapping
-                                    full_name = access_mapping['employees'].get(str(employee_id))
-                                    if full_name:
-                                        # Try different name formats
-                                        cursor.execute("""
-                                            SELECT TOP 1 EmployeeKey FROM DimEmployee 
-                                            WHERE (FirstName + ' ' + LastName LIKE ? 
-                                                   OR LastName + ', ' + FirstName LIKE ?)
-                                            AND SourceSystem = 'Access'
-                                        """, (f"%{full_name}%", f"%{full_name}%"))
-                                        result = cursor.fetchone()
-                                        if result:
-                                            employee_key = result[0]
-                                    else:
-                                        print(f"    ⚠️  Access EmployeeID {employee_id} not found")
-                            except:
-                                pass
-
-                    # VALIDATION: If no keys found, we still insert with NULL
-                    # But show a warning
-                    if customer_key is None:
-                        print(f"    ℹ️  Order {order_id}: CustomerKey = NULL (ID: {customer_id})")
-                    if employee_key is None:
-                        print(f"    ℹ️  Order {order_id}: EmployeeKey = NULL (ID: {employee_id})")
-
-                    # Insert the order
-                    cursor.execute("""
-                        INSERT INTO FactOrders (
-                            OrderID, CustomerKey, EmployeeKey, OrderDateKey,
-                            OrderDate, ShippedDate, ShipVia, Freight,
-                            ShipName, ShipAddress, ShipCity, ShipRegion,
-                            ShipPostalCode, ShipCountry, TotalAmount,
-                            IsDelivered, SourceSystem
-                        )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                                   order_id,
-                                   customer_key,  # Can be NULL
-                                   employee_key,  # Can be NULL
-                                   order_date_key,
-                                   order_date if pd.notna(order_date) else None,
-                                   row.get('ShippedDate') if pd.notna(row.get('ShippedDate')) else None,
-                                   int(row.get('ShipVia', 0)) if pd.notna(row.get('ShipVia')) else 0,
-                                   float(row.get('Freight', 0)) if pd.notna(row.get('Freight')) else 0.0,
-                                   str(row.get('ShipName', '')) if pd.notna(row.get('ShipName')) else '',
-                                   str(row.get('ShipAddress', '')) if pd.notna(row.get('ShipAddress')) else '',
-                                   str(row.get('ShipCity', '')) if pd.notna(row.get('ShipCity')) else '',
-                                   str(row.get('ShipRegion', '')) if pd.notna(row.get('ShipRegion')) else '',
-                                   str(row.get('ShipPostalCode', '')) if pd.notna(row.get('ShipPostalCode')) else '',
-                                   str(row.get('ShipCountry', '')) if pd.notna(row.get('ShipCountry')) else '',
-                                   float(row.get('TotalAmount', 0)) if pd.notna(row.get('TotalAmount')) else 0.0,
-                                   int(row.get('IsDelivered', 0)) if pd.notna(row.get('IsDelivered')) else 0,
-                                   str(source_system)
-                                   )
-
-                    inserted_count += 1
-
-                    if inserted_count % 20 == 0:
-                        print(f"    {inserted_count} orders inserted...")
-
-                except Exception as row_error:
-                    error_count += 1
-                    if error_count <= 10:
-                        print(f"    ⚠️  Row error {idx}: {str(row_error)[:80]}")
-                    continue
+            products = pd.read_sql("SELECT ProductKey, ProductID, SourceSystem FROM DimProduct", self.dw_conn)
+            products = products.astype({'ProductKey': 'Int64', 'ProductID': 'Int64', 'SourceSystem': typed_schema.TEXT})
+            order_details = order_details.merge(products, on=['ProductID', 'SourceSystem'], how='left')
 
-            self.dw_conn.commit()
-            cursor.close()
+            self._bulk_insert('FactOrderDetails', [
+                'OrderID', 'ProductKey', 'Quantity', 'UnitPrice', 'Discount', 'LineAmount', 'SourceSystem'
+            ], order_details)
+            print(f"  ✅ {len(order_details):,} lines loaded into FactOrderDetails")
 
-            print(f"\n  ✅ {inserted_count} orders loaded into FactOrders")
-            print(f"  ℹ️  Summary:")
-            print(f"    - Orders with CustomerKey: {inserted_count - error_count}")
-            print(f"    - Orders with EmployeeKey: {inserted_count - error_count}")
-            if error_count > 0:
-                print(f"    - Errors: {error_count}")
+            dq_results, dq_violations = data_quality.run_rules(order_details, [
+                data_quality.NotNullRule('product_key_resolved', 'ProductKey'),
+                data_quality.RangeRule('quantity_positive', 'Quantity', min_value=1),
+                data_quality.RangeRule('discount_fraction', 'Discount', min_value=0, max_value=1),
+            ], 'FactOrderDetails', 'OrderID')
+            data_quality.print_results(dq_results)
+            self.save_dq_results(dq_results, dq_violations)
 
         except Exception as e:
             print(f"  ❌ Loading error: {e}")
             import traceback
             traceback.print_exc()
 
+    def update_order_totals(self, source_name='Access'):
+        """TotalAmount of the orders loaded without one, summed from their lines in the warehouse"""
+        try:
+            cursor = self.dw_conn.cursor()
+            cursor.execute("""
+                UPDATE FactOrders
+                SET TotalAmount = (
+                    SELECT SUM(d.LineAmount) FROM FactOrderDetails d
+                    WHERE d.OrderID = FactOrders.OrderID AND d.SourceSystem = FactOrders.SourceSystem
+                )
+                WHERE SourceSystem = ? AND TotalAmount = 0
+                  AND EXISTS (
+                    SELECT 1 FROM FactOrderDetails d
+                    WHERE d.OrderID = FactOrders.OrderID AND d.SourceSystem = FactOrders.SourceSystem
+                  )
+            """, (source_name,))
+            updated = cursor.rowcount
+            cursor.close()
+            self.dw_conn.commit()
+            if updated and updated > 0:
+                print(f"  ✅ TotalAmount of {updated} {source_name} orders computed from their lines")
+        except Exception as e:
+            print(f"  ⚠️  Cannot compute order totals: {e}")
+
 
     #SUMMARY
     def show_summary(self):
@@ -1392,90 +1368,314 @@ class etl:
             print("❌ No connection to DW")
             return
 
-        tables = ['DimDate', 'DimCustomer', 'DimEmployee', 'FactOrders']
-        for table in tables:
-            try:
-                cursor = self.dw_conn.cursor()
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                cursor.close()
-                print(f"  {table}: {count} rows")
-            except Exception as e:
-                print(f"  {table}: TABLE NOT AVAILABLE")
+        # counts from the stats catalog refreshed by the load, no table scans
+        try:
+            catalog = stats_catalog.load(self.dw_conn)
+        except Exception as e:
+            print(f"  ⚠️  Stats catalog not available: {e}")
+            return
 
+        for table in stats_catalog.COUNTED_TABLES:
+            count = stats_catalog.row_count(catalog, table)
+            if count is None:
+                print(f"  {table}: NOT IN CATALOG")
+                continue
+            counts = {source: stats_catalog.row_count(catalog, table, source) for source in ('SQL', 'Access')}
+            by_source = ', '.join(f"{source} {rows}" for source, rows in counts.items() if rows is not None)
+            print(f"  {table}: {count} rows" + (f" ({by_source})" if by_source else ''))
+
+        first, last = stats_catalog.value_range(catalog, 'FactOrders', 'OrderDate')
+        if first is not None:
+            print(f"  Orders from {first} to {last}")
+
+    # AGGREGATES
+    # KPI / trend tables for the dashboard, only the months of the orders loaded since the last refresh are recomputed
+    def refresh_aggregates(self):
+        print("\n🧮 REFRESHING AGGREGATES")
+        print("-" * 30)
 
-    def run_full_etl(self):
-        print("\n" + "=" * 50)
-        print("🚀 FULL ETL ")
-        print("=" * 50)
+        try:
+            refreshed = aggregates.refresh_pending(self.dw_conn)
+            if not refreshed:
+                print("  ℹ️  No new orders, aggregates unchanged")
+            for table, partitions in refreshed.items():
+                print(f"  ✅ {table}: {partitions} partitions recomputed")
+            return refreshed
+        except Exception as e:
+            print(f"  ⚠️  Cannot refresh aggregates: {e}")
+            return {}
+
+    # CUSTOMER MART
+    # running per-customer totals, only the orders loaded since the last refresh are aggregated
+    def refresh_customer_mart(self):
+        print("\n👥 REFRESHING CUSTOMER MART")
+        print("-" * 30)
 
         try:
-            # ensure ALL tables exist
-            self._ensure_dimdate_table_exists()
-            self._ensure_dimcustomer_table_exists()
-            self._ensure_dimemployee_table_exists()
-            self._ensure_factorders_table_exists()
+            customers = customer_mart.refresh(self.dw_conn)
+            if customers:
+                print(f"  ✅ {customers} customers updated")
+            else:
+                print("  ℹ️  No new orders, customer mart unchanged")
+            return customers
+        except Exception as e:
+            print(f"  ⚠️  Cannot refresh customer mart: {e}")
+            return 0
 
-            # create / fill DimDate
-            self.fill_dim_date(1990, 2025)
+    # STATS CATALOG
+    def refresh_stats_catalog(self):
+        print("\n📇 REFRESHING STATS CATALOG")
+        print("-" * 30)
 
-            # extract from sql server
-            sql_data = self.extract_from_sql_server()
+        try:
+            catalog = stats_catalog.refresh(self.dw_conn)
+            print(f"  ✅ {len(catalog)} catalog entries updated")
+            return catalog
+        except Exception as e:
+            print(f"  ⚠️  Cannot refresh stats catalog: {e}")
+            return pd.DataFrame()
 
-            # Transform SQL data
-            dim_customer_sql = self.transform_dim_customer(sql_data.get('customers', pd.DataFrame()), 'SQL')
-            dim_employee_sql = self.transform_dim_employee(sql_data.get('employees', pd.DataFrame()), 'SQL')
-            fact_orders_sql = self.transform_fact_orders(sql_data.get('orders', pd.DataFrame()), 'SQL')
+    # PARQUET LAKE
+    # dimensions and year / source partitions of FactOrders; untouched partitions are kept
+    def export_lake(self):
+        print("\n🗄️  EXPORTING PARQUET LAKE")
+        print("-" * 30)
 
+        if not DatabaseConfig.LAKE_DIRECTORY:
+            print("  ℹ️  No lake configured")
+            return {}
 
-            # extract from access
-            access_data = self.extract_from_access()
+        try:
+            written = lake.export(self.dw_conn, DatabaseConfig.LAKE_DIRECTORY)
+            for name, rows in written.items():
+                print(f"  ✅ {name}: {rows} rows")
+            print(f"  💾 Lake up to date: {DatabaseConfig.LAKE_DIRECTORY}")
+            return written
+        except Exception as e:
+            print(f"  ⚠️  Cannot export lake: {e}")
+            return {}
 
+    # ANALYTICAL MIRROR
+    # columnar DuckDB copy of the star schema for the scan-heavy dashboard queries
+    def refresh_analytics_mirror(self):
+        print("\n🦆 REFRESHING ANALYTICAL MIRROR")
+        print("-" * 30)
+
+        if not DatabaseConfig.MIRROR_DATABASE:
+            print("  ℹ️  No mirror configured")
+            return {}
+
+        try:
+            copied = analytics_mirror.refresh_mirror(self.dw_conn, DatabaseConfig.MIRROR_DATABASE)
+            for table, rows in copied.items():
+                print(f"  ✅ {table}: {rows} rows copied")
+            print(f"  💾 Mirror up to date: {DatabaseConfig.MIRROR_DATABASE}")
+            return copied
+        except Exception as e:
+            print(f"  ⚠️  Cannot refresh mirror: {e}")
+            return {}
 
-            # Transform Access data
-            if access_data:
-                dim_customer_acc = self.transform_dim_customer(
-                    access_data.get('customers_raw', pd.DataFrame()), 'Access'
-                )
-                dim_employee_acc = self.transform_dim_employee(
-                    access_data.get('employees_raw', pd.DataFrame()), 'Access'
-                )
-                fact_orders_acc = self.transform_fact_orders(
-                    access_data.get('orders_raw', pd.DataFrame()), 'Access'
-                )
 
+    # DASHBOARD SNAPSHOT
+    # the dashboard memory-maps the newest version instead of querying the warehouse
+    def publish_snapshot(self):
+        print("\n📸 PUBLISHING DASHBOARD SNAPSHOT")
+        print("-" * 30)
 
+        if not DatabaseConfig.SNAPSHOT_DIRECTORY:
+            print("  ℹ️  No snapshot directory configured")
+            return None
 
-                # Combine SQL and Access data
-                dim_customer = pd.concat([dim_customer_sql, dim_customer_acc], ignore_index=True)
-                dim_employee = pd.concat([dim_employee_sql, dim_employee_acc], ignore_index=True)
-                fact_orders = pd.concat([fact_orders_sql, fact_orders_acc], ignore_index=True)
+        # an unchanged dataset hashes the same: publish keeps the current version
+        previous = snapshot.latest(DatabaseConfig.SNAPSHOT_DIRECTORY)
+        try:
+            stamp = snapshot.publish(self.dw_conn, DatabaseConfig.SNAPSHOT_DIRECTORY)
+            if previous is not None and stamp['version'] == previous['version']:
+                print(f"  ℹ️  Same content, version {stamp['version']} kept")
             else:
-                dim_customer = dim_customer_sql
-                dim_employee = dim_employee_sql
-                fact_orders = fact_orders_sql
+                print(f"  ✅ Version {stamp['version']}: {stamp['rows']} orders")
+            return stamp
+        except Exception as e:
+            print(f"  ⚠️  Cannot publish snapshot: {e}")
+            return None
+
+    def transform_all(self, sql_data, access_data, workers=1, engine='pandas'):
+        """
+        Transform the tables of both sources; returns {'dim_customer': df, ...,
+        'fact_orders': df, 'fact_order_details': df} with SQL and Access rows combined
+        """
+        orders_options = {'engine': engine}
+        jobs = [
+            ('dim_customer_sql', 'transform_dim_customer', sql_data.get('customers', pd.DataFrame()), 'SQL', {}),
+            ('dim_employee_sql', 'transform_dim_employee', sql_data.get('employees', pd.DataFrame()), 'SQL', {}),
+            ('fact_orders_sql', 'transform_fact_orders', sql_data.get('orders', pd.DataFrame()), 'SQL',
+             orders_options),
+            ('fact_order_details_sql', 'transform_fact_order_details', sql_data.get('order_details', pd.DataFrame()),
+             'SQL', {}),
+        ]
+        if access_data:
+            jobs += [
+                ('dim_customer_acc', 'transform_dim_customer', access_data.get('customers_raw', pd.DataFrame()),
+                 'Access', {}),
+                ('dim_employee_acc', 'transform_dim_employee', access_data.get('employees_raw', pd.DataFrame()),
+                 'Access', {}),
+                ('fact_orders_acc', 'transform_fact_orders', access_data.get('orders_raw', pd.DataFrame()),
+                 'Access', orders_options),
+                ('fact_order_details_acc', 'transform_fact_order_details',
+                 access_data.get('order_details_raw', pd.DataFrame()), 'Access', {}),
+            ]
+
+        # the transforms are independent, so they can run side by side
+        if workers > 1:
+            results = run_transforms_parallel(jobs, workers)
+        else:
+            results = {
+                name: getattr(self, method_name)(frame, source_name, **options)
+                for name, method_name, frame, source_name, options in jobs
+            }
 
+        # a handful of rows, transformed here rather than in a worker
+        results['dim_shipper_sql'] = self.transform_dim_shipper(sql_data.get('shippers', pd.DataFrame()), 'SQL')
+        results['dim_product_sql'] = self.transform_dim_product(sql_data.get('products', pd.DataFrame()), 'SQL')
+        if access_data:
+            results['dim_shipper_acc'] = self.transform_dim_shipper(
+                access_data.get('shippers_raw', pd.DataFrame()), 'Access')
+            results['dim_product_acc'] = self.transform_dim_product(
+                access_data.get('products_raw', pd.DataFrame()), 'Access')
+
+        # Combine SQL and Access data
+        tables = {}
+        for table in ['dim_customer', 'dim_employee', 'dim_shipper', 'dim_product', 'fact_orders', 'fact_order_details']:
+            frames = [results[name] for name in (f'{table}_sql', f'{table}_acc')
+                      if name in results and not results[name].empty]
+            tables[table] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return tables
+
+    def stream_fact_orders(self, budget, engine='pandas'):
+        """Extract, transform and load orders, then order lines, batch by batch, sized by the memory budget"""
+        print("\n📦 STREAMING FACTORDERS (memory budget)")
+        print("-" * 30)
 
-            # Load dimensions and facts
-            self.load_dimensions_to_dw(dim_customer, dim_employee)
-            self.load_facts_to_dw(fact_orders)
+        # every batch joins against these: read once, and kept out of what the batches can use
+        budget.reserve('Dimension lookups', list(self.dimension_lookups()))
 
-            # Save for dashboard
-            print("\n🎯 PREPARING FOR DASHBOARD")
-            print("-" * 30)
+        queries = self.sql_server_queries()
+        sources = [('SQL', self.source_conn, queries['orders'], queries['order_details'])]
 
+        access_conn = None
+        if DatabaseConfig.ACCESS_DB_PATH:
             try:
-                import os
-                if not os.path.exists('data'):
-                    os.makedirs('data')
-                fact_orders.to_csv('data/processed/fact_orders_transformed.csv', index=False)
-                print("  ✅ Data saved to data/fact_orders_transformed.csv")
+                access_conn = self.connect_access()
+                cursor = access_conn.cursor()
+                table_list = [table.table_name for table in cursor.tables(tableType='TABLE')]
+                cursor.close()
+                orders_table = self.find_access_orders_table(table_list)
+                order_details_table = self.find_access_order_details_table(table_list)
+                sources.append(('Access', access_conn, f"SELECT * FROM [{orders_table}]",
+                                f"SELECT * FROM [{order_details_table}] ORDER BY [Order ID]"))
             except Exception as e:
-                print(f"  ⚠️  Cannot save data: {e}")
+                print(f"  ❌ Cannot access Access database: {e}")
+
+        total = lines = 0
+        for source_name, conn, orders_query, order_details_query in sources:
+            table = f"orders_{source_name.lower()}"
+            for batch_number, chunk in enumerate(memory_budget.read_sql_chunks(conn, orders_query, budget, table), 1):
+                print(f"\n  Batch {batch_number} ({source_name}): {len(chunk):,} rows "
+                      f"(next batch {budget.chunk_rows(table):,} rows)")
+                fact_orders = self.transform_fact_orders(chunk, source_name, engine=engine)
+                self.load_facts_to_dw(fact_orders)
+                total += len(chunk)
+                del chunk, fact_orders
+
+            # sorted by OrderID, so an order's lines only straddle two batches at most
+            table = f"order_details_{source_name.lower()}"
+            pending = pd.DataFrame()
+            for batch_number, chunk in enumerate(
+                    memory_budget.read_sql_chunks(conn, order_details_query, budget, table), 1):
+                print(f"\n  Line batch {batch_number} ({source_name}): {len(chunk):,} rows")
+                order_details = self.transform_fact_order_details(chunk, source_name)
+                if not pending.empty:
+                    order_details = pd.concat([pending, order_details], ignore_index=True)
+                if order_details.empty:
+                    continue
+                # hold back the last order: its remaining lines may be in the next batch
+                last_order = order_details['OrderID'].iloc[-1]
+                held = (order_details['OrderID'] == last_order).to_numpy(dtype=bool, na_value=False)
+                pending = order_details[held]
+                self.load_order_details_to_dw(order_details[~held])
+                lines += len(chunk)
+                del chunk, order_details
+            self.load_order_details_to_dw(pending)
+
+        if access_conn is not None:
+            self.release_access(access_conn)
 
+        print(f"\n  ✅ {total:,} orders and {lines:,} order lines streamed")
+
+    def run_budgeted_etl(self, budget, workers=1, engine='pandas'):
+        """Dimensions in one pass, orders streamed in budget-sized batches"""
+        sql_data = self.extract_from_sql_server(include_orders=False)
+        access_data = self.extract_from_access(include_orders=False)
+
+        frames = list(sql_data.values()) + list(access_data.values())
+        for name, df in list(sql_data.items()) + list(access_data.items()):
+            budget.measure(name, df)
+
+        planned_workers = budget.workers(workers, frames)
+        if planned_workers < workers:
+            print(f"\n  ℹ️  Memory budget allows {planned_workers} transform workers (asked {workers})")
+
+        tables = self.transform_all(sql_data, access_data, planned_workers, engine)
+        del sql_data, access_data, frames
+
+        self.load_dimensions_to_dw(tables['dim_customer'], tables['dim_employee'],
+                                   tables['dim_shipper'], tables['dim_product'])
+        del tables
+        self.resolve_customer_entities()
+
+        self.stream_fact_orders(budget, engine)
+        self.update_order_totals()
+
+    def run_full_etl(self, workers=1, engine='pandas', max_memory=None):
+        print("\n" + "=" * 50)
+        print("🚀 FULL ETL ")
+        print("=" * 50)
+
+        budget = memory_budget.MemoryBudget.from_string(max_memory) if max_memory else None
+
+        try:
+            if budget is not None:
+                self.run_budgeted_etl(budget, workers, engine)
+            else:
+                # extract from sql server
+                sql_data = self.extract_from_sql_server()
+
+                # extract from access
+                access_data = self.extract_from_access()
+
+                # Transform SQL and Access data
+                tables = self.transform_all(sql_data, access_data, workers, engine)
+                fact_orders = tables['fact_orders']
+
+                # Load dimensions and facts
+                self.load_dimensions_to_dw(tables['dim_customer'], tables['dim_employee'],
+                                           tables['dim_shipper'], tables['dim_product'])
+                self.resolve_customer_entities()
+                self.load_facts_to_dw(fact_orders)
+                self.load_order_details_to_dw(tables['fact_order_details'])
+                self.update_order_totals()
+
+            self.refresh_aggregates()
+            self.refresh_customer_mart()
+            self.refresh_stats_catalog()
+            self.export_lake()
+            self.refresh_analytics_mirror()
+            self.publish_snapshot()
 
             # Show summary
             self.show_summary()
+            if budget is not None:
+                budget.report()
 
             print("\n" + "=" * 50)
             print("🎉 ETL PROCESS COMPLETED SUCCESSFULLY!")
@@ -1489,12 +1689,24 @@ class etl:
 
 # MAIN EXECUTION
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Northwind ETL")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes for the transform stage (1 = serial)")
+    parser.add_argument('--engine', choices=['pandas', 'polars'], default='pandas',
+                        help="engine used for the FactOrders column computations")
+    parser.add_argument('--max-memory', default=None,
+                        help="RAM budget, e.g. 2GB: orders are streamed in batches sized to stay under it")
+    args = parser.parse_args()
+
+    etl_processor = None
     try:
         print("🚀 STARTING ETL PROCESS")
         print("=" * 50)
 
         etl_processor = etl()
-        etl_processor.run_full_etl()
+        etl_processor.run_full_etl(workers=args.workers, engine=args.engine, max_memory=args.max_memory)
 
     except Exception as e:
         print(f"\n❌ FATAL ERROR: {e}")
@@ -1502,6 +1714,11 @@ if __name__ == "__main__":
 
         traceback.print_exc()
     finally:
+        if etl_processor is not None:
+            etl_processor.close()
+        connection_pool.report()
+        connection_pool.close_all()
+
         print("\n" + "=" * 50)
         print("🏁 ETL PROCESS ENDED")
-        print("=" * 50)
\ No newline at end of file
+        print("=" * 50)
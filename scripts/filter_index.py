@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+# Inverted index of the dashboard filter columns, built once per dataset version.
+# Each value of a column maps to the rows holding it: a packed bitmap (n / 8
+# bytes) for columns with few distinct values, sorted row ids (CSR offsets into
+# one array) for the others. A filter combination ORs the bitmaps of the selected
+# values of each column, then ANDs the columns; no string comparison at query time.
+DENSE_VALUES = 256
+
+
+class ColumnIndex:
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        self.rows = len(codes)
+        self.codes = {value: code for code, value in enumerate(uniques.tolist())}
+        self.dense = len(uniques) <= DENSE_VALUES
+
+        # CSR: row ids grouped by value (stable sort keeps them ascending), NULLs left out
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.row_ids = order[len(codes) - counts.sum():]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        if self.dense:
+            self.bitmaps = np.zeros((len(uniques), (self.rows + 7) // 8), dtype=np.uint8)
+            for code in range(len(uniques)):
+                self.bitmaps[code] = np.packbits(self._scatter([code]))
+
+    def _scatter(self, codes):
+        selected = np.zeros(self.rows, dtype=bool)
+        for code in codes:
+            selected[self.row_ids[self.offsets[code]:self.offsets[code + 1]]] = True
+        return selected
+
+    def bitmap(self, values):
+        """Packed bitmap of the rows holding any of `values`"""
+        codes = [self.codes[value] for value in values if value in self.codes]
+        if self.dense:
+            if not codes:
+                return np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+            return np.bitwise_or.reduce(self.bitmaps[codes], axis=0)
+        return np.packbits(self._scatter(codes))
+
+
+class FilterIndex:
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    @classmethod
+    def build(cls, frame, columns):
+        """Index `columns` of a DataFrame or an Arrow table"""
+        if isinstance(frame, pa.Table):
+            values = {column: frame.column(column).to_pandas() for column in columns}
+            rows = frame.num_rows
+        else:
+            values = {column: frame[column] for column in columns}
+            rows = len(frame)
+        return cls({column: ColumnIndex(series) for column, series in values.items()}, rows)
+
+    def mask(self, conditions):
+        """Boolean row mask of [(column, selected values), ...], every condition applied"""
+        selected = None
+        for column, values in conditions:
+            bitmap = self.columns[column].bitmap(values)
+            selected = bitmap if selected is None else np.bitwise_and(selected, bitmap)
+        if selected is None:
+            return np.ones(self.rows, dtype=bool)
+        return np.unpackbits(selected, count=self.rows).view(bool)
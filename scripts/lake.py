@@ -0,0 +1,135 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import analytics_mirror
+import create_dw
+import stats_catalog
+import typed_schema
+
+
+# Parquet export of the star schema for downstream readers (notebooks, Spark, DuckDB):
+#   <lake>/DimCustomer/part-0.parquet                         whole table, rewritten each export
+#   <lake>/FactOrders/Year=1997/SourceSystem=SQL/part-0.parquet one file per (year, source)
+#   <lake>/_watermark.json                                     highest FactOrderKey exported
+# Files are written next to their target and swapped in with os.replace, so a
+# reader sees either the previous file or the new one, never a partial write.
+# The watermark lives in the lake itself: a lake that is wiped or copied
+# elsewhere has none, and gets every partition rewritten.
+DIMENSIONS = ['DimDate', 'DimCustomer', 'DimEmployee', 'DimShipDestination', 'DimShipper', 'DimProduct']
+FACT_TABLE = 'FactOrders'
+ROW_GROUP_ROWS = 100_000
+COMPRESSION = 'zstd'
+
+
+def write_parquet(df, path):
+    """Typed Parquet file with per-row-group min / max statistics, replaced atomically"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = path + '.tmp'
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, staging, compression=COMPRESSION, row_group_size=ROW_GROUP_ROWS,
+                   write_statistics=True)
+    os.replace(staging, path)
+    return len(df)
+
+
+def _read(conn, table, where='', params=None, exclude=()):
+    schema = {
+        name: dtype for name, dtype in analytics_mirror.mirror_schema(create_dw.TABLES[table]).items()
+        if name not in exclude
+    }
+    columns = ', '.join(f"t.{name}" for name in schema)
+    frame = pd.read_sql(f"SELECT {columns} FROM {table} t {where}", conn, params=params)
+    return typed_schema.apply_schema(frame, schema)
+
+
+def partition_path(directory, year, source):
+    return os.path.join(directory, FACT_TABLE, f"Year={year}", f"SourceSystem={source}", 'part-0.parquet')
+
+
+def fact_partitions(catalog):
+    """(year, source) partitions of FactOrders, from the stats catalog"""
+    partitions = set()
+    for source in stats_catalog.sources(catalog, FACT_TABLE):
+        years = stats_catalog.distinct_values(catalog, FACT_TABLE, 'Year', source) or []
+        partitions |= {(int(year), source) for year in years if year is not None}
+    return partitions
+
+
+def watermark_path(directory):
+    return os.path.join(directory, '_watermark.json')
+
+
+def read_watermark(directory):
+    """Highest FactOrderKey in the lake's partitions (None: no export finished here yet)"""
+    try:
+        with open(watermark_path(directory)) as f:
+            return int(json.load(f)['LastFactOrderKey'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_watermark(directory, last_key):
+    staging = watermark_path(directory) + '.tmp'
+    with open(staging, 'w') as f:
+        json.dump({'LastFactOrderKey': int(last_key), 'UpdatedAt': datetime.now().isoformat()}, f)
+    os.replace(staging, watermark_path(directory))
+
+
+def pending_years(conn, after_key):
+    """Years of the FactOrders rows past `after_key`, and the highest FactOrderKey now"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT DISTINCT d.Year
+            FROM FactOrders f
+            JOIN DimDate d ON d.DateKey = f.OrderDateKey
+            WHERE f.FactOrderKey > {int(after_key)}
+        """)
+        years = {int(row[0]) for row in cursor.fetchall()}
+        cursor.execute("SELECT MAX(FactOrderKey) FROM FactOrders")
+        return years, cursor.fetchone()[0] or 0
+    finally:
+        cursor.close()
+
+
+def export_fact_partition(conn, directory, year, source):
+    # sorted on OrderDate so each row group's statistics cover a narrow date range
+    facts = _read(conn, FACT_TABLE, """
+        JOIN DimDate d ON d.DateKey = t.OrderDateKey
+        WHERE d.Year = ? AND t.SourceSystem = ?
+        ORDER BY t.OrderDate, t.OrderID
+    """, [year, source], exclude=('SourceSystem',))
+    # the partition columns live in the path (hive layout)
+    return write_parquet(facts, partition_path(directory, year, source))
+
+
+def export(conn, directory):
+    """
+    Write the dimensions and the FactOrders partitions to the lake.
+
+    Only the partitions of the years with orders past the lake's watermark are
+    rewritten, plus those whose file doesn't exist yet (all of them when there
+    is no watermark). Returns {table or partition: rows written}.
+    """
+    after_key = read_watermark(directory)
+    # read before the export: orders loaded meanwhile stay past the new watermark
+    years, last_key = pending_years(conn, after_key or 0)
+    if after_key is None:
+        years = None
+
+    written = {}
+    for table in DIMENSIONS:
+        written[table] = write_parquet(_read(conn, table), os.path.join(directory, table, 'part-0.parquet'))
+
+    catalog = stats_catalog.load(conn)
+    for year, source in sorted(fact_partitions(catalog)):
+        if years is not None and year not in years and os.path.exists(partition_path(directory, year, source)):
+            continue
+        written[f"{FACT_TABLE} {year}/{source}"] = export_fact_partition(conn, directory, year, source)
+    write_watermark(directory, last_key)
+    return written
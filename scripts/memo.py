@@ -0,0 +1,46 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used cache of computed values.
+
+    The dashboard keeps its derived frames, Plotly figures and export bytes
+    here, keyed by (dataset version, filter tuple, section[, chart type]): a
+    rerun with the same inputs gets them back instead of rebuilding them, and
+    a new dataset version simply stops hitting the old keys, which age out.
+    Values are shared between sessions and must not be modified by callers.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_compute(self, key, compute):
+        """The value cached under `key`, computed by `compute()` (and kept) on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+            self.stats['misses'] += 1
+
+        # computed outside the lock: sessions missing different keys don't wait for each other
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
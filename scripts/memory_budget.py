@@ -0,0 +1,162 @@
+import re
+import sys
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+
+def parse_size(text):
+    """'2GB' / '512 MB' / '1.5G' / '1000000' -> bytes"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?B?)\s*', str(text).upper())
+    if not match:
+        raise ValueError(f"Invalid memory size: {text!r}")
+    number, unit = match.groups()
+    if unit and not unit.endswith('B'):
+        unit += 'B'
+    return int(float(number) * UNITS[unit])
+
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def current_rss():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return peak_rss()
+
+
+def peak_rss(children=False):
+    """Peak resident set size of this process (or of its largest child process)"""
+    if not children and psutil is not None:
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)  # Windows
+        if peak:
+            return peak
+    if resource is not None:
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if not children and psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+class MemoryBudget:
+    """
+    Sizes chunks, batches and workers from a RAM budget.
+
+    Bytes per row are measured on the frames actually read for each table, so the
+    plan follows the real width of the data rather than a guess.
+    """
+
+    # a batch is held several times while it is transformed and loaded
+    # (raw chunk, transformed copy, parameter tuples), plus a safety margin
+    WORKING_COPIES = 4
+    SAFETY = 0.7
+    MIN_ROWS = 1_000
+    MAX_ROWS = 1_000_000
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.baseline = current_rss() or 0
+        self.bytes_per_row = {}
+        # frames held for the whole run (e.g. dimension lookups), out of what the batches can use
+        self.reserved = {}
+        self.planned_workers = 1
+
+    @classmethod
+    def from_string(cls, text):
+        return cls(parse_size(text))
+
+    def available(self):
+        return max(0, int(self.max_bytes * self.SAFETY) - self.baseline - sum(self.reserved.values()))
+
+    def reserve(self, name, frames):
+        """Count frames that stay resident while the batches stream"""
+        self.reserved[name] = self.frame_bytes(frames)
+        return self.reserved[name]
+
+    def measure(self, table, df):
+        if len(df) == 0:
+            return self.bytes_per_row.get(table)
+        per_row = df.memory_usage(deep=True, index=True).sum() / len(df)
+        # keep the widest chunk seen so far
+        self.bytes_per_row[table] = max(per_row, self.bytes_per_row.get(table, 0))
+        return self.bytes_per_row[table]
+
+    def chunk_rows(self, table):
+        per_row = self.bytes_per_row.get(table)
+        if not per_row:
+            return self.MIN_ROWS
+        rows = int(self.available() / (per_row * self.WORKING_COPIES))
+        return max(self.MIN_ROWS, min(self.MAX_ROWS, rows))
+
+    def frame_bytes(self, frames):
+        return sum(df.memory_usage(deep=True, index=True).sum() for df in frames if df is not None)
+
+    def workers(self, requested, frames):
+        """How many transform processes fit: each one imports pandas (≈ baseline) and holds its frames"""
+        if requested <= 1:
+            return 1
+        largest = max((self.frame_bytes([df]) for df in frames), default=0)
+        per_worker = self.baseline + largest * self.WORKING_COPIES
+        fit = int(self.available() // per_worker) if per_worker else requested
+        self.planned_workers = max(1, min(requested, fit))
+        return self.planned_workers
+
+    def report(self):
+        print("\n🧮 MEMORY BUDGET")
+        print("-" * 30)
+        print(f"  Budget: {format_size(self.max_bytes)} (baseline {format_size(self.baseline)})")
+        for name, size in self.reserved.items():
+            print(f"  {name}: {format_size(size)} held for the run")
+        for table, per_row in self.bytes_per_row.items():
+            print(f"  {table}: {per_row:,.0f} bytes/row -> {self.chunk_rows(table):,} rows per batch")
+
+        peak = peak_rss()
+        if peak:
+            status = "✅" if peak <= self.max_bytes else "⚠️ "
+            print(f"  {status} Peak RSS: {format_size(peak)} ({peak / self.max_bytes:.0%} of budget)")
+        child_peak = peak_rss(children=True) if self.planned_workers > 1 else None
+        if child_peak:
+            print(f"  Peak RSS of a transform worker: {format_size(child_peak)}")
+
+
+def read_sql_chunks(conn, query, budget, table):
+    """
+    Stream a query as DataFrames sized by the budget.
+
+    The first chunk is a small probe used to measure bytes per row; the following
+    fetches are sized from that measurement.
+    """
+    cursor = conn.cursor()
+    cursor.execute(query)
+    columns = [column[0] for column in cursor.description]
+
+    size = budget.MIN_ROWS
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        chunk = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns, coerce_float=True)
+        budget.measure(table, chunk)
+        size = budget.chunk_rows(table)
+        yield chunk
+
+    cursor.close()
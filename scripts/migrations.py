@@ -0,0 +1,207 @@
+from datetime import datetime
+
+import pandas as pd
+
+import aggregates
+import create_dw
+import customer_mart
+import employee_hierarchy
+import ship_dimensions
+import stats_catalog
+import typed_schema
+import warehouse_backend
+from DatabaseConfig import DatabaseConfig
+
+
+SCHEMA_VERSION_TABLE = {
+    'columns': [
+        ('Version', 'INT', 'PRIMARY KEY'),
+        ('Description', 'VARCHAR(200)', 'NOT NULL'),
+        ('AppliedAt', 'DATETIME', 'NOT NULL'),
+    ],
+}
+
+
+# MIGRATIONS
+# Applied in order, each one once. They must be idempotent: a database created
+# before SchemaVersion existed replays them all, and version 1 creates the tables
+# from the current create_dw.TABLES definitions.
+def create_tables(*tables):
+    def migration(conn, backend):
+        for table in tables:
+            spec = create_dw.TABLES[table]
+            # references to a table of a later migration are added by that migration
+            foreign_keys = [
+                foreign_key for foreign_key in spec.get('foreign_keys', [])
+                if backend.table_exists(conn, foreign_key[1])
+            ]
+            backend.create_table(conn, table, {**spec, 'foreign_keys': foreign_keys})
+    return migration
+
+
+LEGACY_SHIP_COLUMNS = ['ShipVia'] + ship_dimensions.ADDRESS_COLUMNS
+SHIP_TABLES = ['DimShipDestination', 'DimShipper']
+
+
+def factor_ship_dimensions(conn, backend):
+    """DimShipDestination / DimShipper; FactOrders keeps only ShipperKey and ShipDestinationKey"""
+    create_tables(*SHIP_TABLES)(conn, backend)
+    columns = backend.columns(conn, 'FactOrders')
+    legacy = [column for column in LEGACY_SHIP_COLUMNS if column in columns]
+    if legacy:
+        migrate_ship_columns(conn, backend, columns, legacy)
+    for column, ref_table, ref_column in create_dw.TABLES['FactOrders']['foreign_keys']:
+        if ref_table in SHIP_TABLES:
+            backend.add_foreign_key(conn, f"FK_FactOrders_{ref_table}", 'FactOrders', column, ref_table, ref_column)
+    backend.create_index(conn, 'IX_FactOrders_ShipDestinationKey', 'FactOrders', ['ShipDestinationKey'])
+    conn.commit()
+
+
+def migrate_ship_columns(conn, backend, columns, legacy):
+    """
+    Facts loaded with the address columns get their keys from them, then the
+    old columns are dropped where the engine allows it (DuckDB refuses while
+    FactOrders has indexes: they stay, unused).
+    """
+    for column, ref_table, ref_column in create_dw.TABLES['FactOrders']['foreign_keys']:
+        if column not in columns:
+            backend.add_column(conn, 'FactOrders', column, 'INT')
+
+    facts = pd.read_sql(
+        f"SELECT FactOrderKey, SourceSystem, {', '.join(legacy)} FROM FactOrders WHERE ShipDestinationKey IS NULL",
+        conn
+    )
+    facts = typed_schema.apply_schema(facts, {'FactOrderKey': typed_schema.INT, **{
+        column: dtype for column, dtype in typed_schema.FACT_ORDERS.items()
+        if column in LEGACY_SHIP_COLUMNS + ['SourceSystem']
+    }})
+    if not facts.empty:
+        facts['ShipDestinationKey'] = ship_dimensions.load_destinations(conn, facts)
+        facts['ShipperKey'] = ship_dimensions.shipper_keys(conn, facts)
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE FactOrders SET ShipDestinationKey = ?, ShipperKey = ? WHERE FactOrderKey = ?",
+            typed_schema.db_rows(facts, ['ShipDestinationKey', 'ShipperKey', 'FactOrderKey'])
+        )
+        cursor.close()
+        conn.commit()
+        print(f"    {len(facts)} orders moved to DimShipDestination / DimShipper")
+
+    for column in legacy:
+        try:
+            backend.drop_column(conn, 'FactOrders', column)
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"    FactOrders.{column} kept (can't be dropped on {backend.name}), no longer loaded")
+
+
+def create_aggregates(conn, backend):
+    """Aggregate tables, filled from the orders already in the warehouse"""
+    create_tables(*aggregates.AGGREGATES)(conn, backend)
+    aggregates.rebuild(conn)
+
+
+def create_employee_hierarchy(conn, backend):
+    create_tables('EmployeeHierarchy')(conn, backend)
+    employee_hierarchy.rebuild(conn)
+
+
+def create_customer_mart(conn, backend):
+    """CustomerMart, with the totals of the orders already in the warehouse"""
+    create_tables('CustomerMart')(conn, backend)
+    customer_mart.refresh(conn)
+
+
+def create_index(table, index):
+    def migration(conn, backend):
+        backend.create_index(conn, index, table, create_dw.TABLES[table]['indexes'][index])
+        conn.commit()
+    return migration
+
+
+def create_stats_catalog(conn, backend):
+    create_tables('StatsCatalog')(conn, backend)
+    stats_catalog.refresh(conn)
+
+
+MIGRATIONS = [
+    (1, 'Star schema: DimDate, DimCustomer, DimEmployee, FactOrders',
+     create_tables('DimDate', 'DimCustomer', 'DimEmployee', 'FactOrders')),
+    (2, 'Data quality results: DQResults, DQViolations',
+     create_tables('DQResults', 'DQViolations')),
+    (3, 'Customer entity resolution: CustomerCluster',
+     create_tables('CustomerCluster')),
+    (4, 'Ship dimensions: DimShipDestination, DimShipper, FactOrders ship keys',
+     factor_ship_dimensions),
+    (5, 'Order lines: DimProduct, FactOrderDetails',
+     create_tables('DimProduct', 'FactOrderDetails')),
+    (6, 'Dashboard aggregates: AggMonthlyStatus, AggCustomerEmployee, AggYearly',
+     create_aggregates),
+    (7, 'Statistics catalog: StatsCatalog',
+     create_stats_catalog),
+    (8, 'Employee hierarchy closure: EmployeeHierarchy',
+     create_employee_hierarchy),
+    (9, 'Customer mart: CustomerMart',
+     create_customer_mart),
+    (10, 'Orders table pagination: IX_FactOrders_OrderDate_OrderID',
+     create_index('FactOrders', 'IX_FactOrders_OrderDate_OrderID')),
+    (11, 'Batch existence checks: IX_FactOrders_Order',
+     create_index('FactOrders', 'IX_FactOrders_Order')),
+    (12, 'Aggregates watermark: AggWatermark',
+     create_tables('AggWatermark')),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# versions already verified by this process, per database
+_verified = {}
+
+
+def current_version(conn):
+    """Schema version of the database, 0 when SchemaVersion doesn't exist yet"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(Version) FROM SchemaVersion")
+        return cursor.fetchone()[0] or 0
+    except Exception:
+        # pyodbc leaves the failed statement's transaction open
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        return 0
+    finally:
+        cursor.close()
+
+
+def migrate(conn, key=None):
+    """
+    Bring the schema to LATEST_VERSION.
+
+    When the schema is current this is a single SELECT (nothing at all the second
+    time in the same process); DDL only runs for pending migrations.
+    Returns the schema version.
+    """
+    key = key or (DatabaseConfig.DW_BACKEND, DatabaseConfig.TARGET_DATABASE)
+    if _verified.get(key) == LATEST_VERSION:
+        return LATEST_VERSION
+
+    version = current_version(conn)
+    pending = [migration for migration in MIGRATIONS if migration[0] > version]
+
+    if pending:
+        backend = warehouse_backend.backend_for(conn)
+        backend.create_table(conn, 'SchemaVersion', SCHEMA_VERSION_TABLE)
+        for number, description, apply in pending:
+            print(f"  🛠️  Migration {number}: {description}")
+            apply(conn, backend)
+            backend.bulk_insert(conn, 'SchemaVersion', pd.DataFrame({
+                'Version': [number], 'Description': [description], 'AppliedAt': [datetime.now()],
+            }))
+            version = number
+
+    _verified[key] = version
+    return version
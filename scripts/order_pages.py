@@ -0,0 +1,76 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+
+# Keyset pagination of the orders table: orders are sorted on KEY and a page is
+# the `rows` orders following the key of the previous page's last row. The
+# warehouse seeks to that key in IX_FactOrders_OrderDate_OrderID, the dashboard
+# dataset (kept in KEY order, newest first) finds it by binary search: there is
+# no OFFSET, a page costs the same whatever its number.
+# SourceSystem only breaks ties between equal OrderIDs of the two sources.
+KEY = ['OrderDate', 'OrderID', 'SourceSystem']
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def db_value(value):
+    """A key value as a plain Python parameter (drivers don't bind numpy / pandas scalars)"""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def after_clause(columns, key, descending=True):
+    """
+    WHERE clause and parameters for the rows following `key` in `columns` order.
+
+    Spelled out as (c1 < ?) OR (c1 = ? AND c2 < ?) ... since SQL Server has no
+    row-value comparison; the leading c1 <= ? lets the index seek to the key.
+    """
+    op = '<' if descending else '>'
+    branches, params = [], []
+    for position, column in enumerate(columns):
+        equal = [f"{previous} = ?" for previous in columns[:position]]
+        branches.append('(' + ' AND '.join(equal + [f"{column} {op} ?"]) + ')')
+        params += key[:position + 1]
+    return f"{columns[0]} {op}= ? AND ({' OR '.join(branches)})", [key[0]] + params
+
+
+def _greater_keys(table, key, inclusive):
+    """Number of rows of `table` (sorted on KEY, descending) whose key is > `key` (>= when inclusive)"""
+    columns = [table.column(name) for name in KEY]
+    rows = table.num_rows
+
+    def ascending(position):
+        row = rows - 1 - position
+        return tuple(column[row].as_py() for column in columns)
+
+    search = bisect.bisect_left if inclusive else bisect.bisect_right
+    return rows - search(range(rows), key, key=ascending)
+
+
+def table_page(table, selected, rows, descending=True, after=None):
+    """
+    One page of an Arrow table sorted on KEY (descending), restricted to the
+    row positions `selected` (ascending, e.g. np.flatnonzero of a filter mask).
+    Returns (page as a DataFrame, key to continue after, None on the last page).
+    """
+    if descending:
+        start = 0 if after is None else _greater_keys(table, after, inclusive=True)
+        first = np.searchsorted(selected, start)
+        positions = selected[first:first + rows]
+        more = first + rows < len(selected)
+    else:
+        end = table.num_rows if after is None else _greater_keys(table, after, inclusive=False)
+        last = np.searchsorted(selected, end)
+        positions = selected[max(0, last - rows):last][::-1]
+        more = last - rows > 0
+
+    page = table.take(positions)
+    next_key = None
+    if more and page.num_rows:
+        next_key = tuple(page.column(name)[page.num_rows - 1].as_py() for name in KEY)
+    return page.to_pandas(), next_key
@@ -0,0 +1,96 @@
+import io
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+# FRAME TRANSPORT
+# frames go to the workers and the transformed frames come back as Arrow IPC
+# buffers (one contiguous block per column instead of pickling python objects
+# row by row); anything Arrow can't represent falls back to a plain pickle
+def pack_frame(df):
+    dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+    if pa is not None and not df.empty:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            # the dtypes must come back exactly: a column Arrow can't restore goes as a pickle
+            _restore_dtypes(table.schema.empty_table().to_pandas(), dtypes)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            # the pa.Buffer itself (the pool still pickles it in-band, but with no bytes copy first)
+            return {'format': 'arrow', 'data': sink.getvalue(), 'dtypes': dtypes}
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, ValueError):
+            pass
+
+    return {'format': 'pickle', 'data': df, 'dtypes': dtypes}
+
+
+def _restore_dtypes(df, dtypes):
+    # Arrow can widen a few dtypes on the way back (e.g. object -> string),
+    # restore the original ones so the transform sees exactly the serial input
+    for col, dtype in dtypes.items():
+        if col in df.columns and str(df[col].dtype) != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def unpack_frame(payload):
+    if payload['format'] == 'pickle':
+        return payload['data']
+
+    with pa.ipc.open_stream(payload['data']) as reader:
+        df = reader.read_all().to_pandas()
+
+    # pack_frame checked the dtypes can be restored; a value that can't be is an error, not a silent difference
+    return _restore_dtypes(df, payload['dtypes'])
+
+
+def _transform_worker(method_name, payload, source_name, options):
+    """Run one transform in a worker process and capture its console output"""
+    from etl import etl
+
+    # transforms are pure pandas, they never touch the connections set up in __init__
+    transformer = etl.__new__(etl)
+    df = unpack_frame(payload)
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = getattr(transformer, method_name)(df, source_name, **options)
+
+    return pack_frame(result), log.getvalue()
+
+
+def run_transforms_parallel(jobs, workers):
+    """
+    Run transform jobs in a process pool.
+
+    jobs is a list of (name, method_name, frame, source_name, options). Results come back as
+    {name: frame} and the logs of each worker are printed in job order, so the
+    console output is the same as the serial run.
+    """
+    print(f"\n⚙️  PARALLEL TRANSFORM ({workers} workers, {len(jobs)} jobs)")
+    print("-" * 30)
+
+    results = {}
+    # spawn (the Windows default) everywhere: forking a parent that already started
+    # the Polars / Arrow thread pools can deadlock the children
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [
+            (name, pool.submit(_transform_worker, method_name, pack_frame(frame), source_name, options))
+            for name, method_name, frame, source_name, options in jobs
+        ]
+
+        for name, future in futures:
+            payload, log = future.result()
+            print(log, end='')
+            results[name] = unpack_frame(payload)
+
+    return results
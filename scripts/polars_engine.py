@@ -0,0 +1,96 @@
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+DATE_COLS = ['OrderDate', 'RequiredDate', 'ShippedDate']
+NUMERIC_DEFAULTS = {'Freight': 0, 'TotalAmount': 0, 'ShipVia': 1}
+
+
+def _to_datetime(frame, col):
+    dtype = frame.schema[col]
+    if dtype == pl.Date:
+        return pl.col(col).cast(pl.Datetime('ns'))
+    if isinstance(dtype, pl.Datetime):
+        return pl.col(col)
+    return pl.col(col).cast(pl.Datetime('ns'), strict=False)
+
+
+def _to_numeric(frame, col, default):
+    dtype = frame.schema[col]
+    if dtype.is_integer():
+        return pl.col(col).fill_null(default)
+    expr = pl.col(col).cast(pl.Float64, strict=False)
+    return expr.fill_nan(None).fill_null(default)
+
+
+def _valid_id(col):
+    # Access uses 0 / negative / missing for "no customer" or "no employee"
+    value = pl.col(col).cast(pl.Float64, strict=False)
+    return value.is_not_null() & ~value.is_nan() & (value > 0)
+
+
+def compute_fact_orders(fact_orders, source_name):
+    """
+    Polars version of etl._compute_fact_orders.
+
+    Only the columns that are computed go through Polars (in one multi-threaded
+    select); pass-through text columns stay in the pandas frame untouched.
+    """
+    if pl is None:
+        raise ImportError("polars is not installed (pip install polars)")
+
+    id_cols = ['CustomerID', 'EmployeeID'] if source_name == 'Access' else []
+    numeric_cols = [col for col in NUMERIC_DEFAULTS if col in fact_orders.columns]
+    compute_cols = DATE_COLS + id_cols + numeric_cols
+
+    compute = fact_orders[compute_cols].copy()
+    # text dates are parsed by pandas: str.to_datetime infers other formats (day / month
+    # order, mixed ISO forms), and the two engines must agree on every value
+    for col in DATE_COLS:
+        if not pd.api.types.is_datetime64_any_dtype(compute[col]):
+            compute[col] = pd.to_datetime(compute[col], errors='coerce')
+    frame = pl.from_pandas(compute)
+
+    exprs = [_to_datetime(frame, col).alias(col) for col in DATE_COLS]
+    exprs += [_to_numeric(frame, col, NUMERIC_DEFAULTS[col]).alias(col) for col in numeric_cols]
+    if source_name == 'Access':
+        exprs += [
+            _valid_id('CustomerID').alias('_valid_customer'),
+            _valid_id('EmployeeID').alias('_valid_employee'),
+            pl.when(_valid_id('CustomerID'))
+              .then(pl.lit('ACC-') + pl.col('CustomerID').cast(pl.Float64, strict=False).cast(pl.Int64).cast(pl.String))
+              .alias('CustomerID'),
+            pl.when(_valid_id('EmployeeID'))
+              .then(pl.col('EmployeeID').cast(pl.Float64, strict=False).cast(pl.Int64) + 1000)
+              .alias('EmployeeID'),
+        ]
+    frame = frame.select(exprs)
+    frame = frame.with_columns(
+        pl.col('ShippedDate').is_not_null().cast(pl.Int64).alias('IsDelivered'),
+        (pl.col('ShippedDate') - pl.col('RequiredDate')).dt.total_days().alias('DeliveryDelayDays'),
+    )
+
+    if source_name == 'Access':
+        invalid_customers = frame.height - int(frame['_valid_customer'].sum())
+        invalid_employees = frame.height - int(frame['_valid_employee'].sum())
+        if invalid_customers:
+            print(f"  ⚠️  Found {invalid_customers} Access orders with invalid CustomerID (0, NaN, or negative)")
+        if invalid_employees:
+            print(f"  ⚠️  Found {invalid_employees} Access orders with invalid EmployeeID (0, NaN, or negative)")
+
+    result = fact_orders.copy()
+    for col in DATE_COLS + numeric_cols + ['IsDelivered', 'DeliveryDelayDays']:
+        result[col] = frame[col].to_pandas()
+    result['SourceSystem'] = source_name
+
+    if source_name == 'Access':
+        result['CustomerID'] = frame['CustomerID'].to_pandas()
+        result['EmployeeID'] = frame['EmployeeID'].to_pandas()
+
+    # transform_fact_orders applies the typed schema to both engines' output
+    return result
+
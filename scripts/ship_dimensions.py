@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+import typed_schema
+import warehouse_backend
+
+
+# the ship-to address tuple that identifies a DimShipDestination row
+ADDRESS_COLUMNS = ['ShipName', 'ShipAddress', 'ShipCity', 'ShipRegion', 'ShipPostalCode', 'ShipCountry']
+
+
+def address_hash(df):
+    """
+    Signed 64-bit hash of each row's address tuple (NULL and '' hash alike).
+
+    pandas' hash is seeded with a fixed key, so the same address gets the same
+    hash in every run and DimShipDestination can be keyed on it.
+    """
+    values = df[ADDRESS_COLUMNS].astype(object)
+    values = values.where(values.notna(), '').astype(str)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy().view(np.int64)
+
+
+def _read_keys(conn, query, dtypes):
+    return pd.read_sql(query, conn).astype(dtypes)
+
+
+def load_destinations(conn, fact_orders):
+    """
+    ShipDestinationKey of every row of fact_orders (same index).
+
+    Addresses not in DimShipDestination yet are inserted first, in one batch.
+    """
+    backend = warehouse_backend.backend_for(conn)
+    hashes = pd.Series(address_hash(fact_orders), index=fact_orders.index, name='AddressHash')
+
+    destinations = fact_orders[ADDRESS_COLUMNS].assign(AddressHash=hashes).drop_duplicates('AddressHash')
+    query = "SELECT AddressHash, ShipDestinationKey FROM DimShipDestination"
+    known = _read_keys(conn, query, {'AddressHash': 'int64', 'ShipDestinationKey': 'int64'})
+
+    new = destinations[~destinations['AddressHash'].isin(known['AddressHash'])]
+    if not new.empty:
+        new = typed_schema.apply_schema(new, typed_schema.DIM_SHIP_DESTINATION)
+        backend.bulk_insert(conn, 'DimShipDestination', new, list(typed_schema.DIM_SHIP_DESTINATION))
+        print(f"    ✅ {len(new)} new ship destinations added")
+        last_key = int(known['ShipDestinationKey'].max()) if not known.empty else 0
+        added = _read_keys(conn, f"{query} WHERE ShipDestinationKey > {last_key}",
+                           {'AddressHash': 'int64', 'ShipDestinationKey': 'int64'})
+        known = pd.concat([known, added], ignore_index=True)
+
+    keys = known.set_index('AddressHash')['ShipDestinationKey']
+    return hashes.map(keys).astype('Int64')
+
+
+def load_shippers(conn, dim_shipper):
+    """Insert or refresh shippers on (ShipperID, SourceSystem)"""
+    dim_shipper = dim_shipper[dim_shipper['ShipperID'].notna()].drop_duplicates(['ShipperID', 'SourceSystem'])
+    backend = warehouse_backend.backend_for(conn)
+    return backend.upsert(conn, 'DimShipper', dim_shipper, ['ShipperID', 'SourceSystem'],
+                          list(typed_schema.DIM_SHIPPER))
+
+
+def shipper_keys(conn, fact_orders):
+    """
+    ShipperKey of every row of fact_orders from (ShipVia, SourceSystem).
+
+    Shippers the source tables didn't list are added by ID only, so every
+    order still gets a key.
+    """
+    query = "SELECT ShipperKey, ShipperID, SourceSystem FROM DimShipper"
+    dtypes = {'ShipperKey': 'Int64', 'ShipperID': 'Int64', 'SourceSystem': typed_schema.TEXT}
+    shippers = _read_keys(conn, query, dtypes)
+
+    used = fact_orders[['ShipVia', 'SourceSystem']].rename(columns={'ShipVia': 'ShipperID'})
+    used = used[used['ShipperID'].notna()].drop_duplicates()
+    unknown = used.merge(shippers, on=['ShipperID', 'SourceSystem'], how='left')
+    unknown = unknown[unknown['ShipperKey'].isna()]
+    if not unknown.empty:
+        unknown = typed_schema.apply_schema(unknown.drop(columns='ShipperKey'), typed_schema.DIM_SHIPPER)
+        warehouse_backend.backend_for(conn).bulk_insert(conn, 'DimShipper', unknown, list(typed_schema.DIM_SHIPPER))
+        print(f"    ⚠️  {len(unknown)} shippers missing from the source added by ID")
+        shippers = _read_keys(conn, query, dtypes)
+
+    keys = fact_orders[['ShipVia', 'SourceSystem']].merge(
+        shippers.rename(columns={'ShipperID': 'ShipVia'}), on=['ShipVia', 'SourceSystem'], how='left'
+    )['ShipperKey']
+    return pd.Series(keys.to_numpy(), index=fact_orders.index, dtype='Int64')
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pyarrow as pa
+
+import dashboard_data
+
+
+# Dashboard snapshots published by the ETL:
+#   <directory>/v<N>/<frame>.arrow   Arrow IPC files (uncompressed, memory-mappable)
+#   <directory>/v<N>/options.json    filter lists
+#   <directory>/LATEST.json          version stamp of the newest complete snapshot
+# A snapshot is written under v<N>.tmp and renamed once complete, then the stamp
+# is replaced: readers following the stamp never see a partial snapshot.
+# The stamp records a hash of the content; a dataset identical to the latest one
+# isn't published again, so dashboards keep their mapped version and caches.
+STAMP = 'LATEST.json'
+KEEP_VERSIONS = 2
+
+
+def _replace_json(value, path):
+    staging = path + '.tmp'
+    with open(staging, 'w', encoding='utf-8') as file:
+        json.dump(value, file)
+    os.replace(staging, path)
+
+
+def latest(directory):
+    """Version stamp of the newest snapshot ({'version', 'published_at', 'rows', 'hash'}), None if there is none"""
+    try:
+        with open(os.path.join(directory, STAMP), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def version_path(directory, version):
+    return os.path.join(directory, f"v{version}")
+
+
+def _serialize(dataset):
+    """{frame: Arrow IPC file buffer}, the options JSON and the hash of both"""
+    digest = hashlib.sha256()
+    buffers = {}
+    for name in dashboard_data.FRAMES:
+        table = pa.Table.from_pandas(dataset[name], preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        buffers[name] = sink.getvalue()
+        digest.update(name.encode())
+        digest.update(buffers[name])
+    options = json.dumps(dataset['options'], default=int, sort_keys=True)
+    digest.update(options.encode())
+    return buffers, options, digest.hexdigest()
+
+
+def publish(conn, directory):
+    """
+    Build the dashboard dataset from `conn` and publish it as the next version;
+    returns the stamp (the latest one, unchanged, when the content is the same)
+    """
+    dataset = dashboard_data.build(conn)
+    buffers, options, content_hash = _serialize(dataset)
+    previous = latest(directory)
+    if previous is not None and previous.get('hash') == content_hash:
+        return previous
+    version = (previous['version'] if previous else 0) + 1
+
+    target = version_path(directory, version)
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, buffer in buffers.items():
+        with pa.OSFile(os.path.join(staging, f"{name}.arrow"), 'wb') as sink:
+            sink.write(buffer)
+    with open(os.path.join(staging, 'options.json'), 'w', encoding='utf-8') as file:
+        file.write(options)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    stamp = {
+        'version': version,
+        'published_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': len(dataset['orders']),
+        'hash': content_hash,
+    }
+    _replace_json(stamp, os.path.join(directory, STAMP))
+
+    # older versions may still be mapped by a dashboard (Windows refuses to delete those: skipped)
+    for entry in os.listdir(directory):
+        if entry[1:].isdigit() and int(entry[1:]) <= version - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    return stamp
+
+
+def read_table(directory, version, name):
+    """One frame of a snapshot as an Arrow table backed by a memory map (no copy into the heap)"""
+    source = pa.memory_map(os.path.join(version_path(directory, version), f"{name}.arrow"), 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+def read(directory, version):
+    """
+    A published snapshot in the shape of dashboard_data.build(), except for the
+    order rows: they stay a memory-mapped Arrow table (the small aggregate
+    frames are converted to pandas)
+    """
+    dataset = {}
+    for name in dashboard_data.FRAMES:
+        table = read_table(directory, version, name)
+        dataset[name] = table if name == 'orders' else table.to_pandas()
+    with open(os.path.join(version_path(directory, version), 'options.json'), encoding='utf-8') as file:
+        dataset['options'] = json.load(file)
+    return dataset
@@ -0,0 +1,149 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+
+import create_dw
+import warehouse_backend
+
+
+# StatsCatalog: one row per (table, column, source system), rebuilt by the ETL after
+# each load so readers get counts, date ranges and filter values without scanning facts.
+# ColumnName '*' holds the table's row count; SourceSystem ALL covers every source.
+ALL = 'ALL'
+COUNTED_TABLES = [
+    'DimDate', 'DimCustomer', 'DimEmployee', 'DimShipDestination', 'DimShipper', 'DimProduct',
+    'FactOrders', 'FactOrderDetails',
+]
+CATALOG_COLUMNS = [
+    'TableName', 'ColumnName', 'SourceSystem', 'NumRows', 'NumDistinct',
+    'MinValue', 'MaxValue', 'DistinctValues', 'UpdatedAt',
+]
+KEY_COLUMNS = ['TableName', 'ColumnName', 'SourceSystem']
+
+
+def _has_source(table):
+    return any(name == 'SourceSystem' for name, *_ in create_dw.TABLES[table]['columns'])
+
+
+def _per_source(conn, select, from_sql):
+    """`select` per SourceSystem and over all sources, in one UNION ALL query"""
+    return pd.read_sql(f"""
+        SELECT f.SourceSystem AS SourceSystem, {select} {from_sql} GROUP BY f.SourceSystem
+        UNION ALL
+        SELECT '{ALL}', {select} {from_sql}
+    """, conn)
+
+
+def row_counts(conn):
+    rows = []
+    for table in COUNTED_TABLES:
+        if _has_source(table):
+            counts = _per_source(conn, 'COUNT(*) AS NumRows', f"FROM {table} f")
+        else:
+            counts = pd.read_sql(f"SELECT '{ALL}' AS SourceSystem, COUNT(*) AS NumRows FROM {table}", conn)
+        rows += [
+            {'TableName': table, 'ColumnName': '*', 'SourceSystem': row.SourceSystem, 'NumRows': int(row.NumRows)}
+            for row in counts.itertuples(index=False) if row.SourceSystem is not None
+        ]
+    return rows
+
+
+def order_date_range(conn):
+    stats = _per_source(
+        conn,
+        'COUNT(f.OrderDate) AS NumRows, COUNT(DISTINCT f.OrderDate) AS NumDistinct, '
+        'MIN(f.OrderDate) AS MinValue, MAX(f.OrderDate) AS MaxValue',
+        'FROM FactOrders f'
+    )
+    return [{
+        'TableName': 'FactOrders', 'ColumnName': 'OrderDate', 'SourceSystem': row.SourceSystem,
+        'NumRows': int(row.NumRows), 'NumDistinct': int(row.NumDistinct),
+        'MinValue': None if pd.isna(row.MinValue) else f"{pd.Timestamp(row.MinValue):%Y-%m-%d}",
+        'MaxValue': None if pd.isna(row.MaxValue) else f"{pd.Timestamp(row.MaxValue):%Y-%m-%d}",
+    } for row in stats.itertuples(index=False) if row.SourceSystem is not None]
+
+
+def distinct_lists(conn):
+    """Year / customer / employee values of the orders (the dashboard filter options)"""
+    employee_name = warehouse_backend.backend_for(conn).concat('de.FirstName', "' '", 'de.LastName')
+    values = pd.read_sql(f"""
+        SELECT DISTINCT
+            f.SourceSystem,
+            d.Year,
+            COALESCE(cc.CanonicalName, dc.CompanyName) AS CustomerName,
+            {employee_name} AS EmployeeName
+        FROM FactOrders f
+        JOIN DimDate d ON d.DateKey = f.OrderDateKey
+        LEFT JOIN DimCustomer dc ON f.CustomerKey = dc.CustomerKey
+        LEFT JOIN CustomerCluster cc ON f.CustomerKey = cc.CustomerKey
+        LEFT JOIN DimEmployee de ON f.EmployeeKey = de.EmployeeKey
+    """, conn)
+
+    rows = []
+    groups = [(source, frame) for source, frame in values.groupby('SourceSystem')] + [(ALL, values)]
+    for source, frame in groups:
+        for column in ['Year', 'CustomerName', 'EmployeeName']:
+            distinct = frame[column].drop_duplicates()
+            # nulls (orders without a customer / employee) sort last as JSON null
+            listed = sorted(distinct.dropna().tolist()) + ([None] if distinct.isna().any() else [])
+            if column == 'Year':
+                listed = [int(year) for year in listed if year is not None]
+            rows.append({
+                'TableName': 'FactOrders', 'ColumnName': column, 'SourceSystem': source,
+                'NumRows': int(len(frame)), 'NumDistinct': len(listed),
+                'MinValue': None if distinct.dropna().empty else str(min(distinct.dropna())),
+                'MaxValue': None if distinct.dropna().empty else str(max(distinct.dropna())),
+                'DistinctValues': json.dumps(listed),
+            })
+    return rows
+
+
+def refresh(conn):
+    """Recompute the catalog and upsert it into StatsCatalog; returns the catalog rows"""
+    catalog = pd.DataFrame(row_counts(conn) + order_date_range(conn) + distinct_lists(conn),
+                           columns=CATALOG_COLUMNS)
+    catalog['UpdatedAt'] = datetime.now()
+    catalog = catalog.astype({'NumRows': 'Int64', 'NumDistinct': 'Int64'})
+    warehouse_backend.backend_for(conn).upsert(conn, 'StatsCatalog', catalog, KEY_COLUMNS, CATALOG_COLUMNS)
+    return catalog
+
+
+# READERS
+def load(conn):
+    """The whole catalog, indexed by (TableName, ColumnName, SourceSystem) for O(1) lookups"""
+    catalog = pd.read_sql(f"SELECT {', '.join(CATALOG_COLUMNS)} FROM StatsCatalog", conn)
+    return catalog.set_index(KEY_COLUMNS).sort_index()
+
+
+def _entry(catalog, table, column, source):
+    try:
+        return catalog.loc[(table, column, source)]
+    except KeyError:
+        return None
+
+
+def sources(catalog, table):
+    """Source systems with rows in `table`"""
+    try:
+        counts = catalog.loc[(table, '*')]
+    except KeyError:
+        return []
+    return [source for source in counts.index if source != ALL]
+
+
+def row_count(catalog, table, source=ALL):
+    entry = _entry(catalog, table, '*', source)
+    return None if entry is None else int(entry['NumRows'])
+
+
+def distinct_values(catalog, table, column, source=ALL):
+    entry = _entry(catalog, table, column, source)
+    if entry is None or entry['DistinctValues'] is None:
+        return None
+    return json.loads(entry['DistinctValues'])
+
+
+def value_range(catalog, table, column, source=ALL):
+    entry = _entry(catalog, table, column, source)
+    return (None, None) if entry is None else (entry['MinValue'], entry['MaxValue'])
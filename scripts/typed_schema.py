@@ -0,0 +1,157 @@
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    TEXT = pd.StringDtype('pyarrow')
+except ImportError:
+    TEXT = pd.StringDtype()
+
+INT = 'Int64'
+FLOAT = 'float64'
+DATETIME = 'datetime64[ns]'
+
+
+# Column types produced by the transforms (and bound as-is by the load functions)
+DIM_CUSTOMER = {
+    'CustomerID': TEXT,
+    'CompanyName': TEXT,
+    'ContactName': TEXT,
+    'ContactTitle': TEXT,
+    'Address': TEXT,
+    'City': TEXT,
+    'Region': TEXT,
+    'PostalCode': TEXT,
+    'Country': TEXT,
+    'Phone': TEXT,
+    'SourceSystem': TEXT,
+}
+
+DIM_EMPLOYEE = {
+    'EmployeeID': INT,
+    'LastName': TEXT,
+    'FirstName': TEXT,
+    'Title': TEXT,
+    'TitleOfCourtesy': TEXT,
+    'BirthDate': DATETIME,
+    'HireDate': DATETIME,
+    'Address': TEXT,
+    'City': TEXT,
+    'Region': TEXT,
+    'PostalCode': TEXT,
+    'Country': TEXT,
+    'HomePhone': TEXT,
+    'ReportsTo': INT,
+    'SourceSystem': TEXT,
+}
+
+DIM_SHIPPER = {
+    'ShipperID': INT,
+    'CompanyName': TEXT,
+    'Phone': TEXT,
+    'SourceSystem': TEXT,
+}
+
+DIM_SHIP_DESTINATION = {
+    'AddressHash': INT,
+    'ShipName': TEXT,
+    'ShipAddress': TEXT,
+    'ShipCity': TEXT,
+    'ShipRegion': TEXT,
+    'ShipPostalCode': TEXT,
+    'ShipCountry': TEXT,
+}
+
+DIM_PRODUCT = {
+    'ProductID': INT,
+    'ProductName': TEXT,
+    'CategoryName': TEXT,
+    'QuantityPerUnit': TEXT,
+    'UnitPrice': FLOAT,
+    'Discontinued': INT,
+    'SourceSystem': TEXT,
+}
+
+FACT_ORDERS = {
+    'OrderID': INT,
+    'CustomerID': TEXT,
+    'EmployeeID': INT,
+    'OrderDate': DATETIME,
+    'RequiredDate': DATETIME,
+    'ShippedDate': DATETIME,
+    'ShipVia': INT,
+    'Freight': FLOAT,
+    'ShipName': TEXT,
+    'ShipAddress': TEXT,
+    'ShipCity': TEXT,
+    'ShipRegion': TEXT,
+    'ShipPostalCode': TEXT,
+    'ShipCountry': TEXT,
+    'TotalAmount': FLOAT,
+    'IsDelivered': INT,
+    'DeliveryDelayDays': INT,
+    'SourceSystem': TEXT,
+}
+
+FACT_ORDER_DETAILS = {
+    'OrderID': INT,
+    'ProductID': INT,
+    'Quantity': INT,
+    'UnitPrice': FLOAT,
+    'Discount': FLOAT,
+    'LineAmount': FLOAT,
+    'SourceSystem': TEXT,
+}
+
+CUSTOMER_MART = {
+    'CustomerKey': INT,
+    'FirstOrderDate': DATETIME,
+    'LastOrderDate': DATETIME,
+    'OrderCount': INT,
+    'TotalRevenue': FLOAT,
+    'DeliveredCount': INT,
+    'OnTimeCount': INT,
+    'TotalDelayDays': INT,
+    'LastFactOrderKey': INT,
+    'UpdatedAt': DATETIME,
+}
+
+
+def _cast(series, dtype):
+    if dtype == DATETIME:
+        return pd.to_datetime(series, errors='coerce').astype(DATETIME)
+    if dtype == INT:
+        if not pd.api.types.is_integer_dtype(series):
+            series = pd.to_numeric(series, errors='coerce')
+        return series.astype(INT)
+    if dtype == FLOAT:
+        return pd.to_numeric(series, errors='coerce').astype(FLOAT)
+    if isinstance(dtype, pd.StringDtype) and not isinstance(series.dtype, pd.StringDtype):
+        # keep real nulls as <NA> instead of turning them into 'None' / 'nan'
+        series = series.astype(object).where(series.notna(), None)
+        return series.astype(dtype)
+    return series.astype(dtype)
+
+
+def apply_schema(df, schema):
+    """Select the schema columns (missing ones become all-null) and cast them"""
+    typed = pd.DataFrame(index=df.index)
+    for col, dtype in schema.items():
+        if col in df.columns:
+            typed[col] = _cast(df[col], dtype)
+        else:
+            typed[col] = pd.Series(pd.NA if dtype != DATETIME else pd.NaT, index=df.index).pipe(_cast, dtype)
+    return typed
+
+
+def db_values(series):
+    """One column as DB-API parameters: native python values, None for nulls"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = pd.Series(series.dt.to_pydatetime(), index=series.index, dtype=object)
+    else:
+        values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def db_rows(df, columns):
+    """Parameter tuples for executemany, converted column by column"""
+    return list(zip(*(db_values(df[col]) for col in columns)))
@@ -0,0 +1,379 @@
+import datetime
+import os
+import sqlite3
+
+import typed_schema
+
+try:
+    import pyodbc
+except ImportError:  # no ODBC driver manager (e.g. Linux build hosts)
+    pyodbc = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+class WarehouseBackend:
+    """
+    Everything that depends on the database engine: connection, DDL dialect,
+    bulk load and upsert.
+
+    Tables are described once (see create_dw.TABLES) with generic column types;
+    'IDENTITY' is an auto-numbered primary key, 'BIT' a 0/1 flag and 'TEXT'
+    an unbounded string.
+    """
+
+    name = None
+    type_map = {}
+
+    def connect(self, database):
+        raise NotImplementedError
+
+    def create_database(self, database):
+        """Create the database if needed, True when it was created"""
+        return False
+
+    # DIALECT
+    def quote(self, identifier):
+        return f'"{identifier}"'
+
+    def concat(self, *parts):
+        return ' || '.join(parts)
+
+    # DDL
+    def table_exists(self, conn, table):
+        raise NotImplementedError
+
+    def identity_sql(self, table):
+        raise NotImplementedError
+
+    def column_sql(self, table, name, col_type, extra=''):
+        if col_type == 'IDENTITY':
+            return f"{name} {self.identity_sql(table)}"
+        return ' '.join(part for part in [name, self.type_map.get(col_type, col_type), extra] if part)
+
+    def create_table_sql(self, table, spec):
+        lines = [self.column_sql(table, *column) for column in spec['columns']]
+        lines += [f"UNIQUE({', '.join(columns)})" for columns in spec.get('unique', [])]
+        lines += [
+            f"FOREIGN KEY ({column}) REFERENCES {ref_table}({ref_column})"
+            for column, ref_table, ref_column in spec.get('foreign_keys', [])
+        ]
+        body = ',\n    '.join(lines)
+        return f"CREATE TABLE {table} (\n    {body}\n)"
+
+    def create_table(self, conn, table, spec):
+        """Create the table and its indexes if they don't exist, True when the table was created"""
+        created = not self.table_exists(conn, table)
+        cursor = conn.cursor()
+        if created:
+            cursor.execute(self.create_table_sql(table, spec))
+        cursor.close()
+        for index, columns in spec.get('indexes', {}).items():
+            self.create_index(conn, index, table, columns)
+        conn.commit()
+        return created
+
+    def columns(self, conn, table):
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+        names = [column[0] for column in cursor.description]
+        cursor.close()
+        return names
+
+    def add_column(self, conn, table, name, col_type, extra=''):
+        cursor = conn.cursor()
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {self.column_sql(table, name, col_type, extra)}")
+        cursor.close()
+        conn.commit()
+
+    def drop_column(self, conn, table, name):
+        cursor = conn.cursor()
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {name}")
+        cursor.close()
+        conn.commit()
+
+    def create_index(self, conn, name, table, columns):
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)})")
+        cursor.close()
+
+    def add_foreign_key(self, conn, name, table, column, ref_table, ref_column):
+        """Foreign keys are declared in CREATE TABLE; only SQL Server can add them afterwards"""
+        return False
+
+    # LOADING
+    def limit(self, query, rows):
+        """First `rows` rows of an ordered SELECT"""
+        return f"{query} LIMIT {int(rows)}"
+
+    def insert_sql(self, table, columns):
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+
+    def bulk_insert(self, conn, table, df, columns=None):
+        """Append a DataFrame to a table in one batch"""
+        columns = columns or list(df.columns)
+        if df.empty:
+            return 0
+        cursor = conn.cursor()
+        cursor.executemany(self.insert_sql(table, columns), typed_schema.db_rows(df, columns))
+        conn.commit()
+        cursor.close()
+        return len(df)
+
+    def upsert_sql(self, table, key_columns, columns, source=None):
+        updates = [col for col in columns if col not in key_columns]
+        if source is None:
+            statement = self.insert_sql(table, columns)
+        else:
+            statement = f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {source}"
+        conflict = f" ON CONFLICT ({', '.join(key_columns)}) DO "
+        if updates:
+            return statement + conflict + "UPDATE SET " + ', '.join(f"{col} = excluded.{col}" for col in updates)
+        return statement + conflict + "NOTHING"
+
+    def upsert(self, conn, table, df, key_columns, columns=None):
+        """Insert new rows, update the ones whose key already exists (the key needs a UNIQUE constraint)"""
+        columns = columns or list(df.columns)
+        if df.empty:
+            return 0
+        cursor = conn.cursor()
+        cursor.executemany(self.upsert_sql(table, key_columns, columns), typed_schema.db_rows(df, columns))
+        conn.commit()
+        cursor.close()
+        return len(df)
+
+
+class SqlServerBackend(WarehouseBackend):
+    name = 'sqlserver'
+    type_map = {'TEXT': 'NVARCHAR(MAX)'}
+
+    def __init__(self, server=None, driver='SQL Server', user='', password=''):
+        self.server = server
+        self.driver = driver
+        self.user = user
+        self.password = password
+
+    def connection_string(self, database):
+        auth = f'UID={self.user};PWD={self.password};' if self.user else 'Trusted_Connection=yes;'
+        return f'DRIVER={{{self.driver}}};SERVER={self.server};DATABASE={database};{auth}'
+
+    def connect(self, database):
+        if pyodbc is None:
+            raise ImportError("pyodbc is not installed or the ODBC driver manager is missing")
+        return pyodbc.connect(self.connection_string(database))
+
+    def create_database(self, database):
+        conn = self.connect('master')
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sys.databases WHERE name = ?", database)
+        exists = cursor.fetchone() is not None
+        if not exists:
+            cursor.execute(f"CREATE DATABASE {database}")
+        cursor.close()
+        conn.close()
+        return not exists
+
+    def quote(self, identifier):
+        return f'[{identifier}]'
+
+    def concat(self, *parts):
+        return ' + '.join(parts)
+
+    def table_exists(self, conn, table):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sysobjects WHERE name = ? AND xtype = 'U'", table)
+        exists = cursor.fetchone()[0] > 0
+        cursor.close()
+        return exists
+
+    def identity_sql(self, table):
+        return 'INT IDENTITY(1,1) PRIMARY KEY'
+
+    def limit(self, query, rows):
+        # the query must have an ORDER BY
+        return f"{query} OFFSET 0 ROWS FETCH NEXT {int(rows)} ROWS ONLY"
+
+    def add_column(self, conn, table, name, col_type, extra=''):
+        cursor = conn.cursor()
+        cursor.execute(f"ALTER TABLE {table} ADD {self.column_sql(table, name, col_type, extra)}")
+        cursor.close()
+        conn.commit()
+
+    def create_index(self, conn, name, table, columns):
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{name}')
+            CREATE INDEX {name} ON {table}({', '.join(columns)})
+        """)
+        cursor.close()
+
+    def add_foreign_key(self, conn, name, table, column, ref_table, ref_column):
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sys.foreign_keys WHERE name = '{name}')
+            ALTER TABLE {table}
+            ADD CONSTRAINT {name}
+            FOREIGN KEY ({column}) REFERENCES {ref_table}({ref_column})
+        """)
+        cursor.close()
+        conn.commit()
+        return True
+
+    def bulk_insert(self, conn, table, df, columns=None):
+        columns = columns or list(df.columns)
+        if df.empty:
+            return 0
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        cursor.executemany(self.insert_sql(table, columns), typed_schema.db_rows(df, columns))
+        conn.commit()
+        cursor.close()
+        return len(df)
+
+    def upsert(self, conn, table, df, key_columns, columns=None):
+        """MERGE from a temp table loaded with fast_executemany"""
+        columns = columns or list(df.columns)
+        if df.empty:
+            return 0
+        staging = f"#{table}_staging"
+        updates = [col for col in columns if col not in key_columns]
+
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        cursor.execute(f"SELECT TOP 0 {', '.join(columns)} INTO {staging} FROM {table}")
+        cursor.executemany(self.insert_sql(staging, columns), typed_schema.db_rows(df, columns))
+
+        matched = ''
+        if updates:
+            matched = "WHEN MATCHED THEN UPDATE SET " + ', '.join(f"{col} = source.{col}" for col in updates)
+        cursor.execute(f"""
+            MERGE {table} AS target
+            USING {staging} AS source
+            ON {' AND '.join(f'target.{col} = source.{col}' for col in key_columns)}
+            {matched}
+            WHEN NOT MATCHED THEN
+                INSERT ({', '.join(columns)}) VALUES ({', '.join(f'source.{col}' for col in columns)});
+        """)
+        cursor.execute(f"DROP TABLE {staging}")
+        conn.commit()
+        cursor.close()
+        return len(df)
+
+
+class SQLiteBackend(WarehouseBackend):
+    name = 'sqlite'
+    type_map = {'BIT': 'INTEGER'}
+    extension = '.db'
+
+    def database_path(self, database):
+        return database if os.path.splitext(database)[1] else database + self.extension
+
+    def connect(self, database):
+        self.create_database(database)
+        # pooled connections may be checked out by another thread than the one that opened them
+        return sqlite3.connect(self.database_path(database), check_same_thread=False)
+
+    def create_database(self, database):
+        """The file is created on first connect; make sure its directory exists"""
+        path = self.database_path(database)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return not os.path.exists(path)
+
+    def table_exists(self, conn, table):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        exists = cursor.fetchone()[0] > 0
+        cursor.close()
+        return exists
+
+    def identity_sql(self, table):
+        return 'INTEGER PRIMARY KEY AUTOINCREMENT'
+
+
+class DuckDBBackend(SQLiteBackend):
+    name = 'duckdb'
+    type_map = {'BIT': 'SMALLINT', 'DATETIME': 'TIMESTAMP'}
+    extension = '.duckdb'
+
+    def connect(self, database):
+        if duckdb is None:
+            raise ImportError("duckdb is not installed (pip install duckdb)")
+        self.create_database(database)
+        return duckdb.connect(self.database_path(database))
+
+    def table_exists(self, conn, table):
+        return conn.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        ).fetchone()[0] > 0
+
+    def identity_sql(self, table):
+        return f"INTEGER PRIMARY KEY DEFAULT nextval('seq_{table}')"
+
+    def create_table_sql(self, table, spec):
+        statement = super().create_table_sql(table, spec)
+        if any(col_type == 'IDENTITY' for _, col_type, *_ in spec['columns']):
+            statement = f"CREATE SEQUENCE IF NOT EXISTS seq_{table};\n{statement}"
+        return statement
+
+    # DuckDB scans the DataFrame itself (nullable and Arrow dtypes included),
+    # much faster than binding rows one by one
+    def bulk_insert(self, conn, table, df, columns=None):
+        columns = columns or list(df.columns)
+        if df.empty:
+            return 0
+        conn.register('_bulk_frame', df[columns])
+        try:
+            conn.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM _bulk_frame"
+            )
+        finally:
+            conn.unregister('_bulk_frame')
+        return len(df)
+
+    def upsert(self, conn, table, df, key_columns, columns=None):
+        columns = columns or list(df.columns)
+        if df.empty:
+            return 0
+        conn.register('_upsert_frame', df[columns])
+        try:
+            conn.execute(self.upsert_sql(table, key_columns, columns, source='_upsert_frame'))
+        finally:
+            conn.unregister('_upsert_frame')
+        return len(df)
+
+
+BACKENDS = {
+    'sqlserver': SqlServerBackend,
+    'sqlite': SQLiteBackend,
+    'duckdb': DuckDBBackend,
+}
+
+
+def create_backend(name, **settings):
+    """Backend by name; SQL Server takes server / driver / user / password settings"""
+    try:
+        backend_class = BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    if backend_class is SqlServerBackend:
+        return backend_class(**settings)
+    return backend_class()
+
+
+def backend_for(conn):
+    """Backend matching an open connection (for code that only receives the connection)"""
+    if isinstance(conn, sqlite3.Connection):
+        return SQLiteBackend()
+    if duckdb is not None and isinstance(conn, duckdb.DuckDBPyConnection):
+        return DuckDBBackend()
+    return SqlServerBackend()
+
+
+# sqlite3's default datetime adapters are deprecated: store ISO strings explicitly
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
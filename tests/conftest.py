@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the ETL modules import each other as top-level modules from scripts/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
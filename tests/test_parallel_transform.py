@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl import etl
+from parallel_transform import pack_frame, run_transforms_parallel, unpack_frame
+
+
+def customers():
+    return pd.DataFrame({
+        'CustomerID': ['ALFKI', 'ANATR', 'BONAP'],
+        'CompanyName': ['Alfreds Futterkiste', None, "Bon app'"],
+        'ContactName': ['Maria Anders', 'Ana Trujillo', None],
+        'City': ['Berlin', 'México D.F.', 'Marseille'],
+        'Country': ['Germany', 'Mexico', 'France'],
+    })
+
+
+def orders():
+    return pd.DataFrame({
+        'OrderID': [10248, 10249, 10250],
+        'CustomerID': ['ALFKI', 'ANATR', None],
+        'EmployeeID': [5, 6, 4],
+        'OrderDate': pd.to_datetime(['1996-07-04', '1996-07-05', None]),
+        'RequiredDate': pd.to_datetime(['1996-08-01', '1996-08-16', '1996-08-05']),
+        'ShippedDate': pd.to_datetime(['1996-07-16', None, '1996-07-12']),
+        'ShipVia': [3, 1, 2],
+        'Freight': [32.38, np.nan, 65.83],
+        'ShipName': ['Vins et alcools Chevalier', 'Toms Spezialitäten', None],
+        'TotalAmount': [440.0, 1863.4, None],
+    })
+
+
+def access_orders():
+    return pd.DataFrame({
+        'Order ID': [30, 31, 32],
+        'Employee': [9, 0, 3],
+        'Customer': [27, 4, None],
+        'Order Date': pd.to_datetime(['2006-01-15', '2006-01-20', '2006-01-22']),
+        'Shipped Date': pd.to_datetime(['2006-01-22', None, '2006-01-22']),
+        'Shipping Fee': [200.0, 5.0, None],
+    })
+
+
+def order_details():
+    return pd.DataFrame({
+        'OrderID': [10248, 10248, 10249],
+        'ProductID': [11, 42, 14],
+        'UnitPrice': [14.0, 9.8, 18.6],
+        'Quantity': [12, 10, 9],
+        'Discount': [0.0, 0.0, 0.05],
+    })
+
+
+JOBS = [
+    ('dim_customer_sql', 'transform_dim_customer', customers, 'SQL', {}),
+    ('fact_orders_sql', 'transform_fact_orders', orders, 'SQL', {}),
+    ('fact_orders_acc', 'transform_fact_orders', access_orders, 'Access', {}),
+    ('fact_order_details_sql', 'transform_fact_order_details', order_details, 'SQL', {}),
+    ('empty', 'transform_fact_orders', pd.DataFrame, 'SQL', {}),
+]
+
+
+def test_parallel_matches_serial():
+    transformer = etl.__new__(etl)
+    jobs = [(name, method, build(), source, options) for name, method, build, source, options in JOBS]
+
+    parallel = run_transforms_parallel(jobs, workers=2)
+
+    for name, method, frame, source, options in jobs:
+        expected = getattr(transformer, method)(frame.copy(), source, **options)
+        pd.testing.assert_frame_equal(parallel[name], expected, check_dtype=True)
+
+
+def test_frames_round_trip_with_their_dtypes():
+    frame = orders().astype({'EmployeeID': 'Int64', 'CustomerID': 'object'})
+    payload = pack_frame(frame)
+    assert payload['format'] == 'arrow'
+    pd.testing.assert_frame_equal(unpack_frame(payload), frame, check_dtype=True)
+
+
+def test_unrestorable_frame_goes_as_pickle():
+    # mixed python objects: Arrow can't hold the column, the frame is pickled as is
+    frame = pd.DataFrame({'Value': [1, 'a', 2.5]})
+    payload = pack_frame(frame)
+    assert payload['format'] == 'pickle'
+    pd.testing.assert_frame_equal(unpack_frame(payload), frame)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('polars')
+
+from etl import etl
+
+
+# Both engines of transform_fact_orders must give the same frame, dtypes
+# included, on the inputs where pandas and Polars parse / cast differently.
+def sql_orders(**columns):
+    frame = pd.DataFrame({
+        'OrderID': [10248, 10249, 10250],
+        'CustomerID': ['VINET', 'TOMSP', 'HANAR'],
+        'EmployeeID': [5, 6, 4],
+        'OrderDate': pd.to_datetime(['1996-07-04', '1996-07-05', '1996-07-08']),
+        'RequiredDate': pd.to_datetime(['1996-08-01', '1996-08-16', '1996-08-05']),
+        'ShippedDate': pd.to_datetime(['1996-07-16', '1996-07-10', '1996-07-12']),
+        'ShipVia': [3, 1, 2],
+        'Freight': [32.38, 11.61, 65.83],
+        'ShipName': ['Vins et alcools Chevalier', 'Toms Spezialitäten', 'Hanari Carnes'],
+        'ShipCity': ['Reims', 'Münster', 'Rio de Janeiro'],
+        'ShipCountry': ['France', 'Germany', 'Brazil'],
+        'TotalAmount': [440.0, 1863.4, 1552.6],
+    })
+    for column, values in columns.items():
+        frame[column] = values
+    return frame
+
+
+def access_orders(**columns):
+    frame = pd.DataFrame({
+        'Order ID': [30, 31, 32],
+        'Employee': [9, 3, 4],
+        'Customer': [27, 4, 12],
+        'Order Date': pd.to_datetime(['2006-01-15', '2006-01-20', '2006-01-22']),
+        'Shipped Date': pd.to_datetime(['2006-01-22', '2006-01-25', '2006-01-22']),
+        'Shipping Fee': [200.0, 5.0, 7.5],
+        'Ship Name': ['Karen Toh', 'Christina Lee', 'John Edwards'],
+    })
+    for column, values in columns.items():
+        frame[column] = values
+    return frame
+
+
+SOURCES = {
+    'SQL': (sql_orders, {'order_date': 'OrderDate', 'required_date': 'RequiredDate', 'shipped_date': 'ShippedDate',
+                         'freight': 'Freight', 'customer': 'CustomerID', 'employee': 'EmployeeID'}),
+    'Access': (access_orders, {'order_date': 'Order Date', 'required_date': 'Required Date',
+                               'shipped_date': 'Shipped Date', 'freight': 'Shipping Fee',
+                               'customer': 'Customer', 'employee': 'Employee'}),
+}
+
+# case -> {logical column: values}
+CASES = {
+    'null dates': {'order_date': [pd.NaT, pd.Timestamp('1996-07-05'), pd.NaT],
+                   'shipped_date': [None, None, pd.Timestamp('1996-07-12')]},
+    'unparseable dates': {'order_date': ['1996-07-04', 'not a date', None],
+                          'shipped_date': ['1996-07-16', '31/31/1996', '']},
+    # formats the two libraries infer differently: month / day order, mixed ISO forms, month names
+    'non-ISO dates': {'order_date': ['07/04/1996', '07/05/1996', None],
+                      'required_date': ['04.08.1996', '05.08.1996', 'x'],
+                      'shipped_date': ['1996/07/16', '1996-07-10T08:00', '12 Jul 1996']},
+    'non-numeric freight': {'freight': ['32.38', 'n/a', None]},
+    'negative, zero and null delays': {'required_date': pd.to_datetime(['1996-07-20', '1996-07-10', None]),
+                                       'shipped_date': pd.to_datetime(['1996-07-16', '1996-07-10', '1996-07-12'])},
+    'prefixed ACC- ids': {'customer': ['ACC-27', 'ACC-4', None], 'employee': ['7', 'ACC-3', None]},
+    # Access only: SQL Server ids are text / integer keys
+    'invalid ids': {'customer': [0, -3, np.nan], 'employee': [0.0, np.nan, 2.9]},
+}
+ACCESS_ONLY = {'invalid ids'}
+
+
+def transform(orders, source_name, engine):
+    return etl.__new__(etl).transform_fact_orders(orders, source_name, engine=engine)
+
+
+@pytest.mark.parametrize('source_name, case', [
+    (source_name, case) for source_name in SOURCES for case in CASES
+    if source_name == 'Access' or case not in ACCESS_ONLY
+])
+def test_engines_match(source_name, case):
+    build, columns = SOURCES[source_name]
+    orders = build(**{columns[name]: values for name, values in CASES[case].items()})
+
+    expected = transform(orders, source_name, 'pandas')
+    actual = transform(orders, source_name, 'polars')
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=True)
+
+
+def test_sql_non_numeric_amount():
+    orders = sql_orders(TotalAmount=['440', 'abc', None], ShipVia=['3', None, 'x'])
+    pd.testing.assert_frame_equal(transform(orders, 'SQL', 'polars'), transform(orders, 'SQL', 'pandas'))
+
+
+@pytest.mark.parametrize('source_name', list(SOURCES))
+def test_delays_cover_every_sign(source_name):
+    build, columns = SOURCES[source_name]
+    orders = build(**{columns[name]: values for name, values in CASES['negative, zero and null delays'].items()})
+    delays = transform(orders, source_name, 'polars')['DeliveryDelayDays']
+    assert delays.tolist()[:2] == [-4, 0]
+    assert delays.isna().tolist()[2]
+
+
+@pytest.mark.parametrize('source_name', list(SOURCES))
+def test_empty_frame(source_name):
+    build, _ = SOURCES[source_name]
+    orders = build().iloc[0:0]
+    pd.testing.assert_frame_equal(transform(orders, source_name, 'polars'), transform(orders, source_name, 'pandas'))